@@ -0,0 +1,303 @@
+"""Runs a whole campaign (e.g. ExperimentTemplates/cadr/configurations/default.json) locally and resumably.
+
+The parameter grid is expanded into a manifest of instances once. Progress is kept in a JSON file which is
+replaced atomically after every state change, so after a crash only the instances that were running are
+repeated. An instance counts as completed if it finished successfully and its collected outputs under
+<data_path>/<sim_id>/<instance_id> match the manifest.csv written by log_files.collect_logs.
+
+The data path is handed to the instances in the EXPERIMENT_DATA_PATH environment variable, which the templates
+use instead of their default DATA_PATH.
+
+With --parallel N, up to N instances run at once, each in its own process with its own CoreEmu and session.
+Their teardown only removes what belongs to their own session (see teardown.Teardown). N is handed to the
+instances in EXPERIMENT_SESSIONS and the slot the admission assigned to the instance in EXPERIMENT_SLOT, so that
+their CPU placements use disjoint cores.
+
+Usage: python3 campaign.py <template dir> <work dir> [--sim-id ID] [--data PATH] [--parallel N]
+"""
+
+import os
+import re
+import csv
+import sys
+import json
+import shutil
+import argparse
+import itertools
+import subprocess
+import threading
+import time
+
+from scheduler import Admission, Instance
+
+DATA_PATH = "/research_data"
+# tells the instances where to collect their logs to
+DATA_PATH_ENV = "EXPERIMENT_DATA_PATH"
+# tells the instances how many of them run at once, so that CPU placement gives each its own cores
+SESSIONS_ENV = "EXPERIMENT_SESSIONS"
+# tells an instance which of these shares of cores it gets, see scheduler.Admission
+SLOT_ENV = "EXPERIMENT_SLOT"
+CONFIGURATION = "configurations/default.json"
+SCRIPT = "script.py"
+CAMPAIGN_MANIFEST = "campaign_manifest.json"
+CAMPAIGN_PROGRESS = "campaign_progress.json"
+# written by log_files.collect_logs
+COLLECTED_MANIFEST = "manifest.csv"
+
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_placeholder = re.compile(r"{{\s*(\w+)\s*}}")
+
+
+def expand_grid(configuration):
+    """All parameter combinations of a MACI configuration, each repeated with its own seed
+
+    Returns:
+        List of (instance_id, params) in a stable order
+    """
+    param_values = configuration["paramValues"]
+    keys = sorted(param_values)
+    repetitions = int(configuration.get("repetitions", 1))
+    seeds = int(configuration.get("seeds", 1))
+
+    instances = []
+    for values in itertools.product(*(param_values[key] for key in keys)):
+        for repetition in range(repetitions):
+            for seed_index in range(seeds):
+                params = dict(zip(keys, values))
+                params["seed"] = repetition * seeds + seed_index
+                instances.append((len(instances) + 1, params))
+    return instances
+
+
+def write_json_atomic(path, data):
+    """Write to a temporary file, fsync it and rename it over path, so path is always complete"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+
+def outputs_complete(instance_path):
+    """Whether all files listed in the instance's manifest.csv exist with the listed size"""
+    try:
+        with open(os.path.join(instance_path, COLLECTED_MANIFEST), "r", newline="") as f:
+            entries = list(csv.DictReader(f))
+    except (IOError, csv.Error):
+        return False
+
+    if not entries:
+        return False
+
+    for entry in entries:
+        try:
+            if os.path.getsize(os.path.join(instance_path, entry["name"])) != int(entry["size"]):
+                return False
+        except (OSError, KeyError, ValueError):
+            return False
+    return True
+
+
+def render_script(template, params, sim_id, instance_id):
+    values = dict(params, simId=sim_id, simInstanceId=instance_id)
+
+    def substitute(match):
+        return str(values[match.group(1)])
+
+    return _placeholder.sub(substitute, template)
+
+
+class Campaign:
+    def __init__(self, template_dir, work_dir, sim_id, data_path=DATA_PATH):
+        self.template_dir = template_dir
+        self.work_dir = work_dir
+        self.sim_id = sim_id
+        self.data_path = data_path
+        self.sim_path = os.path.join(data_path, str(sim_id))
+        self.manifest_path = os.path.join(work_dir, CAMPAIGN_MANIFEST)
+        self.progress_path = os.path.join(work_dir, CAMPAIGN_PROGRESS)
+        self.lock = threading.Lock()
+
+        os.makedirs(work_dir, exist_ok=True)
+        self.instances = self._load_manifest()
+        self.progress = self._load_progress()
+
+    def _load_manifest(self):
+        """The campaign's instances, expanded from the configuration on the first run"""
+        if os.path.isfile(self.manifest_path):
+            with open(self.manifest_path, "r") as f:
+                manifest = json.load(f)
+        else:
+            with open(os.path.join(self.template_dir, CONFIGURATION), "r") as f:
+                configuration = json.load(f)
+            manifest = {
+                "sim_id": self.sim_id,
+                "instances": [
+                    {"instance_id": instance_id, "params": params}
+                    for instance_id, params in expand_grid(configuration)
+                ],
+            }
+            write_json_atomic(self.manifest_path, manifest)
+        return manifest["instances"]
+
+    def _load_progress(self):
+        if os.path.isfile(self.progress_path):
+            with open(self.progress_path, "r") as f:
+                return json.load(f)
+        return {}
+
+    def instance_path(self, instance_id):
+        return os.path.join(self.sim_path, str(instance_id))
+
+    def _set_state(self, instance_id, state, **details):
+        with self.lock:
+            entry = {"state": state, "time": time.time()}
+            entry.update(details)
+            self.progress[str(instance_id)] = entry
+            write_json_atomic(self.progress_path, self.progress)
+
+    def is_complete(self, instance_id):
+        """Completed instances have valid outputs and were not interrupted (instances run by MACI have no state)"""
+        state = self.progress.get(str(instance_id), {}).get("state")
+        if state in (RUNNING, FAILED):
+            return False
+        return outputs_complete(self.instance_path(instance_id))
+
+    def missing(self):
+        return [entry for entry in self.instances if not self.is_complete(entry["instance_id"])]
+
+    def _prepare(self, instance_id, params):
+        """Render the template into the instance's work directory, with the parameters.py MACI would provide"""
+        instance_dir = os.path.join(self.work_dir, str(instance_id))
+        shutil.rmtree(instance_dir, ignore_errors=True)
+        os.makedirs(instance_dir)
+
+        with open(os.path.join(self.template_dir, SCRIPT), "r") as f:
+            script = render_script(f.read(), params, sim_id=self.sim_id, instance_id=instance_id)
+        with open(os.path.join(instance_dir, SCRIPT), "w") as f:
+            f.write(script)
+
+        all_params = dict(params, simId=self.sim_id, simInstanceId=instance_id)
+        with open(os.path.join(instance_dir, "parameters.py"), "w") as f:
+            f.write(f"params = {all_params!r}\nrequestedParams = set()\n")
+
+        # outputs of an interrupted or failed run must not end up mixed with the new ones
+        instance_path = self.instance_path(instance_id)
+        if os.path.isdir(instance_path):
+            incomplete_path = f"{instance_path}.incomplete"
+            shutil.rmtree(incomplete_path, ignore_errors=True)
+            os.rename(instance_path, incomplete_path)
+
+        return instance_dir
+
+    def run_instance(self, entry, sessions=1, slot=0):
+        instance_id, params = entry["instance_id"], entry["params"]
+        instance_dir = self._prepare(instance_id, params)
+        self._set_state(instance_id, RUNNING)
+
+        framework_dir = os.path.dirname(os.path.abspath(__file__))
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [instance_dir, framework_dir, env.get("PYTHONPATH")]))
+        env[DATA_PATH_ENV] = self.data_path
+        env[SESSIONS_ENV] = str(sessions)
+        env[SLOT_ENV] = str(slot)
+
+        start = time.time()
+        with open(os.path.join(instance_dir, "output.log"), "w") as output:
+            returncode = subprocess.call(
+                [sys.executable, "-u", SCRIPT], cwd=instance_dir, env=env, stdout=output, stderr=subprocess.STDOUT
+            )
+        duration = time.time() - start
+
+        if returncode == 0 and outputs_complete(self.instance_path(instance_id)):
+            self._set_state(instance_id, DONE, duration=duration)
+            return True
+
+        self._set_state(instance_id, FAILED, duration=duration, returncode=returncode)
+        return False
+
+    def run(self, parallel=1, admission=None):
+        """Run all missing or failed instances
+
+        With parallel > 1 (or an admission), instances run concurrently as far as the admission's CPU and memory
+        limits allow, see scheduler.Admission.
+
+        Returns:
+            Number of instances that failed again
+        """
+        missing = self.missing()
+        print(f"{len(self.instances) - len(missing)} of {len(self.instances)} instances completed, running {len(missing)}")
+
+        if admission is None and parallel > 1:
+            admission = Admission(max_instances=parallel)
+        threads = []
+        failures = []
+
+        def run(entry, reservation):
+            sessions = admission.capacity(reservation) if admission is not None else 1
+            slot = reservation.slot if reservation.slot is not None else 0
+            try:
+                if not self.run_instance(entry, sessions=sessions, slot=slot):
+                    failures.append(entry["instance_id"])
+            finally:
+                if admission is not None:
+                    admission.release(reservation)
+
+        for entry in missing:
+            reservation = Instance(entry["instance_id"], entry["params"])
+            if admission is None:
+                print(f"Starting instance {entry['instance_id']}: {entry['params']}")
+                run(entry, reservation)
+                continue
+
+            if not admission.fits(reservation):
+                raise ValueError(f"Instance {entry['instance_id']} needs more resources than this host has")
+            while not admission.admit(reservation):
+                time.sleep(1)
+
+            print(f"Starting instance {entry['instance_id']}: {entry['params']}")
+            thread = threading.Thread(target=run, args=(entry, reservation))
+            threads.append(thread)
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        print(f"{len(missing) - len(failures)} instances completed, {len(failures)} failed: {failures}")
+        return len(failures)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a campaign locally, skipping completed instances")
+    parser.add_argument("template", help="Experiment template directory, e.g. ExperimentTemplates/cadr")
+    parser.add_argument("work_dir", help="Directory for the campaign's manifest, progress and instance scripts")
+    parser.add_argument("--sim-id", type=int, default=1, help="Simulation id, outputs go to <data>/<sim id>")
+    parser.add_argument("--data", default=DATA_PATH, help="Where the instances collect their logs to")
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=1,
+        help="Maximum number of concurrent instances",
+    )
+    parser.add_argument("--list", action="store_true", help="Only list the missing instances")
+    args = parser.parse_args()
+
+    campaign = Campaign(
+        template_dir=args.template, work_dir=args.work_dir, sim_id=args.sim_id, data_path=args.data
+    )
+    if args.list:
+        for entry in campaign.missing():
+            print(entry["instance_id"], json.dumps(entry["params"], sort_keys=True))
+        sys.exit(0)
+
+    sys.exit(1 if campaign.run(parallel=args.parallel) else 0)
@@ -1,8 +1,103 @@
-import json
 import time
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
 
 from core.emulator.coreemu import Session
 
+from cadrhelpers.dtnclient import RESTError, build_url, load_payload, register, send_bundle
+from log_follower import LogFollower
+from netns import enter_network_namespace
+
+DELIVERY_MESSAGE = "Received bundle for local delivery"
+AGENT_PORT = 8080
+# concurrent submissions per node, dtnd serialises the store writes anyway
+SEND_WORKERS = 4
+
+
+class _NodeSender:
+    """Submits files from one node with a bounded pool of worker threads.
+
+    The workers enter the node's network namespace, so that they can talk to the node's REST agent
+    over one persistent session. Workers which cannot enter it fall back to dtncat via node.cmd.
+    The REST agent takes the payload as base64 text, so the fallback sends the base64 encoding of the file
+    as well: the bundle payload is the same whichever way it was submitted (unlike DTN7.send_file's raw bytes).
+    """
+
+    def __init__(self, node, workers: int):
+        self.node = node
+        self.rest_url = build_url(address="127.0.0.1", port=AGENT_PORT)
+        self.endpoint_id = "dtn://{node.name}/framework".format(**locals())
+        self.session = requests.Session()
+        self.uuid = None
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.pool = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="send-{node.name}".format(**locals()),
+        )
+
+    def _in_namespace(self) -> bool:
+        # every worker thread enters the namespace on its first job
+        if not hasattr(self.local, "in_namespace"):
+            pid = getattr(self.node, "pid", None)
+            self.local.in_namespace = pid is not None and enter_network_namespace(pid)
+        return self.local.in_namespace
+
+    def _send_rest(self, path: str, dst: str):
+        with self.lock:
+            if self.uuid is None:
+                self.uuid = register(
+                    rest_url=self.rest_url, endpoint_id=self.endpoint_id, session=self.session
+                )["uuid"]
+
+        send_bundle(
+            rest_url=self.rest_url,
+            uuid=self.uuid,
+            source=self.endpoint_id,
+            destination="dtn://{dst}/".format(**locals()),
+            payload=load_payload(path),
+            session=self.session,
+        )
+
+    def _send_dtncat(self, path: str, dst: str):
+        self.node.cmd(
+            'bash -c \'base64 -w 0 {path} | dtncat send "http://127.0.0.1:{AGENT_PORT}" "dtn://{dst}/"\''.format(
+                AGENT_PORT=AGENT_PORT, **locals()
+            )
+        )
+
+    def send(self, path: str, dst: str):
+        method = "rest" if self._in_namespace() else "dtncat"
+        error = None
+        start = time.time()
+        try:
+            if method == "rest":
+                self._send_rest(path, dst)
+            else:
+                self._send_dtncat(path, dst)
+        except (RESTError, requests.RequestException, OSError, KeyError) as e:
+            error = str(e)
+
+        return {
+            "node": self.node.name,
+            "path": path,
+            "destination": dst,
+            "method": method,
+            "submitted": start,
+            "duration": time.time() - start,
+            "error": error,
+        }
+
+    def submit(self, path: str, dst: str):
+        return self.pool.submit(self.send, path, dst)
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        self.session.close()
+
 
 class DTN7:
     def __init__(self, session: Session):
@@ -16,6 +111,9 @@ class DTN7:
         # To be on the safe site, we give the experiments 30 minutes.
         self.timeout = time.time() + 60 * 30
 
+        # one thread follows the logs of all nodes we are waiting on
+        self.follower = LogFollower()
+
     def _timeout_reached(self) -> bool:
         if time.time() >= self.timeout:
             return True
@@ -30,27 +128,75 @@ class DTN7:
             )
         )
 
-    def wait_for_arrival(self, node_name):
+    def send_files(self, files, workers_per_node: int = SEND_WORKERS):
+        """Inject many files from many nodes concurrently
+
+        Args:
+            files: Iterable of (node_name, path, dst) tuples
+            workers_per_node: Maximum number of concurrent submissions per node
+
+        Returns:
+            One dictionary per file, in the given order, with the submission's node, path, destination,
+            method ("rest" or "dtncat"), submitted (timestamp), duration (seconds) and error (None on success).
+            Either way, the bundle payload is the file's base64 encoding.
+        """
+        senders = {}
+        submissions = []
+        try:
+            for node_name, path, dst in files:
+                sender = senders.get(node_name)
+                if sender is None:
+                    sender = _NodeSender(self.session.nodes[node_name], workers=workers_per_node)
+                    senders[node_name] = sender
+                submissions.append(sender.submit(path, dst))
+
+            return [submission.result() for submission in submissions]
+        finally:
+            for sender in senders.values():
+                sender.close()
+
+    def _log_path(self, node_name: str) -> str:
         node = self.session.nodes[node_name]
+        return "{node.nodedir}/dtnd_run.log".format(**locals())
 
-        with open("{node.nodedir}/dtnd_run.log".format(**locals())) as log_file:
+    def _remaining(self) -> float:
+        return max(self.timeout - time.time(), 0)
 
-            while True:
+    def register_arrival(self, node_name, bundle_id=None):
+        """Register a wait for a bundle (or any bundle, if bundle_id is None) delivered at node_name"""
+
+        def is_arrival(entry):
+            if entry.get("msg") != DELIVERY_MESSAGE:
+                return False
+            return bundle_id is None or str(entry.get("bundle", "")) == bundle_id
+
+        return self.follower.register(
+            path=self._log_path(node_name),
+            needle=DELIVERY_MESSAGE,
+            predicate=is_arrival,
+            timeout=self._remaining(),
+        )
 
-                if self._timeout_reached():
-                    print("Timeout reached. Stopping experiment.")
-                    break
+    def wait_for_arrival(self, node_name, bundle_id=None):
+        waiter = self.register_arrival(node_name, bundle_id=bundle_id)
+        waiter.wait()
+        if waiter.timed_out:
+            print("Timeout reached. Stopping experiment.")
+        return waiter.entry
 
-                line = log_file.readline()
+    def wait_for_arrivals(self, node_names):
+        """Wait until a bundle has been delivered at each of the given nodes
 
-                if not line:
-                    time.sleep(0.1)
-                    continue
+        Returns:
+            Dictionary of node name to the log entry of the delivery, or None if the timeout was reached
+        """
+        waiters = {
+            node_name: self.register_arrival(node_name) for node_name in node_names
+        }
+        arrivals = {node_name: waiter.wait() for node_name, waiter in waiters.items()}
+        if any(waiter.timed_out for waiter in waiters.values()):
+            print("Timeout reached. Stopping experiment.")
+        return arrivals
 
-                try:
-                    json_obj = json.loads(line)
-                    if json_obj["msg"] == "Received bundle for local delivery":
-                        break
-                except Exception as e:
-                    print(e)
-                    continue
+    def close(self):
+        self.follower.close()
@@ -0,0 +1,183 @@
+"""Conversion of dtnd's JSON debug logs into a compact columnar event file.
+
+The events of all nodes of an instance are stored in a single zip archive (dtnd_events.zip) with one deflated
+member per column:
+
+    <column>.f8 / <column>.i8    little-endian float64 / int64 values
+    <column>.u4                  little-endian uint32 codes of a dictionary-encoded string column
+    <column>.json                the dictionary (list of strings) belonging to <column>.u4
+
+Missing integers are stored as -1, missing strings as the empty string (code 0).
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import array
+import calendar
+import zipfile
+
+EVENTS_FILE = "dtnd_events.zip"
+
+# all messages the analyses in evaluation/paper/data_handlers look at
+EVENT_MESSAGES = [
+    "REST client sent bundle",
+    "Sending bundle succeeded",
+    "Sending bundle to a CLA (ConvergenceSender)",
+    "Received bundle from peer",
+    "Received bundle for local delivery",
+    "Starting routing decision",
+    "Routing decision finished",
+    "Selected routing algorithm",
+    "CADR: Is context bundle",
+    "Received metadata",
+]
+# dtnd's panics are not logged as JSON, but we want to know that a node crashed
+PANIC = "panic"
+
+FLOAT_COLUMNS = ["timestamp"]
+INT_COLUMNS = ["size", "meta_size"]
+STRING_COLUMNS = ["msg", "bundle", "node", "peer"]
+
+_event_messages = frozenset(EVENT_MESSAGES)
+_prefilter = re.compile(
+    "|".join(re.escape(msg) for msg in EVENT_MESSAGES + [PANIC]).encode()
+)
+
+
+class StringDictionary:
+    """Dictionary encoding for a string column"""
+
+    def __init__(self):
+        self.codes = {"": 0}
+        self.values = [""]
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+
+class EventColumns:
+    def __init__(self):
+        self.floats = {column: array.array("d") for column in FLOAT_COLUMNS}
+        self.ints = {column: array.array("q") for column in INT_COLUMNS}
+        self.strings = {column: array.array("I") for column in STRING_COLUMNS}
+        self.dictionaries = {column: StringDictionary() for column in STRING_COLUMNS}
+        self._seconds = {}
+
+    def __len__(self):
+        return len(self.floats["timestamp"])
+
+    def parse_time(self, timestamp):
+        """Seconds since the epoch of a logrus timestamp (e.g. 2020-10-01T12:00:00.123456789Z).
+
+        Like the analyses, the timezone is ignored. The whole seconds are cached, as consecutive
+        entries almost always share them.
+        """
+        seconds = self._seconds.get(timestamp[:19])
+        if seconds is None:
+            seconds = calendar.timegm(time.strptime(timestamp[:19], "%Y-%m-%dT%H:%M:%S"))
+            self._seconds[timestamp[:19]] = seconds
+
+        fraction = 0.0
+        if timestamp[19:20] == ".":
+            end = 20
+            while end < len(timestamp) and timestamp[end].isdigit():
+                end += 1
+            fraction = float(timestamp[19:end])
+        return seconds + fraction
+
+    def append(self, timestamp, msg, node, bundle="", size=-1, peer="", meta_size=-1):
+        self.floats["timestamp"].append(timestamp)
+        self.ints["size"].append(size)
+        self.ints["meta_size"].append(meta_size)
+        self.strings["msg"].append(self.dictionaries["msg"].encode(msg))
+        self.strings["bundle"].append(self.dictionaries["bundle"].encode(bundle))
+        self.strings["node"].append(self.dictionaries["node"].encode(node))
+        self.strings["peer"].append(self.dictionaries["peer"].encode(peer))
+
+    def add_entry(self, entry, node):
+        peer = ""
+        cla = entry.get("cla")
+        if isinstance(cla, dict) and cla.get("address"):
+            peer = cla["address"].replace("/", "").replace("dtn:", "")
+
+        self.append(
+            timestamp=self.parse_time(entry["time"]),
+            msg=entry["msg"],
+            node=node,
+            bundle=str(entry.get("bundle", "")),
+            size=int(entry.get("size", -1)),
+            peer=peer,
+            meta_size=int(entry.get("Metadata Size", -1)),
+        )
+
+    def write(self, path):
+        def to_little_endian(values):
+            if sys.byteorder != "little":
+                values = array.array(values.typecode, values)
+                values.byteswap()
+            return values.tobytes()
+
+        with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for column, values in self.floats.items():
+                archive.writestr(f"{column}.f8", to_little_endian(values))
+            for column, values in self.ints.items():
+                archive.writestr(f"{column}.i8", to_little_endian(values))
+            for column, values in self.strings.items():
+                archive.writestr(f"{column}.u4", to_little_endian(values))
+                archive.writestr(
+                    f"{column}.json", json.dumps(self.dictionaries[column].values)
+                )
+
+
+def parse_dtnd_log(path, node, columns):
+    """Add the interesting events of one node's dtnd log.
+
+    Lines are matched against the message texts as bytes before any JSON decoding,
+    so the bulk of the debug output is skipped cheaply.
+    """
+    with open(path, "rb") as f:
+        for line in f:
+            match = _prefilter.search(line)
+            if match is None:
+                continue
+
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                if match.group() == PANIC.encode():
+                    # the panic has no timestamp of its own, use the one of the last event
+                    last = columns.floats["timestamp"][-1] if len(columns) else 0.0
+                    columns.append(timestamp=last, msg=PANIC, node=node)
+                continue
+
+            if not isinstance(entry, dict) or entry.get("msg") not in _event_messages:
+                continue
+
+            try:
+                columns.add_entry(entry, node=node)
+            except (KeyError, ValueError, TypeError):
+                continue
+
+
+def convert_dtnd_logs(instance_path, log_paths):
+    """Write the events of all the given dtnd logs to <instance_path>/dtnd_events.zip
+
+    Returns:
+        Path of the written event file
+    """
+    columns = EventColumns()
+    for log_path in sorted(log_paths):
+        node = os.path.basename(log_path).split(".")[0]
+        parse_dtnd_log(log_path, node=node, columns=columns)
+
+    events_path = os.path.join(instance_path, EVENTS_FILE)
+    columns.write(events_path)
+    return events_path
@@ -1,11 +1,67 @@
 from time import time
+import os
 import sys
 import json
+import resource
+import threading
+import contextlib
 import parameters
 
+RESULT_TMP = "result_tmp.json"
+MESSAGE_TMP = "message_tmp.json"
+BUFFER_SIZE = 1000
+FSYNC_INTERVAL = 10
+SERIES_BLOCK_SIZE = 10000
+# measurement keys of phase timers, experiments must not record their own values under this prefix
+PHASE_PREFIX = "phase."
+
+
+class _JsonLinesWriter:
+    """Appends JSON objects to a file, one per line.
+
+    At most BUFFER_SIZE objects are kept in memory, and they are written and fsynced at least every
+    FSYNC_INTERVAL seconds (checked whenever something is appended), so a crashed run loses little.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.buffer = []
+        self.file = None
+        self.lastSync = time()
+        # phases (e.g. log collection during teardown) may record from other threads
+        self.lock = threading.RLock()
+
+    def append(self, obj):
+        line = json.dumps(obj)
+        with self.lock:
+            self.buffer.append(line)
+            if len(self.buffer) >= BUFFER_SIZE or time() - self.lastSync >= FSYNC_INTERVAL:
+                self.flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if self.file is None:
+            self.file = open(self.path, "a")
+        if self.buffer:
+            self.file.write("\n".join(self.buffer) + "\n")
+            self.buffer = []
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.lastSync = time()
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            self.file.close()
+            self.file = None
+
+
 startTime = 0
-measurements = []
-messages = []
+measurements = _JsonLinesWriter(RESULT_TMP)
+messages = _JsonLinesWriter(MESSAGE_TMP)
 
 
 def _timeInMilliseconds():
@@ -17,9 +73,8 @@ def _offsetFromStart():
 
 
 def start():
-    global startTime, measurements
+    global startTime
     startTime = _timeInMilliseconds()
-    measurements = []
     parameters.requestedParams.add("simId")
     parameters.requestedParams.add("simInstanceId")
 
@@ -47,11 +102,13 @@ def log(key, message):
 
 
 def addLogfile(filename):
-    try:
-        with open(filename, "r") as myfile:
-            log(filename, myfile.read())
-    except IOError:
+    """Store a log file by reference: it is uploaded as binary file, the messages only contain its name"""
+    if not os.path.isfile(filename):
         warn(filename, "IO Error while adding logfile with MACI.")
+        return
+
+    addBinaryFile(filename)
+    log(filename, f"logfile {filename}")
 
 
 def addBinaryFile(filename):
@@ -78,32 +135,151 @@ def is_number(s):
     try:
         float(s)
         return True
-    except ValueError:
+    except (TypeError, ValueError):
         return False
 
 
-def record(key, value, offset=None, key1=None, key2=None):
-    if offset is not None:
-        offset = int(offset)
+def _as_list(values):
+    """Plain Python list of the values; NumPy arrays are converted in one go and keep their number types"""
+    if hasattr(values, "tolist"):
+        return values.tolist()
+    return list(values)
+
+
+def record_series(key, offsets, values, key1=None, key2=None):
+    """Record many values of one key at once.
+
+    Args:
+        key: Measurement key
+        offsets: Offsets in milliseconds (NumPy array or iterable), a single offset for all values,
+                 or None to use the current offset
+        values: Numbers to record (NumPy array or iterable)
+        key1, key2: Optional secondary keys
+
+    The series is written as columnar blocks of at most SERIES_BLOCK_SIZE values, which are only expanded
+    into single measurements by stop().
+    """
+    values = _as_list(values)
+    if offsets is None:
+        offsets = [_offsetFromStart()] * len(values)
+    elif is_number(offsets):
+        offsets = [int(offsets)] * len(values)
     else:
+        offsets = [int(offset) for offset in _as_list(offsets)]
+
+    if len(offsets) != len(values):
+        warn("record", f"{key}: got {len(offsets)} offsets for {len(values)} values")
+        return
+
+    for value in values:
+        if not isinstance(value, (int, float)) and not is_number(value):
+            warn("record", "can not add " + str(value) + " for records")
+            # breaks current work of Nikolas, but activate soon
+            # return
+
+    # anything else (NumPy scalars, Decimal, ...) is stored as its string, which is what ends up in result.json
+    values = [value if isinstance(value, (int, float, str)) else str(value) for value in values]
+
+    if str(key).startswith(PHASE_PREFIX):
+        warn("record", f"{key}: keys starting with {PHASE_PREFIX} are reserved for phase timers")
+        return
+
+    _append_series(key, offsets, values, key1=key1, key2=key2)
+
+
+def _append_series(key, offsets, values, key1=None, key2=None):
+    for start in range(0, len(values), SERIES_BLOCK_SIZE):
+        measurements.append(
+            {
+                "key": str(key),
+                "key1": str(key1),
+                "key2": str(key2),
+                "offsets": offsets[start : start + SERIES_BLOCK_SIZE],
+                "values": values[start : start + SERIES_BLOCK_SIZE],
+            }
+        )
+
+
+def record(key, value, offset=None, key1=None, key2=None):
+    if offset is None:
         offset = _offsetFromStart()
-    # value = value.strip()
-    if not is_number(value):
-        warn("record", "can not add " + str(value) + " for records")
-        # breaks current work of Nikolas, but activate soon
-        # return
+    record_series(key, [offset], [value], key1=key1, key2=key2)
 
-    measurements.append(
-        {
-            "key": str(key),
-            "offset": offset,
-            "value": str(value),
-            "key1": str(key1),
-            "key2": str(key2),
-        }
+
+def _cpuTime():
+    self_usage = resource.getrusage(resource.RUSAGE_SELF)
+    children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return (
+        self_usage.ru_utime
+        + self_usage.ru_stime
+        + children_usage.ru_utime
+        + children_usage.ru_stime
     )
 
 
+def _resetPeakRss():
+    """Reset the process' peak RSS (VmHWM), possible since Linux 4.0"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except IOError:
+        return False
+
+
+def _peakRss():
+    """Peak RSS in bytes since the last reset, or of the whole process lifetime if resetting is not possible"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except IOError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+_activePhases = 0
+_phaseLock = threading.Lock()
+
+
+class phase(contextlib.ContextDecorator):
+    """Times a phase of the experiment, as context manager (with framework.phase("run"): ...) or decorator.
+
+    Records wall clock time (s), CPU time of this process and its waited-for children (s) and peak RSS (bytes)
+    as phase.<name> with key1 wall, cpu and peak_rss. The peak RSS is only reset at the start of a phase if no
+    other phase is running at the same time, otherwise it covers the enclosing phase as well.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        global _activePhases
+        with _phaseLock:
+            if _activePhases == 0:
+                _resetPeakRss()
+            _activePhases += 1
+
+        self.offset = _offsetFromStart()
+        self.wallStart = time()
+        self.cpuStart = _cpuTime()
+        return self
+
+    def __exit__(self, *exc):
+        global _activePhases
+        wall = time() - self.wallStart
+        cpu = _cpuTime() - self.cpuStart
+        peakRss = _peakRss()
+        with _phaseLock:
+            _activePhases -= 1
+
+        key = PHASE_PREFIX + self.name
+        for metric, value in (("wall", wall), ("cpu", cpu), ("peak_rss", peakRss)):
+            _append_series(key, [self.offset], [value], key1=metric)
+        return False
+
+
 def checkRequestedParams():
     for (paramKey, paramValue) in [
         (k, v)
@@ -116,31 +292,49 @@ def checkRequestedParams():
         )
 
 
-def loadTmpResults():
-    try:
-        with open("result_tmp.json", "r") as file:
-            for line in file:
-                measurements.append(json.loads(line))
-    except IOError:
-        pass
+def _expand_series(block):
+    for offset, value in zip(block["offsets"], block["values"]):
+        yield {
+            "key": block["key"],
+            "offset": offset,
+            "value": str(value),
+            "key1": block["key1"],
+            "key2": block["key2"],
+        }
 
 
-def loadTmpMessages():
-    try:
-        with open("message_tmp.json", "r") as file:
-            for line in file:
-                messages.append(json.loads(line))
-    except IOError:
-        pass
+def _finalise(tmp_path, result_path, expand=False):
+    """Turn the JSON lines written during the run into the JSON array MACI expects, without loading them.
+
+    If expand is set, series blocks written by record_series are expanded into single measurements.
+    """
+    with open(result_path, "w") as result:
+        result.write("[")
+        try:
+            with open(tmp_path, "r") as tmp:
+                separator = ""
+                for line in tmp:
+                    line = line.strip()
+                    if not line:
+                        continue
+
+                    if expand and '"offsets": ' in line:
+                        for measurement in _expand_series(json.loads(line)):
+                            result.write(separator + json.dumps(measurement))
+                            separator = ", "
+                        continue
+
+                    result.write(separator + line)
+                    separator = ", "
+        except IOError:
+            pass
+        result.write("]")
 
 
 def stop():
     checkRequestedParams()
-    loadTmpResults()
-    loadTmpMessages()
-
-    with open("result.json", "w") as file:
-        json.dump(measurements, file)
+    measurements.close()
+    messages.close()
 
-    with open("messages.json", "w") as file:
-        json.dump(messages, file)
+    _finalise(RESULT_TMP, "result.json", expand=True)
+    _finalise(MESSAGE_TMP, "messages.json")
@@ -1,19 +1,23 @@
-import os
 import uuid
 
+from cadrhelpers.payload_store import PayloadStore
+
+# payloads handed out by create_payload, released again by cleanup_payloads
+_payloads = []
 
-def cleanup_payloads() -> None:
-    dir_name = "/tmp/"
-    files = os.listdir(dir_name)
 
-    for item in files:
-        if item.endswith(".file"):
-            os.remove(os.path.join(dir_name, item))
+def cleanup_payloads() -> None:
+    """Release the payloads created by create_payload, the store removes those nobody else uses"""
+    store = PayloadStore()
+    while _payloads:
+        store.release(_payloads.pop())
 
 
-def create_payload(size: int) -> str:
+def create_payload(size: int, seed=None) -> str:
+    """Path of a new file with size random bytes, reproducible by seed (a fresh random seed if None)"""
+    if seed is None:
+        seed = uuid.uuid4().hex
     path = f"/tmp/{uuid.uuid4()}.file"
-
-    with open(path, "wb") as f:
-        f.write(os.urandom(size))
+    PayloadStore().link(target=path, size=size, seed=seed, alphabet=None)
+    _payloads.append(path)
     return path
@@ -1,8 +1,29 @@
 import os
+import re
+import csv
+import zlib
 import shutil
+import hashlib
 import pathlib
+import zipfile
+
+from concurrent.futures import ThreadPoolExecutor
 
 import framework
+from dtnd_events import convert_dtnd_logs
+from resource_sampler import RESOURCES_FILE, convert_resources
+
+# files bigger than this are split into chunks
+CHUNK_SIZE = 20000000
+READ_SIZE = 1 << 20
+MIN_READ_SIZE = 1 << 16
+COPY_BUFFER_SIZE = 1 << 20
+MANIFEST = "manifest.csv"
+
+# files directly in the session directory which are collected as well
+session_files = [
+    RESOURCES_FILE,
+]
 
 excluded_files = [
     # DTN7
@@ -11,44 +32,185 @@ excluded_files = [
 ]
 
 
-def prepare_log_file(input_file):
-    total_file_size = os.path.getsize(input_file)
+def _read_block(src, size: int = READ_SIZE) -> bytes:
+    """Read about size bytes, extended to the end of the current line so that frames never split a line"""
+    block = src.read(size)
+    if block and not block.endswith(b"\n"):
+        block += src.readline()
+    return block
+
+
+def _deflate_bound(length: int) -> int:
+    """Upper bound of the compressed size of length bytes plus the gzip trailer (stored blocks at worst)"""
+    return length + 5 * (length // 16383 + 1) + 16
+
+
+def _read_size(budget: int) -> int:
+    """How much to read for a frame with budget compressed bytes left, so that the block surely still fits
+    (including the rest of its last line, if that is shorter than 4 KiB)"""
+    return max(MIN_READ_SIZE, min(READ_SIZE, budget - budget // 1000 - 4096))
+
+
+def compress_log_file(input_file, frame_size=CHUNK_SIZE, compresslevel=6):
+    """Compress a file into a series of independently decompressible gzip frames.
+
+    Every frame contains whole lines and stays below frame_size bytes. An index with the uncompressed offset
+    and length of each frame is written to <input_file>.index.csv.
+
+    Returns:
+        Paths of all frames, followed by the path of the index
+    """
+    frames = []
+    index = []
+    offset = 0
+
+    with open(input_file, "rb") as src:
+        block = _read_block(src, _read_size(frame_size))
+        while block:
+            frame_path = "{}_chunk{}.gz".format(input_file, len(frames))
+            frame_start = offset
+
+            # gzip container (wbits 16 + 15). Z_SYNC_FLUSH after every block hands out all compressed data
+            # so far, so the bytes written are exact and the frame can be closed just before frame_size
+            compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, 31)
+            written = 0
+            with open(frame_path, "wb") as raw_file:
+                while True:
+                    written += raw_file.write(compressor.compress(block) + compressor.flush(zlib.Z_SYNC_FLUSH))
+                    offset += len(block)
+                    block = _read_block(src, _read_size(frame_size - written))
+                    if not block or written + _deflate_bound(len(block)) > frame_size:
+                        break
+                raw_file.write(compressor.flush())
 
-    if total_file_size > 20000000:
-        too_big_file = open(input_file, "rb")
+            frames.append(frame_path)
+            index.append(
+                (
+                    os.path.basename(frame_path),
+                    frame_start,
+                    offset - frame_start,
+                    os.path.getsize(frame_path),
+                )
+            )
 
-        def get_chunk():
-            return too_big_file.read(20000000)
+    index_path = "{}.index.csv".format(input_file)
+    with open(index_path, "w", newline="") as index_file:
+        writer = csv.writer(index_file)
+        writer.writerow(["frame", "offset", "length", "compressed_size"])
+        writer.writerows(index)
 
-        chunk_count = 0
-        for chunk in iter(get_chunk, ""):
-            chunk_path = "{}_chunk{}".format(input_file, chunk_count)
-            with open(chunk_path, "wb") as chunk_file:
-                chunk_file.write(chunk)
-                framework.addBinaryFile(chunk_path)
-            chunk_count = chunk_count + 1
+    return frames + [index_path]
 
-        too_big_file.close()
 
+def prepare_log_file(input_file, compress=False):
+    """Register a file with MACI. Files bigger than CHUNK_SIZE (or all files, if compress is set)
+    are stored as compressed frames instead."""
+    if compress or os.path.getsize(input_file) > CHUNK_SIZE:
+        for frame_path in compress_log_file(input_file):
+            framework.addBinaryFile(frame_path)
     else:
         framework.addBinaryFile(input_file)
 
 
+def prepare_log_files(input_files, compress=False, workers=None):
+    """Same as prepare_log_file for many files, compressing them in parallel.
+
+    zlib releases the GIL, so a thread pool is enough. Files are registered in the main thread,
+    in the order they were given.
+    """
+    input_files = list(input_files)
+
+    def needs_compression(input_file):
+        return compress or os.path.getsize(input_file) > CHUNK_SIZE
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        results = [
+            pool.submit(compress_log_file, input_file) if needs_compression(input_file) else None
+            for input_file in input_files
+        ]
+
+        for input_file, result in zip(input_files, results):
+            if result is None:
+                framework.addBinaryFile(input_file)
+                continue
+
+            for frame_path in result.result():
+                framework.addBinaryFile(frame_path)
+
+
+_blacklist_pattern = re.compile("|".join(re.escape(elem) for elem in excluded_files))
+
+
 def _is_blacklisted(name):
-    for elem in excluded_files:
-        if elem in name:
-            return True
+    return _blacklist_pattern.search(name) is not None
 
-    return False
 
+def _copy_file(src_file_path, dst_file_path):
+    """Copy inside the kernel with copy_file_range, falling back to sendfile and finally a userspace copy"""
+    with open(src_file_path, "rb") as src, open(dst_file_path, "wb") as dst:
+        remaining = os.fstat(src.fileno()).st_size
+        try:
+            while remaining > 0:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+            return
+        except (AttributeError, OSError):
+            pass
+
+        try:
+            while remaining > 0:
+                copied = os.sendfile(dst.fileno(), src.fileno(), None, remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+            return
+        except (AttributeError, OSError):
+            pass
+
+        shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+
+
+def _checksum(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(COPY_BUFFER_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _move_log(src_file_path, dst_file_path, same_device):
+    """Move a single log, by renaming it if possible, and return (size, checksum) of the result"""
+    moved = False
+    if same_device:
+        try:
+            os.rename(src_file_path, dst_file_path)
+            moved = True
+        except OSError:
+            pass
+
+    if not moved:
+        _copy_file(src_file_path, dst_file_path)
+        os.remove(src_file_path)
+
+    return os.path.getsize(dst_file_path), _checksum(dst_file_path)
+
+
+def _find_logs(session_dir):
+    """All files inside the <nodename>.conf folders and the session_files, skipping blacklisted directories
+    (e.g. dtnd's stores) entirely"""
+    session_dir_trailing = f"{session_dir}/"
+    for root, dirs, files in os.walk(session_dir):
+        dirs[:] = [d for d in dirs if not _is_blacklisted(os.path.join(root, d))]
 
-def collect_logs(session_dir: str, sim_path: str, instance_id: str) -> None:
-    instance_path = f"{sim_path}/{instance_id}"
-    pathlib.Path(instance_path).mkdir(parents=True, exist_ok=True)
-    for root, _, files in os.walk(session_dir):
         for f in files:
             src_file_path = os.path.join(root, f)
 
+            if root == session_dir and f in session_files:
+                yield src_file_path, f
+                continue
+
             # Ignore all files outside the <nodename>.conf folder
             if ".conf" not in src_file_path:
                 continue
@@ -56,15 +218,91 @@ def collect_logs(session_dir: str, sim_path: str, instance_id: str) -> None:
             if _is_blacklisted(src_file_path):
                 continue
 
-            session_dir_trailing = f"{session_dir}/"
             new_file_name = src_file_path.replace(session_dir_trailing, "").replace(
                 "/", "_"
             )
-            dst_file_path = f"{instance_path}/{new_file_name}"
+            yield src_file_path, new_file_name
+
+
+def write_manifest(instance_path, entries):
+    """Write <instance_path>/manifest.csv with one (name, node, size, checksum) row per collected file"""
+    with open(os.path.join(instance_path, MANIFEST), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "node", "size", "checksum"])
+        writer.writerows(sorted(entries))
+
+
+def stage_logs(session_dir, staging_dir):
+    """Rename all node logs into staging_dir (on the same file system), keeping their paths relative to session_dir.
+
+    This takes no time and makes the logs independent of the session directory, so that collect_logs(staging_dir, ...)
+    can run while CORE tears the session down.
+    """
+    for src_file_path, _ in _find_logs(session_dir):
+        dst_file_path = os.path.join(staging_dir, os.path.relpath(src_file_path, session_dir))
+        os.makedirs(os.path.dirname(dst_file_path), exist_ok=True)
+        os.rename(src_file_path, dst_file_path)
+
+
+def collect_logs(
+    session_dir: str,
+    sim_path: str,
+    instance_id: str,
+    archive: bool = False,
+    workers: int = 0,
+) -> None:
+    """Move all node logs to <sim_path>/<instance_id> on a thread pool and write a manifest of the collected files.
+
+    If archive is set, the collected logs are additionally compressed into frames and registered with MACI.
+    """
+    instance_path = f"{sim_path}/{instance_id}"
+    pathlib.Path(instance_path).mkdir(parents=True, exist_ok=True)
+    same_device = os.stat(session_dir).st_dev == os.stat(instance_path).st_dev
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        moves = [
+            (
+                new_file_name,
+                pool.submit(
+                    _move_log,
+                    src_file_path,
+                    f"{instance_path}/{new_file_name}",
+                    same_device,
+                ),
+            )
+            for src_file_path, new_file_name in _find_logs(session_dir)
+        ]
 
+        collected = []
+        manifest = []
+        for new_file_name, move in moves:
             try:
-                shutil.move(src_file_path, dst_file_path)
+                size, checksum = move.result()
             except IOError:
                 continue
 
+            collected.append(f"{instance_path}/{new_file_name}")
+            node = new_file_name.split(".")[0] if ".conf" in new_file_name else ""
+            manifest.append((new_file_name, node, size, checksum))
+
+    write_manifest(instance_path, manifest)
+
+    # convert dtnd's debug logs once, so that analyses don't have to parse gigabytes of JSON
+    try:
+        convert_dtnd_logs(
+            instance_path, [path for path in collected if path.endswith("dtnd_run.log")]
+        )
+    except (IOError, ValueError) as err:
+        framework.warn("collect_logs", f"Could not convert dtnd logs: {err}")
+
+    # the analyses still read the files of the per-node pidstat and bwm-ng processes the sampler replaced
+    if f"{instance_path}/{RESOURCES_FILE}" in collected:
+        try:
+            convert_resources(instance_path)
+        except (IOError, ValueError, KeyError, zipfile.BadZipFile) as err:
+            framework.warn("collect_logs", f"Could not convert resource samples: {err}")
+
+    if archive:
+        prepare_log_files(collected, compress=True)
+
     prepare_log_file("parameters.py")
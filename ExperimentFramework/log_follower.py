@@ -0,0 +1,246 @@
+"""Follows many (dtnd) log files at once and notifies registered waiters about matching lines."""
+
+import os
+import json
+import time
+import struct
+import select
+import ctypes
+import ctypes.util
+import threading
+
+IN_MODIFY = 0x00000002
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")
+
+MIN_POLL_INTERVAL = 0.01
+MAX_POLL_INTERVAL = 1.0
+READ_SIZE = 1 << 20
+
+
+class _Inotify:
+    """Minimal ctypes binding to Linux' inotify, watching directories for modified and created files"""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.directories = {}
+
+    def watch(self, directory):
+        if directory in self.directories.values():
+            return
+        wd = self._add_watch(self.fd, os.fsencode(directory), IN_MODIFY | IN_CREATE)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+        self.directories[wd] = directory
+
+    def read_paths(self):
+        """Paths of all files changed since the last call"""
+        paths = set()
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return paths
+
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if wd in self.directories and name:
+                paths.add(os.path.join(self.directories[wd], os.fsdecode(name)))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Waiter:
+    """A registered wait for a line matching needle (bytes) and predicate (decoded JSON entry -> bool)"""
+
+    def __init__(self, path, needle, predicate, timeout):
+        self.path = path
+        self.needle = needle
+        self.predicate = predicate
+        self.deadline = time.time() + timeout if timeout is not None else None
+        self.event = threading.Event()
+        self.entry = None
+        self.timed_out = False
+
+    def wait(self):
+        """Block until the waiter matched or timed out. Returns the matching entry or None."""
+        self.event.wait()
+        return self.entry
+
+
+class _FollowedFile:
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.remainder = b""
+        self.waiters = []
+
+    def read_lines(self):
+        if self.file is None:
+            try:
+                self.file = open(self.path, "rb")
+            except FileNotFoundError:
+                return []
+
+        data = self.file.read(READ_SIZE)
+        if not data:
+            return []
+
+        lines = (self.remainder + data).split(b"\n")
+        self.remainder = lines.pop()
+        return lines
+
+
+class LogFollower:
+    """Follows many log files with a single thread.
+
+    Changes are detected with inotify, or by polling with an adaptive interval (between 10 ms and 1 s) if inotify
+    is not available. Lines are checked for the waiters' byte needles first and only decoded as JSON if a needle
+    matches. Files are read from the beginning when they are first followed; afterwards, each line is only
+    offered to the waiters registered at the time it is read.
+    """
+
+    def __init__(self, use_inotify=True):
+        self.files = {}
+        self.lock = threading.Lock()
+        self.thread = None
+        self.closed = False
+        self.wakeup_read, self.wakeup_write = os.pipe()
+
+        self.inotify = None
+        if use_inotify:
+            try:
+                self.inotify = _Inotify()
+            except (OSError, AttributeError):
+                self.inotify = None
+
+    def register(self, path, needle, predicate=None, timeout=None):
+        """Wait for a line of path containing needle for which predicate(entry) holds
+
+        Returns:
+            Waiter, call its wait() to block until the line was found or the timeout has passed
+        """
+        if isinstance(needle, str):
+            needle = needle.encode()
+        waiter = Waiter(path=path, needle=needle, predicate=predicate, timeout=timeout)
+
+        with self.lock:
+            followed = self.files.get(path)
+            if followed is None:
+                followed = _FollowedFile(path)
+                self.files[path] = followed
+                if self.inotify is not None:
+                    self.inotify.watch(os.path.dirname(os.path.abspath(path)))
+            followed.waiters.append(waiter)
+
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="log-follower", daemon=True)
+                self.thread.start()
+
+        os.write(self.wakeup_write, b"\0")
+        return waiter
+
+    def wait_for(self, path, needle, predicate=None, timeout=None):
+        return self.register(path, needle, predicate=predicate, timeout=timeout).wait()
+
+    def _process(self, followed):
+        """Read all new lines of a file and resolve its waiters. Returns whether there was new data."""
+        got_data = False
+        while followed.waiters:
+            lines = followed.read_lines()
+            if not lines:
+                break
+            got_data = True
+
+            for line in lines:
+                candidates = [waiter for waiter in followed.waiters if waiter.needle in line]
+                if not candidates:
+                    continue
+
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+
+                for waiter in candidates:
+                    if waiter.predicate is None or waiter.predicate(entry):
+                        waiter.entry = entry
+                        followed.waiters.remove(waiter)
+                        waiter.event.set()
+        return got_data
+
+    def _expire(self, now):
+        """Release timed out waiters and return the time until the next deadline"""
+        next_deadline = None
+        for followed in self.files.values():
+            for waiter in list(followed.waiters):
+                if waiter.deadline is None:
+                    continue
+                if waiter.deadline <= now:
+                    waiter.timed_out = True
+                    followed.waiters.remove(waiter)
+                    waiter.event.set()
+                elif next_deadline is None or waiter.deadline < next_deadline:
+                    next_deadline = waiter.deadline
+        return None if next_deadline is None else next_deadline - now
+
+    def _run(self):
+        poll_interval = MIN_POLL_INTERVAL
+        changed = None  # None means: check all files
+
+        while not self.closed:
+            with self.lock:
+                followed_files = [
+                    followed
+                    for path, followed in self.files.items()
+                    if followed.waiters and (changed is None or path in changed)
+                ]
+                got_data = False
+                for followed in followed_files:
+                    got_data = self._process(followed) or got_data
+                until_deadline = self._expire(time.time())
+
+            if self.inotify is not None:
+                timeout = MAX_POLL_INTERVAL
+            else:
+                poll_interval = MIN_POLL_INTERVAL if got_data else min(poll_interval * 2, MAX_POLL_INTERVAL)
+                timeout = poll_interval
+            if until_deadline is not None:
+                timeout = min(timeout, until_deadline)
+
+            descriptors = [self.wakeup_read]
+            if self.inotify is not None:
+                descriptors.append(self.inotify.fd)
+            ready, _, _ = select.select(descriptors, [], [], max(timeout, 0))
+
+            changed = None
+            if self.wakeup_read in ready:
+                os.read(self.wakeup_read, 4096)
+            elif self.inotify is not None:
+                # periodic wake ups (e.g. for deadlines) only have to look at files inotify reported
+                changed = self.inotify.read_paths() if ready else set()
+
+    def close(self):
+        self.closed = True
+        os.write(self.wakeup_write, b"\0")
+        if self.thread is not None:
+            self.thread.join()
+        for followed in self.files.values():
+            if followed.file is not None:
+                followed.file.close()
+        if self.inotify is not None:
+            self.inotify.close()
+        os.close(self.wakeup_read)
+        os.close(self.wakeup_write)
@@ -0,0 +1,29 @@
+"""Access to the network namespaces of CORE nodes from the framework's process"""
+
+import os
+import ctypes
+import ctypes.util
+
+CLONE_NEWNET = 0x40000000
+
+
+def enter_network_namespace(pid: int) -> bool:
+    """Move the calling thread (only) into the network namespace of the process pid"""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = os.open("/proc/{pid}/ns/net".format(**locals()), os.O_RDONLY)
+    except (OSError, AttributeError):
+        return False
+
+    try:
+        return libc.setns(fd, CLONE_NEWNET) == 0
+    finally:
+        os.close(fd)
+
+
+def namespace_inode(pid):
+    """Inode number of the network namespace of the process pid, which identifies the namespace"""
+    try:
+        return os.stat("/proc/{pid}/ns/net".format(**locals())).st_ino
+    except OSError:
+        return None
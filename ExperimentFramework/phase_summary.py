@@ -0,0 +1,114 @@
+"""Summarises the phase timers (framework.phase) of many instances, e.g. of a whole campaign.
+
+Every result.json below the given paths counts as one instance. For every phase, the table shows in how many
+instances it ran, its total and mean wall clock time, its share of the total wall clock time of all top level
+phases, its mean CPU time and its largest peak RSS.
+
+Usage: python3 phase_summary.py <campaign work dir or result.json> [...]
+"""
+
+import os
+import sys
+import json
+import argparse
+
+from framework import PHASE_PREFIX
+
+RESULT_FILE = "result.json"
+# phases of the experiment script, the others (e.g. teardown's stop_services) run within one of these
+TOP_LEVEL_PHASES = ("config", "payload", "startup", "readiness", "run", "teardown")
+
+
+def find_results(paths):
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for directory, _, files in os.walk(path):
+            if RESULT_FILE in files:
+                yield os.path.join(directory, RESULT_FILE)
+
+
+def read_phases(result_path):
+    """Phase measurements of one instance
+
+    Returns:
+        Dictionary of phase name to a dictionary of metric (wall, cpu, peak_rss) to its summed up value
+    """
+    with open(result_path, "r") as f:
+        measurements = json.load(f)
+
+    phases = {}
+    for measurement in measurements:
+        key = measurement.get("key", "")
+        if not key.startswith(PHASE_PREFIX):
+            continue
+        metric = measurement.get("key1")
+        value = float(measurement["value"])
+        values = phases.setdefault(key[len(PHASE_PREFIX):], {})
+        if metric == "peak_rss":
+            values[metric] = max(values.get(metric, 0), value)
+        else:
+            values[metric] = values.get(metric, 0) + value
+    return phases
+
+
+def summarise(result_paths):
+    """
+    Returns:
+        Number of instances and a list of rows (phase, instances, total wall h, mean wall s, share %, mean cpu s,
+        max peak RSS MiB)
+    """
+    per_phase = {}
+    instances = 0
+    for result_path in result_paths:
+        try:
+            phases = read_phases(result_path)
+        except (IOError, ValueError) as e:
+            print(f"Skipping {result_path}: {e}", file=sys.stderr)
+            continue
+        instances += 1
+        for name, values in phases.items():
+            per_phase.setdefault(name, []).append(values)
+
+    total_wall = sum(
+        values.get("wall", 0) for name in TOP_LEVEL_PHASES for values in per_phase.get(name, [])
+    )
+
+    rows = []
+    for name in sorted(per_phase, key=lambda name: (name not in TOP_LEVEL_PHASES, name)):
+        runs = per_phase[name]
+        wall = sum(values.get("wall", 0) for values in runs)
+        cpu = sum(values.get("cpu", 0) for values in runs)
+        peak_rss = max(values.get("peak_rss", 0) for values in runs)
+        rows.append(
+            (
+                name,
+                len(runs),
+                wall / 3600,
+                wall / len(runs),
+                100 * wall / total_wall if total_wall else 0,
+                cpu / len(runs),
+                peak_rss / (1 << 20),
+            )
+        )
+    return instances, rows
+
+
+def print_table(instances, rows):
+    print(f"{instances} instances")
+    print(
+        "{:<16} {:>9} {:>12} {:>12} {:>8} {:>11} {:>14}".format(
+            "phase", "instances", "total wall h", "mean wall s", "share %", "mean cpu s", "peak RSS MiB"
+        )
+    )
+    for row in rows:
+        print("{:<16} {:>9} {:>12.2f} {:>12.2f} {:>8.1f} {:>11.2f} {:>14.1f}".format(*row))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarise the phase timers of many experiment instances")
+    parser.add_argument("paths", nargs="+", help="result.json files or directories to search for them")
+    args = parser.parse_args()
+
+    print_table(*summarise(find_results(args.paths)))
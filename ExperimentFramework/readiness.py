@@ -0,0 +1,152 @@
+"""Waits until the dtnd of every node (or a quorum of them) accepts connections on its REST ports."""
+
+import os
+import math
+import time
+import socket
+import asyncio
+
+from concurrent.futures import ThreadPoolExecutor
+
+import framework
+
+from netns import enter_network_namespace
+
+AGENT_PORT = 8080
+ROUTING_PORT = 35043
+TIMEOUT = 300
+CONNECT_TIMEOUT = 1.0
+INITIAL_BACKOFF = 0.1
+MAX_BACKOFF = 2.0
+# written into the session directory once the barrier released, the traffic generators start from there
+TRAFFIC_START = "traffic_start"
+
+
+class ReadinessBarrier:
+    """Probes the REST ports of all nodes concurrently with asyncio.
+
+    The sockets are created by a thread inside the node's network namespace (a socket stays in the namespace
+    it was created in), the connection attempts run on the event loop. A node counts as ready once all of its
+    ports accept a connection; failed probes are retried with exponential backoff. The barrier releases as soon
+    as quorum nodes are ready (a fraction of all nodes if quorum <= 1, a number of nodes otherwise), or after
+    timeout seconds.
+    """
+
+    def __init__(
+        self,
+        nodes,
+        ports=(AGENT_PORT,),
+        quorum=1.0,
+        timeout=TIMEOUT,
+        connect_timeout=CONNECT_TIMEOUT,
+        initial_backoff=INITIAL_BACKOFF,
+        max_backoff=MAX_BACKOFF,
+    ):
+        """
+        Args:
+            nodes: Dictionary of node name to the pid of a process in the node's network namespace
+            ports: Ports to probe, dtnd only listens on ROUTING_PORT with cadr routing
+        """
+        self.nodes = nodes
+        self.ports = ports
+        if quorum <= 1:
+            self.required = math.ceil(quorum * len(nodes))
+        else:
+            self.required = min(int(quorum), len(nodes))
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+
+        self.start = None
+        self.ready = {}
+
+    def _socket_factory(self, pid):
+        """A single thread which lives in the node's namespace and creates the probe sockets"""
+        executor = ThreadPoolExecutor(max_workers=1)
+        if not executor.submit(enter_network_namespace, pid).result():
+            executor.shutdown()
+            raise OSError("Could not enter the network namespace of {pid}".format(**locals()))
+        return executor
+
+    async def _probe(self, loop, executor, port):
+        sock = await loop.run_in_executor(executor, socket.socket, socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        try:
+            await asyncio.wait_for(loop.sock_connect(sock, ("127.0.0.1", port)), self.connect_timeout)
+            return True
+        except (OSError, asyncio.TimeoutError):
+            return False
+        finally:
+            sock.close()
+
+    async def _wait_for_node(self, loop, name, pid):
+        executor = self._socket_factory(pid)
+        try:
+            backoff = self.initial_backoff
+            pending = list(self.ports)
+            while pending:
+                results = await asyncio.gather(*(self._probe(loop, executor, port) for port in pending))
+                pending = [port for port, ok in zip(pending, results) if not ok]
+                if pending:
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, self.max_backoff)
+
+            self.ready[name] = time.time() - self.start
+        finally:
+            executor.shutdown(wait=False)
+
+    async def _wait(self, loop):
+        probes = [
+            asyncio.ensure_future(self._wait_for_node(loop, name, pid)) for name, pid in self.nodes.items()
+        ]
+        deadline = self.start + self.timeout
+        try:
+            remaining = probes
+            while len(self.ready) < self.required and remaining:
+                done, remaining = await asyncio.wait(
+                    remaining, timeout=max(deadline - time.time(), 0), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    break
+                for probe in done:
+                    if probe.exception() is not None:
+                        print("Readiness probe failed: {}".format(probe.exception()))
+        finally:
+            for probe in probes:
+                probe.cancel()
+            await asyncio.gather(*probes, return_exceptions=True)
+
+    def wait(self):
+        """Block until the barrier releases
+
+        Returns:
+            Whether the quorum was reached
+        """
+        self.start = time.time()
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self._wait(loop))
+        finally:
+            loop.close()
+
+        reached = len(self.ready) >= self.required
+        print(
+            "{} of {} nodes ready after {:.2f}s".format(len(self.ready), len(self.nodes), time.time() - self.start)
+        )
+        return reached
+
+    def record(self):
+        """Record the time to ready of every node, nodes which never got ready are recorded as -1"""
+        for name in self.nodes:
+            framework.record("time_to_ready", self.ready.get(name, -1), key1=name)
+        framework.record("nodes_ready", len(self.ready))
+
+
+def write_traffic_start(path, start=None):
+    """Tell the traffic generators when to start, they wait for this file"""
+    start = time.time() if start is None else start
+    tmp_path = "{path}.tmp".format(**locals())
+    with open(tmp_path, "w") as f:
+        f.write("{:.6f}\n".format(start))
+    os.replace(tmp_path, path)
@@ -0,0 +1,557 @@
+"""Samples the CPU, memory and I/O of all node processes and the interface counters of all nodes, host-wide.
+
+Replaces a pidstat and a bwm-ng process per node: once per tick, /proc is scanned a single time, every process
+is attributed to a node by its network namespace, and /proc/<pid>/stat, /proc/<pid>/schedstat and /proc/<pid>/io
+of the node processes as well as /proc/<node pid>/net/dev of every node are read.
+
+The raw (cumulative) counters are written to a columnar zip archive (resources.zip) in chunks, so memory use does
+not grow with the duration of the run:
+
+    meta.json                                    host information and the sampling interval
+    <table>/<column>/<chunk>.f8 / .i8 / .u4      little-endian float64 / int64 / uint32 values of a chunk
+    <table>/<column>.json                        dictionary of a string column (stored as uint32 codes)
+
+with the tables "processes" and "interfaces". convert_resources turns an archive into the <node>.conf_pidstat
+and <node>.conf_bwm.csv files evaluation/paper/data_handlers/procmem.py and network.py read. Unlike pidstat -p ALL,
+every node's file only contains the processes of that node.
+
+Usage: python3 resource_sampler.py <instance path>    (converts <instance path>/resources.zip)
+"""
+
+import os
+import sys
+import json
+import time
+import array
+import socket
+import argparse
+import platform
+import threading
+import zipfile
+
+import framework
+from dtnd_events import StringDictionary
+from netns import namespace_inode
+
+RESOURCES_FILE = "resources.zip"
+INTERVAL = 1.0
+# ticks buffered in memory before they are written to the archive
+FLUSH_TICKS = 60
+
+PROCESS_FLOATS = ["timestamp"]
+PROCESS_INTS = [
+    "pid",
+    "uid",
+    "starttime",
+    "utime",
+    "stime",
+    "guest_time",
+    "wait_ns",
+    "minflt",
+    "majflt",
+    "vsize",
+    "rss",
+    "processor",
+    "blkio_ticks",
+    "read_bytes",
+    "write_bytes",
+    "cancelled_write_bytes",
+]
+PROCESS_STRINGS = ["node", "command"]
+
+INTERFACE_FLOATS = ["timestamp"]
+INTERFACE_INTS = ["rx_bytes", "rx_packets", "rx_errors", "tx_bytes", "tx_packets", "tx_errors"]
+INTERFACE_STRINGS = ["node", "iface"]
+
+# column order of pidstat -drush -h and of bwm-ng's csv output
+PIDSTAT_COLUMNS = [
+    "Time",
+    "UID",
+    "PID",
+    "%usr",
+    "%system",
+    "%guest",
+    "%wait",
+    "%CPU",
+    "CPU",
+    "minflt/s",
+    "majflt/s",
+    "VSZ",
+    "RSS",
+    "%MEM",
+    "StkSize",
+    "StkRef",
+    "kB_rd/s",
+    "kB_wr/s",
+    "kB_ccwr/s",
+    "iodelay",
+    "Command",
+]
+PIDSTAT_SUFFIX = "_pidstat"
+BWM_SUFFIX = "_bwm.csv"
+
+_TYPECODES = {"f8": "d", "i8": "q", "u4": "I"}
+
+
+def _to_little_endian(values):
+    if sys.byteorder != "little":
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class _Table:
+    """Columns of one table, written to the archive chunk by chunk"""
+
+    def __init__(self, name, floats, ints, strings):
+        self.name = name
+        self.columns = {}
+        for column in floats:
+            self.columns[column] = ("f8", array.array("d"))
+        for column in ints:
+            self.columns[column] = ("i8", array.array("q"))
+        for column in strings:
+            self.columns[column] = ("u4", array.array("I"))
+        self.dictionaries = {column: StringDictionary() for column in strings}
+        self.chunks = 0
+
+    def append(self, **values):
+        for column, (extension, data) in self.columns.items():
+            value = values[column]
+            if extension == "u4":
+                value = self.dictionaries[column].encode(value)
+            data.append(value)
+
+    def flush(self, archive):
+        if not len(self.columns["timestamp"][1]):
+            return
+        for column, (extension, data) in self.columns.items():
+            archive.writestr(f"{self.name}/{column}/{self.chunks:05d}.{extension}", _to_little_endian(data))
+            del data[:]
+        self.chunks += 1
+
+    def close(self, archive):
+        self.flush(archive)
+        for column, dictionary in self.dictionaries.items():
+            archive.writestr(f"{self.name}/{column}.json", json.dumps(dictionary.values))
+
+
+def read_table(archive, name):
+    """All columns of a table of a resources archive, string columns decoded
+
+    Returns:
+        Dictionary of column name to list of values
+    """
+    chunks = {}
+    dictionaries = {}
+    for member in sorted(archive.namelist()):
+        if not member.startswith(f"{name}/"):
+            continue
+        path = member[len(name) + 1:]
+        if path.endswith(".json"):
+            dictionaries[path[: -len(".json")]] = json.loads(archive.read(member))
+            continue
+
+        column, chunk = path.split("/")
+        extension = chunk.rsplit(".", 1)[1]
+        values = array.array(_TYPECODES[extension])
+        values.frombytes(archive.read(member))
+        if sys.byteorder != "little":
+            values.byteswap()
+        chunks.setdefault(column, array.array(values.typecode)).extend(values)
+
+    columns = {}
+    for column, values in chunks.items():
+        if column in dictionaries:
+            columns[column] = [dictionaries[column][code] for code in values]
+        else:
+            columns[column] = values
+    return columns
+
+
+def _read_stat(pid):
+    """Command and the fields after it of /proc/<pid>/stat (field n of proc(5) is fields[n - 3])"""
+    with open(f"/proc/{pid}/stat", "rb") as f:
+        data = f.read()
+    end = data.rfind(b")")
+    command = data[data.find(b"(") + 1 : end].decode(errors="replace")
+    return command, data[end + 2 :].split()
+
+
+def _read_wait_ns(pid):
+    try:
+        with open(f"/proc/{pid}/schedstat", "rb") as f:
+            return int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return -1
+
+
+def _read_io(pid):
+    """read_bytes, write_bytes and cancelled_write_bytes, -1 if /proc/<pid>/io is not accessible"""
+    io = {}
+    try:
+        with open(f"/proc/{pid}/io", "rb") as f:
+            for line in f:
+                key, _, value = line.partition(b":")
+                io[key] = int(value)
+    except (OSError, ValueError):
+        pass
+    return io.get(b"read_bytes", -1), io.get(b"write_bytes", -1), io.get(b"cancelled_write_bytes", -1)
+
+
+def read_net_dev(pid):
+    """Interface counters of the network namespace of pid
+
+    Returns:
+        Dictionary of interface name to (rx_bytes, rx_packets, rx_errors, tx_bytes, tx_packets, tx_errors)
+    """
+    counters = {}
+    with open(f"/proc/{pid}/net/dev", "r") as f:
+        for line in f.readlines()[2:]:
+            iface, _, values = line.partition(":")
+            values = values.split()
+            counters[iface.strip()] = (
+                int(values[0]),
+                int(values[1]),
+                int(values[2]),
+                int(values[8]),
+                int(values[9]),
+                int(values[10]),
+            )
+    return counters
+
+
+def _mem_total():
+    with open("/proc/meminfo", "r") as f:
+        for line in f:
+            if line.startswith("MemTotal:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+class ResourceSampler:
+    """Samples all node processes and interfaces every interval seconds on a background thread.
+
+    Args:
+        path: Where the archive is written
+        nodes: Dictionary of node name to the pid of a process in the node's network namespace (e.g. vnoded)
+    """
+
+    def __init__(self, path, nodes, interval=INTERVAL, flush_ticks=FLUSH_TICKS):
+        self.path = path
+        self.nodes = nodes
+        self.interval = interval
+        self.flush_ticks = flush_ticks
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+
+        self.namespaces = {namespace_inode(pid): name for name, pid in nodes.items()}
+        self.namespaces.pop(None, None)
+        # pid -> (node, uid) for node processes and None for all others, so /proc/<pid>/ns is read once per process
+        self.known = {}
+
+        self.processes = _Table("processes", PROCESS_FLOATS, PROCESS_INTS, PROCESS_STRINGS)
+        self.interfaces = _Table("interfaces", INTERFACE_FLOATS, INTERFACE_INTS, INTERFACE_STRINGS)
+        self.archive = None
+        self.ticks = 0
+        self.tick_durations = []
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def _open(self):
+        self.archive = zipfile.ZipFile(self.path, "w", compression=zipfile.ZIP_DEFLATED)
+        meta = {
+            "hostname": socket.gethostname(),
+            "release": platform.release(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "clock_ticks": os.sysconf("SC_CLK_TCK"),
+            "mem_total": _mem_total(),
+            "interval": self.interval,
+            "nodes": sorted(self.nodes),
+        }
+        self.archive.writestr("meta.json", json.dumps(meta))
+
+    def _node_of(self, pid):
+        known = self.known.get(pid, False)
+        if known is False:
+            name = self.namespaces.get(namespace_inode(pid))
+            known = None
+            if name is not None:
+                try:
+                    known = (name, os.stat(f"/proc/{pid}").st_uid)
+                except OSError:
+                    pass
+            self.known[pid] = known
+        return known
+
+    def _sample_processes(self, timestamp):
+        pids = set()
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            pid = int(entry)
+            pids.add(pid)
+            known = self._node_of(pid)
+            if known is None:
+                continue
+
+            try:
+                command, fields = _read_stat(pid)
+            except (OSError, IndexError):
+                continue
+            read_bytes, write_bytes, cancelled_write_bytes = _read_io(pid)
+            self.processes.append(
+                timestamp=timestamp,
+                node=known[0],
+                command=command,
+                pid=pid,
+                uid=known[1],
+                starttime=int(fields[19]),
+                utime=int(fields[11]),
+                stime=int(fields[12]),
+                guest_time=int(fields[40]) if len(fields) > 40 else 0,
+                wait_ns=_read_wait_ns(pid),
+                minflt=int(fields[7]),
+                majflt=int(fields[9]),
+                vsize=int(fields[20]),
+                rss=int(fields[21]) * self.page_size,
+                processor=int(fields[36]),
+                blkio_ticks=int(fields[39]) if len(fields) > 39 else 0,
+                read_bytes=read_bytes,
+                write_bytes=write_bytes,
+                cancelled_write_bytes=cancelled_write_bytes,
+            )
+
+        # forget exited processes, so that reused pids are looked up again
+        for pid in set(self.known) - pids:
+            del self.known[pid]
+
+    def _sample_interfaces(self, timestamp):
+        for name, pid in self.nodes.items():
+            try:
+                counters = read_net_dev(pid)
+            except (OSError, IndexError, ValueError):
+                continue
+            for iface, values in counters.items():
+                rx_bytes, rx_packets, rx_errors, tx_bytes, tx_packets, tx_errors = values
+                self.interfaces.append(
+                    timestamp=timestamp,
+                    node=name,
+                    iface=iface,
+                    rx_bytes=rx_bytes,
+                    rx_packets=rx_packets,
+                    rx_errors=rx_errors,
+                    tx_bytes=tx_bytes,
+                    tx_packets=tx_packets,
+                    tx_errors=tx_errors,
+                )
+
+    def sample(self, timestamp=None):
+        """Take one sample of all nodes"""
+        if self.archive is None:
+            self._open()
+        start = time.time()
+        timestamp = start if timestamp is None else timestamp
+
+        self._sample_processes(timestamp)
+        self._sample_interfaces(timestamp)
+
+        self.ticks += 1
+        if self.ticks % self.flush_ticks == 0:
+            self.processes.flush(self.archive)
+            self.interfaces.flush(self.archive)
+        self.tick_durations.append(time.time() - start)
+
+    def _run(self):
+        next_tick = time.time()
+        while not self.stopped.wait(max(next_tick - time.time(), 0)):
+            self.sample()
+            next_tick += self.interval
+            # skip the ticks we missed instead of sampling them back to back
+            if next_tick < time.time():
+                next_tick = time.time() + self.interval
+
+    def start(self):
+        self._open()
+        self.thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop sampling and complete the archive, records the duration of the ticks"""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        if self.archive is None:
+            return
+
+        self.processes.close(self.archive)
+        self.interfaces.close(self.archive)
+        self.archive.close()
+        self.archive = None
+
+        if self.tick_durations:
+            framework.record(
+                "sampler_tick_duration", sum(self.tick_durations) / len(self.tick_durations), key1="mean"
+            )
+            framework.record("sampler_tick_duration", max(self.tick_durations), key1="max")
+
+
+def _pidstat_rows(processes, meta):
+    """pidstat rows per node and tick, rates are computed between consecutive samples of a process"""
+    clock_ticks = float(meta["clock_ticks"])
+    mem_total = float(meta["mem_total"]) or 1.0
+    previous = {}
+    rows = {}
+
+    for index in range(len(processes["timestamp"])):
+        sample = {column: values[index] for column, values in processes.items()}
+        key = (sample["node"], sample["pid"], sample["starttime"])
+        last = previous.get(key)
+        previous[key] = sample
+        if last is None:
+            continue
+
+        elapsed = sample["timestamp"] - last["timestamp"]
+        if elapsed <= 0:
+            continue
+
+        def rate(column, scale=1.0):
+            if sample[column] < 0 or last[column] < 0:
+                return -1.0
+            return (sample[column] - last[column]) / elapsed / scale
+
+        def percent(column):
+            return 100 * rate(column) / clock_ticks
+
+        usr = 100 * ((sample["utime"] - sample["guest_time"]) - (last["utime"] - last["guest_time"]))
+        row = [
+            int(sample["timestamp"]),
+            sample["uid"],
+            sample["pid"],
+            "{:.2f}".format(usr / elapsed / clock_ticks),
+            "{:.2f}".format(percent("stime")),
+            "{:.2f}".format(percent("guest_time")),
+            "{:.2f}".format(100 * rate("wait_ns", 1e9)),
+            "{:.2f}".format(percent("utime") + percent("stime")),
+            sample["processor"],
+            "{:.2f}".format(rate("minflt")),
+            "{:.2f}".format(rate("majflt")),
+            sample["vsize"] // 1024,
+            sample["rss"] // 1024,
+            "{:.2f}".format(100 * sample["rss"] / mem_total),
+            0,
+            0,
+            "{:.2f}".format(rate("read_bytes", 1024)),
+            "{:.2f}".format(rate("write_bytes", 1024)),
+            "{:.2f}".format(rate("cancelled_write_bytes", 1024)),
+            sample["blkio_ticks"] - last["blkio_ticks"],
+            # the analyses split rows at whitespace
+            sample["command"].replace(" ", "_"),
+        ]
+        rows.setdefault(sample["node"], {}).setdefault(sample["timestamp"], []).append(row)
+    return rows
+
+
+def write_pidstat(path, ticks, meta):
+    """Write pidstat -h output: a banner, then one block (header and rows) per tick, separated by blank lines"""
+    date = time.strftime("%m/%d/%Y", time.localtime(min(ticks))) if ticks else ""
+    with open(path, "w") as f:
+        f.write(
+            "Linux {release} ({hostname}) \t{date} \t_{machine}_\t({cpus} CPU)\n".format(date=date, **meta)
+        )
+        for timestamp in sorted(ticks):
+            f.write("\n# " + " ".join(PIDSTAT_COLUMNS) + "\n")
+            for row in ticks[timestamp]:
+                f.write(" ".join(str(value) for value in row) + "\n")
+
+
+def _bwm_rows(interfaces):
+    """bwm-ng csv rows (rates and amounts per interval) per node, with a total row per tick like bwm-ng"""
+    previous = {}
+    totals = {}
+    rows = {}
+
+    for index in range(len(interfaces["timestamp"])):
+        sample = {column: values[index] for column, values in interfaces.items()}
+        key = (sample["node"], sample["iface"])
+        last = previous.get(key)
+        previous[key] = sample
+        if last is None or sample["timestamp"] <= last["timestamp"]:
+            continue
+
+        elapsed = sample["timestamp"] - last["timestamp"]
+        deltas = [
+            sample[column] - last[column]
+            for column in ("rx_bytes", "tx_bytes", "rx_packets", "tx_packets", "rx_errors", "tx_errors")
+        ]
+        node_rows = rows.setdefault(sample["node"], [])
+        node_rows.append((sample["timestamp"], sample["iface"], elapsed, deltas))
+
+        total = totals.setdefault((sample["node"], sample["timestamp"]), [elapsed, [0] * len(deltas)])
+        total[1] = [a + b for a, b in zip(total[1], deltas)]
+
+    for (node, timestamp), (elapsed, deltas) in totals.items():
+        rows[node].append((timestamp, "total", elapsed, deltas))
+    return rows
+
+
+def write_bwm(path, rows):
+    with open(path, "w") as f:
+        for timestamp, iface, elapsed, deltas in sorted(rows, key=lambda row: (row[0], row[1] == "total")):
+            bytes_in, bytes_out, packets_in, packets_out, errors_in, errors_out = deltas
+            values = [
+                int(timestamp),
+                iface,
+                bytes_out / elapsed,
+                bytes_in / elapsed,
+                (bytes_in + bytes_out) / elapsed,
+                bytes_in,
+                bytes_out,
+                packets_out / elapsed,
+                packets_in / elapsed,
+                (packets_in + packets_out) / elapsed,
+                packets_in,
+                packets_out,
+                errors_out / elapsed,
+                errors_in / elapsed,
+                errors_in,
+                errors_out,
+            ]
+            f.write(";".join("{:.2f}".format(value) if isinstance(value, float) else str(value) for value in values))
+            f.write("\n")
+
+
+def convert_resources(instance_path, archive_path=None):
+    """Write <node>.conf_pidstat and <node>.conf_bwm.csv for every node of a resources archive
+
+    Returns:
+        Paths of the written files
+    """
+    archive_path = archive_path or os.path.join(instance_path, RESOURCES_FILE)
+    with zipfile.ZipFile(archive_path, "r") as archive:
+        meta = json.loads(archive.read("meta.json"))
+        processes = read_table(archive, "processes")
+        interfaces = read_table(archive, "interfaces")
+
+    written = []
+    if processes:
+        for node, ticks in _pidstat_rows(processes, meta).items():
+            path = os.path.join(instance_path, f"{node}.conf{PIDSTAT_SUFFIX}")
+            write_pidstat(path, ticks, meta)
+            written.append(path)
+    if interfaces:
+        for node, rows in _bwm_rows(interfaces).items():
+            path = os.path.join(instance_path, f"{node}.conf{BWM_SUFFIX}")
+            write_bwm(path, rows)
+            written.append(path)
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a resources archive into pidstat and bwm-ng files")
+    parser.add_argument("instance_path", help="Directory with the resources archive, the files are written there")
+    parser.add_argument("--archive", help=f"Path of the archive, default <instance_path>/{RESOURCES_FILE}")
+    args = parser.parse_args()
+
+    for path in convert_resources(args.instance_path, archive_path=args.archive):
+        print(path)
@@ -0,0 +1,112 @@
+"""Admission control for running several experiment instances at once on one host.
+
+Every instance runs in its own process with its own session (the campaign runner starts the template once per
+instance), and its experiment config and payload live in its session directory (the CORE services pick up
+<session_dir>/experiment_config.toml, see cadrhelpers.cache). Instances are only started while the host has
+enough CPUs and memory for them. Every running instance holds a slot, the lowest index not taken by another running
+instance, which gives it its own share of the host's cores (see cadrhelpers.placement).
+"""
+
+import os
+import copy
+import threading
+
+PAYLOAD_FILE = "payload"
+# estimates for one instance of the responders scenario
+INSTANCE_CPUS = 2.0
+INSTANCE_MEMORY = 2 << 30
+# memory left to the host and the CORE daemon
+MEMORY_HEADROOM = 1 << 30
+
+
+class Instance:
+    """One experiment instance: its experiment config and the resources it is expected to use"""
+
+    def __init__(self, instance_id, config, cpus=INSTANCE_CPUS, memory=INSTANCE_MEMORY):
+        self.instance_id = instance_id
+        self.config = copy.deepcopy(config)
+        self.cpus = cpus
+        self.memory = memory
+        # set by Admission.admit while the instance runs
+        self.slot = None
+
+
+def available_memory():
+    """MemAvailable of /proc/meminfo in bytes"""
+    with open("/proc/meminfo", "r") as f:
+        for line in f:
+            if line.startswith("MemAvailable:"):
+                return int(line.split()[1]) * 1024
+    raise ValueError("MemAvailable missing in /proc/meminfo")
+
+
+class Admission:
+    """Admits instances while the reserved CPUs and memory of all running instances stay within the limits
+
+    By default, the limits are all CPUs of the host and its currently available memory minus a headroom.
+    Additionally, no instance is admitted while the memory actually available drops below the headroom.
+    """
+
+    def __init__(
+        self,
+        cpu_limit=None,
+        memory_limit=None,
+        max_instances=None,
+        memory_headroom=MEMORY_HEADROOM,
+        memory_probe=available_memory,
+    ):
+        self.memory_probe = memory_probe
+        self.memory_headroom = memory_headroom
+        self.cpu_limit = cpu_limit if cpu_limit is not None else float(os.cpu_count() or 1)
+        if memory_limit is None:
+            memory_limit = memory_probe() - memory_headroom
+        self.memory_limit = memory_limit
+        self.max_instances = max_instances
+
+        self.cpus = 0.0
+        self.memory = 0
+        self.running = 0
+        self.slots = set()
+        self.lock = threading.Lock()
+
+    def fits(self, instance):
+        """Whether the instance could ever be admitted"""
+        return instance.cpus <= self.cpu_limit and instance.memory <= self.memory_limit
+
+    def capacity(self, instance):
+        """How many instances like this one can run at once"""
+        capacity = int(min(self.cpu_limit // instance.cpus, self.memory_limit // instance.memory))
+        if self.max_instances is not None:
+            capacity = min(capacity, self.max_instances)
+        return max(capacity, 1)
+
+    def admit(self, instance):
+        """Reserve the instance's resources and assign it a slot if they fit
+
+        Returns:
+            Whether the instance was admitted
+        """
+        with self.lock:
+            if self.max_instances is not None and self.running >= self.max_instances:
+                return False
+            if self.cpus + instance.cpus > self.cpu_limit:
+                return False
+            if self.memory + instance.memory > self.memory_limit:
+                return False
+            if self.running and self.memory_probe() < self.memory_headroom:
+                return False
+
+            self.cpus += instance.cpus
+            self.memory += instance.memory
+            self.running += 1
+            instance.slot = min(set(range(len(self.slots) + 1)) - self.slots)
+            self.slots.add(instance.slot)
+            return True
+
+    def release(self, instance):
+        with self.lock:
+            self.cpus -= instance.cpus
+            self.memory -= instance.memory
+            self.running -= 1
+            self.slots.discard(instance.slot)
+            instance.slot = None
@@ -0,0 +1,163 @@
+"""Tears a CORE session down by waiting for the conditions that matter instead of sleeping."""
+
+import os
+import time
+import shutil
+import signal
+import threading
+import subprocess
+
+import framework
+
+from log_files import collect_logs, stage_logs
+from netns import namespace_inode
+
+from cadrhelpers.placement import remove_session_cgroups
+
+# processes stopped by the shutdown commands of our services, they have to flush their logs before we collect them
+LOGGING_PROCESSES = ("dtnd", "dtnd_log_filter", "node_agent", "node_helper")
+PROCESS_TIMEOUT = 10
+NAMESPACE_TIMEOUT = 30
+BRIDGE_TIMEOUT = 30
+SESSION_DIR_TIMEOUT = 30
+POLL_INTERVAL = 0.05
+MAX_POLL_INTERVAL = 0.5
+
+
+def wait_until(condition, timeout, poll_interval=POLL_INTERVAL):
+    """Poll condition() with a growing interval until it holds or timeout seconds have passed
+
+    Returns:
+        Whether the condition holds
+    """
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() >= deadline:
+            return False
+        time.sleep(poll_interval)
+        poll_interval = min(poll_interval * 2, MAX_POLL_INTERVAL)
+    return True
+
+
+def _process_names(pid):
+    """Basenames of the process' command line arguments
+
+    The command name (comm) of a script is its interpreter's, so dtnd_log_filter is matched by the
+    script path in "python3 /usr/local/sbin/dtnd_log_filter" instead.
+    """
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            arguments = f.read().split(b"\0")
+    except OSError:
+        return set()
+    return {os.path.basename(argument.decode(errors="replace")) for argument in arguments if argument}
+
+
+def processes_in_namespaces(namespaces, names=None):
+    """Pids of all processes in one of the given network namespaces (inode numbers), optionally only with the given names"""
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        if namespace_inode(entry) not in namespaces:
+            continue
+        if names is not None and not _process_names(entry) & set(names):
+            continue
+        pids.append(int(entry))
+    return pids
+
+
+def session_interfaces(session):
+    """Bridges and veths CORE created for the session, CORE ends their names with the short session id"""
+    if hasattr(session, "short_session_id"):
+        suffix = f".{session.short_session_id()}"
+    else:
+        suffix = f".{session.id:x}"
+    try:
+        return [name for name in os.listdir("/sys/class/net") if name.endswith(suffix)]
+    except OSError:
+        return []
+
+
+class Teardown:
+    """Stops a session and collects its logs.
+
+    1. DATACOLLECT_STATE runs the services' shutdown commands; we wait until their processes exited.
+    2. The logs are renamed out of the session directory and collected on a separate thread, while
+    3. CoreEmu shuts the session down; we wait until its namespaces, interfaces and session directory are gone.
+    If one of the conditions does not hold in time, what is left of this session is removed by force. Unlike
+    core-cleanup, this leaves other sessions on the host alone.
+    If the logs could not be collected, they are kept in the staging directory <session dir>.logs.
+    """
+
+    def __init__(self, coreemu, session):
+        self.coreemu = coreemu
+        self.session = session
+        self.timeouts = []
+
+    def _wait(self, name, condition, timeout):
+        if not wait_until(condition, timeout):
+            self.timeouts.append(name)
+            framework.warn("teardown", f"Timeout while waiting for {name}")
+
+    def _cleanup(self, namespaces, session_dir):
+        """Kill the session's remaining processes, delete its interfaces and remove its session directory"""
+        for pid in processes_in_namespaces(namespaces):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+        for name in session_interfaces(self.session):
+            subprocess.call(["ip", "link", "delete", name], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        shutil.rmtree(session_dir, ignore_errors=True)
+
+    def run(self, sim_path, instance_id):
+        from core.emulator.enumerations import EventTypes
+
+        start = time.time()
+        session_dir = self.session.session_dir
+        staging_dir = f"{session_dir}.logs"
+        node_pids = [node.pid for node in self.session.nodes.values() if getattr(node, "pid", None)]
+        namespaces = {namespace_inode(pid) for pid in node_pids} - {None}
+
+        with framework.phase("stop_services"):
+            self.session.set_state(EventTypes.DATACOLLECT_STATE)
+            self._wait(
+                "logging processes",
+                lambda: not processes_in_namespaces(namespaces, names=LOGGING_PROCESSES),
+                PROCESS_TIMEOUT,
+            )
+            stage_logs(session_dir=session_dir, staging_dir=staging_dir)
+
+        collect_errors = []
+
+        @framework.phase("collect_logs")
+        def collect():
+            try:
+                collect_logs(session_dir=staging_dir, sim_path=sim_path, instance_id=instance_id)
+            except Exception as e:
+                collect_errors.append(e)
+
+        collector = threading.Thread(target=collect, name="collect-logs")
+        collector.start()
+
+        with framework.phase("shutdown"):
+            self.coreemu.shutdown()
+            self._wait("namespaces", lambda: not processes_in_namespaces(namespaces), NAMESPACE_TIMEOUT)
+            self._wait("interfaces", lambda: not session_interfaces(self.session), BRIDGE_TIMEOUT)
+            self._wait("session directory", lambda: not os.path.exists(session_dir), SESSION_DIR_TIMEOUT)
+            if self.timeouts:
+                self._cleanup(namespaces, session_dir)
+            remove_session_cgroups(self.session.id)
+
+        collector.join()
+        if collect_errors:
+            framework.warn("teardown", f"Collecting the logs failed, keeping them in {staging_dir}: {collect_errors[0]!r}")
+        else:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+        duration = time.time() - start
+        print(f"Teardown took {duration:.2f}s")
+        framework.record("teardown_duration", duration)
+        framework.record("teardown_timeouts", len(self.timeouts))
+        return duration
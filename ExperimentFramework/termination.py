@@ -0,0 +1,160 @@
+"""Ends an experiment run as soon as nothing interesting can happen anymore."""
+
+import os
+import csv
+import time
+
+import framework
+
+from cadrhelpers.ledger import DELIVERY_LEDGER, SEND_LEDGER
+from cadrhelpers.store_sampler import STORE_LOG
+
+CHECK_INTERVAL = 10
+# dtnd's store is only sampled every few seconds, so quiescence needs a generous window
+QUIET_PERIOD = 30 * 60
+MAX_DURATION = 3600
+
+ALL_DELIVERED = "all_delivered"
+QUIESCENT = "quiescent"
+MAX_DURATION_REACHED = "max_duration"
+
+
+def expected_deliveries(nodes, bundles_per_node):
+    """Number of deliveries if every bundle of the traffic generators reaches all of its receivers
+
+    Civilians send to the coordinator, coordinators send announcements to all civilians.
+    """
+    civilians = len(nodes.civilians)
+    coordinators = len(nodes.coordinators)
+    return bundles_per_node * (civilians + coordinators * civilians)
+
+
+class _CsvFollower:
+    """Reads the rows appended to a CSV file (with a header line) since the last call"""
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.remainder = ""
+        self.header_read = False
+
+    def read_rows(self):
+        try:
+            with open(self.path, "r", newline="") as f:
+                f.seek(self.offset)
+                data = f.read()
+                self.offset = f.tell()
+        except FileNotFoundError:
+            return []
+
+        lines = (self.remainder + data).split("\n")
+        self.remainder = lines.pop()
+        rows = list(csv.reader(line for line in lines if line))
+        if rows and not self.header_read:
+            rows = rows[1:]
+            self.header_read = True
+        return rows
+
+
+class TerminationController:
+    """Watches the progress of a running CORE session and decides when to stop it.
+
+    The progress signals are the files the node helpers write into their node directories: the delivery and
+    send ledgers and the sampled sizes of dtnd's store. The run ends as soon as one of these holds:
+        - all expected bundles were delivered (only if expected is given)
+        - neither deliveries, sends nor store sizes changed for quiet_period seconds (after min_duration)
+        - max_duration seconds have passed
+    """
+
+    def __init__(
+        self,
+        session_dir,
+        expected=None,
+        quiet_period=QUIET_PERIOD,
+        min_duration=0,
+        max_duration=MAX_DURATION,
+        check_interval=CHECK_INTERVAL,
+    ):
+        self.session_dir = session_dir
+        self.expected = expected
+        self.quiet_period = quiet_period
+        self.min_duration = min_duration
+        self.max_duration = max_duration
+        self.check_interval = check_interval
+
+        self.followers = {}
+        self.deliveries = set()
+        self.sent = 0
+        self.store_sizes = {}
+        self.start = time.time()
+        self.last_change = self.start
+
+    def _follower(self, node_dir, filename):
+        path = os.path.join(node_dir, filename)
+        follower = self.followers.get(path)
+        if follower is None:
+            follower = _CsvFollower(path)
+            self.followers[path] = follower
+        return follower
+
+    def _node_dirs(self):
+        with os.scandir(self.session_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".conf") and entry.is_dir():
+                    yield entry.name.split(".")[0], entry.path
+
+    def update(self):
+        """Read the new progress signals. Returns whether anything changed."""
+        changed = False
+        for node, node_dir in self._node_dirs():
+            for row in self._follower(node_dir, DELIVERY_LEDGER).read_rows():
+                delivery = (node, row[0])
+                if delivery not in self.deliveries:
+                    self.deliveries.add(delivery)
+                    changed = True
+
+            sent = len(self._follower(node_dir, SEND_LEDGER).read_rows())
+            if sent:
+                self.sent += sent
+                changed = True
+
+            rows = self._follower(node_dir, STORE_LOG).read_rows()
+            if rows and self.store_sizes.get(node) != rows[-1][2]:
+                self.store_sizes[node] = rows[-1][2]
+                changed = True
+
+        if changed:
+            self.last_change = time.time()
+        return changed
+
+    def check(self):
+        """The reason to stop now, or None if the run should go on"""
+        self.update()
+        now = time.time()
+
+        if self.expected is not None and len(self.deliveries) >= self.expected:
+            return ALL_DELIVERED
+        if now - self.start >= self.min_duration and now - self.last_change >= self.quiet_period:
+            return QUIESCENT
+        if now - self.start >= self.max_duration:
+            return MAX_DURATION_REACHED
+        return None
+
+    def run(self):
+        """Block until a stop condition holds and record why and when the run was ended
+
+        Returns:
+            The stop reason
+        """
+        while True:
+            reason = self.check()
+            if reason is not None:
+                break
+            time.sleep(min(self.check_interval, max(self.start + self.max_duration - time.time(), 0)))
+
+        duration = time.time() - self.start
+        print(f"Stopping experiment after {duration:.0f}s: {reason}")
+        framework.record("termination_time", duration, key1=reason)
+        framework.record("termination_deliveries", len(self.deliveries), key1=reason)
+        framework.record("termination_sent", self.sent, key1=reason)
+        return reason
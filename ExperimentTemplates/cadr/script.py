@@ -3,33 +3,57 @@
 ### ENV int bundles_per_node "How many bundles should each sensor generate."
 
 import os
-import time
 import logging
 import pathlib
 import toml
 
-from random import choices
-from string import ascii_letters, digits
-
 from core.emulator.coreemu import CoreEmu, Session
 from core.emulator.enumerations import EventTypes
 from core.services import ServiceManager
 
 import framework
+from campaign import DATA_PATH_ENV, SESSIONS_ENV, SLOT_ENV
 from log_files import *
+from readiness import AGENT_PORT, ROUTING_PORT, TRAFFIC_START, ReadinessBarrier, write_traffic_start
+from resource_sampler import RESOURCES_FILE, ResourceSampler
+from scheduler import PAYLOAD_FILE
+from teardown import Teardown
+from termination import TerminationController, expected_deliveries
+
+from cadrhelpers.cache import SESSION_CONFIG
+from cadrhelpers.payload_store import ALPHANUMERIC, PayloadStore
+from cadrhelpers.util import parse_scenario_xml
 
 
-EXPERIMENT_CONFIG = "/dtn_routing/experiment_config.toml"
-DATA_PATH = "/research_data"
+# the campaign runner may collect the logs somewhere else
+DATA_PATH = os.environ.get(DATA_PATH_ENV, "/research_data")
 CORE_XML = "/dtn_routing/scenarios/responders/responders.xml"
-PAYLOAD_PATH = "/tmp/payload"
 JITTER = 30.0
 WIFI_RANGE = 275.0
+# node helpers fetch delivered bundles this often, bounds the error of the measured latency
+FETCH_INTERVAL = 5
+# node helpers sample the size of dtnd's store this often
+STORE_SAMPLE_INTERVAL = 10
+# pipe dtnd's output through dtnd_log_filter, which only keeps the messages needed for the evaluation
+LOG_FILTER = False
+# end the run early once nothing changed for this long (seconds), but never run longer than MAX_DURATION
+QUIET_PERIOD = 30 * 60
+MAX_DURATION = 3600
+# traffic starts once this fraction of the nodes' dtnds accept REST connections, or after READY_TIMEOUT seconds
+READY_QUORUM = 1.0
+READY_TIMEOUT = 300
+# pin every node to its own physical cores (cgroup v2 cpuset, or CPU affinity without cgroup v2),
+# optionally limited to NODE_CPU_QUOTA CPUs and NODE_MEMORY_MAX bytes (0 for no limit)
+PLACE_NODES = False
+NODE_CPU_QUOTA = 0
+NODE_MEMORY_MAX = 0
 
 
 if __name__ in ["__main__", "__builtin__"]:
+    framework.start()
+
     # generate experiment configuration
-    experiment_config = {"Scenario": {}, "Experiment": {}, "REST": {}}
+    experiment_config = {"Scenario": {}, "Experiment": {}, "REST": {}, "Logging": {}, "Placement": {}}
 
     # [Experiment]
     seed: int = {{seed}}
@@ -41,8 +65,9 @@ if __name__ in ["__main__", "__builtin__"]:
     experiment_config["Experiment"]["payload_size"] = payload_size
     bundles_per_node: int = {{bundles_per_node}}
     experiment_config["Experiment"]["bundles_per_node"] = bundles_per_node
-    experiment_config["Experiment"]["payload_path"] = PAYLOAD_PATH
     experiment_config["Experiment"]["generate_payload"] = False
+    experiment_config["Experiment"]["fetch_interval"] = FETCH_INTERVAL
+    experiment_config["Experiment"]["store_sample_interval"] = STORE_SAMPLE_INTERVAL
 
     # [Scenario]
     experiment_config["Scenario"]["xml"] = CORE_XML
@@ -53,16 +78,16 @@ if __name__ in ["__main__", "__builtin__"]:
     experiment_config["REST"]["agent_port"] = 8080
     experiment_config["REST"]["routing_port"] = 35043
 
-    # write experiment configuration
-    with open(EXPERIMENT_CONFIG, "w") as f:
-        toml.dump(experiment_config, f)
+    # [Logging]
+    experiment_config["Logging"]["filter"] = LOG_FILTER
 
-    # generate payload
-    payload: str = "".join(
-        choices(ascii_letters + digits, k={{payload_size}})
-    )
-    with open(PAYLOAD_PATH, "w") as f:
-        f.write(payload)
+    # [Placement]
+    experiment_config["Placement"]["enabled"] = PLACE_NODES
+    experiment_config["Placement"]["cpu_quota"] = NODE_CPU_QUOTA
+    experiment_config["Placement"]["memory_max"] = NODE_MEMORY_MAX
+    # instances run concurrently by the campaign runner get disjoint cores
+    experiment_config["Placement"]["sessions"] = int(os.environ.get(SESSIONS_ENV, 1))
+    experiment_config["Placement"]["slot"] = int(os.environ.get(SLOT_ENV, 0))
 
     sim_id: str = {{simId}}
     sim_instance_id: str = {{simInstanceId}}
@@ -70,35 +95,80 @@ if __name__ in ["__main__", "__builtin__"]:
     sim_path: str = f"{DATA_PATH}/{sim_id}"
     pathlib.Path(sim_path).mkdir(parents=True, exist_ok=True)
 
-    framework.start()
     logging.basicConfig(level=logging.DEBUG)
 
-    # Prepare experiment
-    coreemu = CoreEmu()
-    session: Session = coreemu.create_session(_id={{simInstanceId}})
-    session.set_state(EventTypes.CONFIGURATION_STATE)
-
-    ServiceManager.add_services("/root/.core/myservices")
-
-    session.open_xml(file_name=CORE_XML, start=True)
-    time.sleep(10)
-
-    # Run the experiment
-    time.sleep(3600)
-
-    # When the experiment is finished, we set the session to
-    # DATACOLLECT_STATE and collect the logs.
-    # After that, we shutdown the session, cleanup the generated payloads
-    # and manually make sure, that all remaining files of the experiments
-    # are gone.
-    # Finally, we wait another 10 seconds to make sure everyhing is clean.
-    session.set_state(EventTypes.DATACOLLECT_STATE)
-    time.sleep(2)
-    collect_logs(
-        session_dir=session.session_dir, sim_path=sim_path, instance_id=sim_instance_id
-    )
-    coreemu.shutdown()
-    os.system("core-cleanup")
-    time.sleep(10)
+    # Prepare experiment, every phase's wall clock time, CPU time and peak RSS are recorded as phase.<name>
+    with framework.phase("config"):
+        coreemu = CoreEmu()
+        session: Session = coreemu.create_session(_id={{simInstanceId}})
+        session.set_state(EventTypes.CONFIGURATION_STATE)
+
+        # config and payload live in the session directory, so that other sessions on this host do not interfere
+        payload_path = os.path.join(session.session_dir, PAYLOAD_FILE)
+        experiment_config["Experiment"]["payload_path"] = payload_path
+        traffic_start_path = os.path.join(session.session_dir, TRAFFIC_START)
+        experiment_config["Experiment"]["start_file"] = traffic_start_path
+
+        # write experiment configuration
+        with open(os.path.join(session.session_dir, SESSION_CONFIG), "w") as f:
+            toml.dump(experiment_config, f)
+
+    # link the payload from the store, it is only generated if no earlier run used the same one
+    with framework.phase("payload"):
+        payload_store = PayloadStore()
+        payload_store.link(
+            target=payload_path, size=payload_size, seed=seed, alphabet=ALPHANUMERIC
+        )
+
+    with framework.phase("startup"):
+        ServiceManager.add_services("/root/.core/myservices")
+        session.open_xml(file_name=CORE_XML, start=True)
+
+        scenario_nodes = parse_scenario_xml(CORE_XML)
+        node_pids = {
+            node.name: node.pid
+            for node in session.nodes.values()
+            if node.name in scenario_nodes
+        }
+        # one sampler for the CPU, memory, I/O and network usage of all nodes
+        sampler = ResourceSampler(
+            path=os.path.join(session.session_dir, RESOURCES_FILE), nodes=node_pids
+        )
+        sampler.start()
+
+    # Start the traffic once the dtnds are up
+    with framework.phase("readiness"):
+        barrier = ReadinessBarrier(
+            nodes=node_pids,
+            # only cadr routing opens the routing REST listener
+            ports=(AGENT_PORT, ROUTING_PORT) if "cadr" in routing else (AGENT_PORT,),
+            quorum=READY_QUORUM,
+            timeout=READY_TIMEOUT,
+        )
+        if not barrier.wait():
+            framework.warn("readiness", "Not all nodes got ready, starting traffic anyway")
+        barrier.record()
+        write_traffic_start(traffic_start_path)
+
+    # Run the experiment until all bundles are delivered, nothing happens anymore or time is up
+    with framework.phase("run"):
+        termination = TerminationController(
+            session_dir=session.session_dir,
+            expected=expected_deliveries(
+                nodes=scenario_nodes, bundles_per_node=bundles_per_node
+            ),
+            quiet_period=QUIET_PERIOD,
+            max_duration=MAX_DURATION,
+        )
+        termination.run()
+
+    # When the experiment is finished, the services are stopped, the logs collected while
+    # the session is torn down, and the payloads no other session uses are removed.
+    # Teardown records its own phases (stop_services, collect_logs and shutdown).
+    with framework.phase("teardown"):
+        sampler.stop()
+        teardown = Teardown(coreemu=coreemu, session=session)
+        teardown.run(sim_path=sim_path, instance_id=sim_instance_id)
+        payload_store.collect()
 
     framework.stop()
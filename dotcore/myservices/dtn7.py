@@ -1,33 +1,56 @@
+import json
 import toml
 
 from core.services.coreservices import CoreService, ServiceMode
 
-from cadrhelpers.util import parse_scenario_xml, get_node_type
+from cadrhelpers.cache import experiment_config_path, load_experiment_config, load_scenario, read_file
+from cadrhelpers.placement import place_node
+from cadrhelpers.util import get_node_type
 
 
 EXPERIMENT_CONFIG = "/dtn_routing/experiment_config.toml"
+# cadr routing scripts, the first one whose key is part of the routing name is used
+CONTEXT_SCRIPTS = (
+    ("epidemic", "/root/cadr_epidemic.js"),
+    ("sensors", "/root/cadr_sensors.js"),
+    ("responders", "/root/cadr_responders.js"),
+    ("spray", "/root/cadr_spray.js"),
+)
 
 
 class Dtn7Service(CoreService):
     name = "dtn7"
     group = "dtn"
     executables = ("dtnd", "dtn-tool")
-    dependencies = ("bwm-ng", "pidstat")
-    configs = ("dtnd.toml", "context.js")
-    startup = ('bash -c "nohup dtnd {} &> dtnd_run.log &"'.format(configs[0]), )
+    # placement.json comes first: generating it pins the node to its CPUs before any of its processes start
+    configs = ("placement.json", "dtnd.toml", "context.js", "dtnd_log_filter.toml")
+    startup = ('bash -c "nohup dtnd {} &> dtnd_run.log & echo $! > dtnd.pid"'.format(configs[1]), )
+    # dtnd's output is piped through dtnd_log_filter, if [Logging] filter is enabled in the experiment config
+    filtered_startup = (
+        'bash -c "({{ dtnd {} 2>&1 & echo $! > dtnd.pid; wait; }} | dtnd_log_filter {} > dtnd_run.log 2> dtnd_log_filter.log) &> /dev/null &"'.format(
+            configs[1], configs[3]
+        ),
+    )
     validation_timer = 1  # Wait 1 second before validating service.
     validation_period = 1  # Retry after 1 second if validation was not successful.
     validation_mode = ServiceMode.NON_BLOCKING # NON_BLOCKING uses the validate commands for validation.
-    shutdown = ('bash -c "kill -INT `pgrep dtnd`"', )
-    validate = (
-        'bash -c "ps -C dtnd"',
-    )  # ps -C returns 0 if the process is found, 1 if not.
+    # only this node's dtnd, other sessions may run on the same host
+    shutdown = ('bash -c "kill -INT `cat dtnd.pid`; rm dtnd.pid"', )
+    # kill -0 returns 0 if this node's dtnd is running, unlike ps -C it does not see other sessions' dtnd
+    validate = ('bash -c "kill -0 `cat dtnd.pid`"', )
+
+    @classmethod
+    def get_startup(cls, node):
+        experiment_config = load_experiment_config(experiment_config_path(node, EXPERIMENT_CONFIG))
+        if experiment_config.get("Logging", {}).get("filter", False):
+            return cls.filtered_startup
+        return cls.startup
 
     @classmethod
     def generate_config(cls, node, filename):
-        experiment_config = toml.load(EXPERIMENT_CONFIG)
+        experiment_config = load_experiment_config(experiment_config_path(node, EXPERIMENT_CONFIG))
 
-        nodes = parse_scenario_xml(experiment_config["Scenario"]["xml"])
+        nodes = load_scenario(experiment_config["Scenario"]["xml"])
         node_type = get_node_type(nodes=nodes, name=node.name)
 
         if node_type == "coordinator":
@@ -102,24 +125,28 @@ listenaddress = "{routing_address}"
 """.format(nodename=node.name, cla_id=cla_id, agent_address=agent_address, routing=routing, nodedir=node.nodedir, routing_address=routing_address)
 
         elif filename == "context.js":
-            if "epidemic" in routing:
-                with open("/root/cadr_epidemic.js", "r") as f:
-                    context = f.read()
-                    return context
-            elif "sensors" in routing:
-                with open("/root/cadr_sensors.js", "r") as f:
-                    context = f.read()
-                    return context
-            elif "responders" in routing:
-                with open("/root/cadr_responders.js", "r") as f:
-                    context = f.read()
-                    return context
-            elif "spray" in routing:
-                with open("/root/cadr_spray.js", "r") as f:
-                    context = f.read()
-                    return context
-            else:
-                return ""
+            for key, script_path in CONTEXT_SCRIPTS:
+                if key in routing:
+                    return read_file(script_path)
+            return ""
+
+        elif filename == "placement.json":
+            # only the scenario's nodes are placed, concurrent sessions get disjoint cores (see [Placement] slot)
+            placement = place_node(
+                node_name=node.name,
+                pid=node.pid,
+                session_id=node.session.id,
+                node_names=[scenario_node.name for scenario_node in nodes],
+                config=experiment_config.get("Placement", {}),
+            )
+            return json.dumps(placement, indent=1) if placement is not None else ""
+
+        elif filename == "dtnd_log_filter.toml":
+            logging_config = experiment_config.get("Logging", {})
+            filter_config = {
+                key: logging_config[key] for key in ("keep", "collapse") if key in logging_config
+            }
+            return toml.dumps(filter_config)
 
         else:
             return ""
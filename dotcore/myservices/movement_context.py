@@ -2,6 +2,8 @@ import toml
 
 from core.services.coreservices import CoreService
 
+from cadrhelpers.cache import experiment_config_path, load_experiment_config
+
 
 EXPERIMENT_CONFIG = "/dtn_routing/experiment_config.toml"
 
@@ -17,7 +19,7 @@ class TrafficGeneratorService(CoreService):
 
     @classmethod
     def generate_config(cls, node, filename):
-        config = toml.load(EXPERIMENT_CONFIG)
+        config = load_experiment_config(experiment_config_path(node, EXPERIMENT_CONFIG))
         config["Node"] = {}
         config["Node"]["name"] = node.name
         return toml.dumps(config)
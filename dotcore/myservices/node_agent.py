@@ -0,0 +1,42 @@
+from typing import Optional
+
+import toml
+
+from core.services.coreservices import CoreService
+
+from cadrhelpers.cache import experiment_config_path, load_experiment_config, load_scenario
+from cadrhelpers.util import Node
+
+
+EXPERIMENT_CONFIG = "/dtn_routing/experiment_config.toml"
+
+
+class NodeAgentService(CoreService):
+    """Runs NodeHelper, TrafficGenerator, NodeContext and MovementContext in one process (cadrhelpers.node_agent)
+
+    Which of them run on a node is set by the roles attribute of its device in the scenario xml.
+    """
+
+    name = "NodeAgent"
+    executables = ("node_agent",)
+    dependencies = ("dtn7",)
+    configs = ("node_agent.toml",)
+    startup = ('bash -c "nohup node_agent {} &> node_agent_run.log & echo $! > node_agent.pid"'.format(configs[0]), )
+    # SIGTERM lets the store sampler write its last samples
+    shutdown = ('bash -c "kill -TERM `cat node_agent.pid`; rm node_agent.pid"', )
+
+    @classmethod
+    def generate_config(cls, node, filename):
+        config = load_experiment_config(experiment_config_path(node, EXPERIMENT_CONFIG))
+        scenario_node: Optional[Node] = load_scenario(config["Scenario"]["xml"]).by_name.get(node.name)
+        node_type = scenario_node.type if scenario_node is not None else ""
+
+        config["Node"] = {}
+        config["Node"]["name"] = node.name
+        if scenario_node is not None and scenario_node.roles is not None:
+            config.setdefault("Agent", {})["roles"] = list(scenario_node.roles)
+        if node_type == "coordinator":
+            config["Node"]["endpoint_id"] = "dtn://coordinator/"
+        else:
+            config["Node"]["endpoint_id"] = "dtn://{}/".format(node.name)
+        return toml.dumps(config)
@@ -2,6 +2,8 @@ import toml
 
 from core.services.coreservices import CoreService
 
+from cadrhelpers.cache import experiment_config_path, load_experiment_config
+
 
 EXPERIMENT_CONFIG = "/dtn_routing/experiment_config.toml"
 
@@ -11,11 +13,13 @@ class NodeHelperService(CoreService):
     executables = ("node_helper",)
     dependencies = ("dtn7",)
     configs = ("node_helper.toml",)
-    startup = ('bash -c "nohup node_helper {} &> node_helper_run.log &"'.format(configs[0]), )
+    startup = ('bash -c "nohup node_helper {} &> node_helper_run.log & echo $! > node_helper.pid"'.format(configs[0]), )
+    # SIGTERM lets the store sampler write its last samples
+    shutdown = ('bash -c "kill -TERM `cat node_helper.pid`; rm node_helper.pid"', )
 
     @classmethod
     def generate_config(cls, node, filename):
-        config = toml.load(EXPERIMENT_CONFIG)
+        config = load_experiment_config(experiment_config_path(node, EXPERIMENT_CONFIG))
         config["Node"] = {}
         config["Node"]["name"] = node.name
         return toml.dumps(config)
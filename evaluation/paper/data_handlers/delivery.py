@@ -0,0 +1,69 @@
+import glob
+import os
+
+import pandas as pd
+
+from .helpers import parse_parameters
+
+
+def parse_ledgers(instance_path, pattern):
+    ledger_paths = glob.glob(os.path.join(instance_path, pattern))
+    if not ledger_paths:
+        return pd.DataFrame()
+
+    frames = []
+    for ledger_path in ledger_paths:
+        df = pd.read_csv(ledger_path)
+        df["node"] = os.path.basename(ledger_path).split(".")[0]
+        frames.append(df)
+
+    return pd.concat(frames)
+
+
+def parse_delivery_instance(instance_path):
+    """Delivery ratio and latency of a single instance, computed from the node helpers' and traffic generators' ledgers"""
+    parameters = parse_parameters(instance_path)
+
+    sent = parse_ledgers(instance_path, "*.conf_send_ledger.csv")
+    delivered = parse_ledgers(instance_path, "*.conf_delivery_ledger.csv")
+
+    if sent.empty:
+        return pd.DataFrame()
+
+    if delivered.empty:
+        delivered = pd.DataFrame(columns=["bundle", "received", "latency"])
+    else:
+        # bundles to the civilians' group endpoint are delivered once per civilian, only count the first delivery
+        delivered = delivered.dropna(subset=["bundle"])
+        delivered = delivered.sort_values("received").drop_duplicates("bundle")
+
+    df = sent.merge(delivered[["bundle", "received", "latency"]], how="left", on="bundle")
+    df["delivered"] = df["received"].notna()
+    df["routing"] = parameters["routing"]
+    df["payload_size"] = parameters["payload_size"]
+    df["bundles_per_node"] = parameters["bundles_per_node"]
+    df["id"] = parameters["simInstanceId"]
+
+    return df
+
+
+def parse_deliveries(binary_files_path):
+    experiment_paths = glob.glob(os.path.join(binary_files_path, "*"))
+
+    instance_paths = []
+    for experiment_path in experiment_paths:
+        instance_paths.extend(glob.glob(os.path.join(experiment_path, "*")))
+
+    parsed_instances = [parse_delivery_instance(path) for path in instance_paths]
+    return pd.concat(parsed_instances, sort=False)
+
+
+def delivery_summary(df):
+    """Delivery ratio and latency statistics per instance"""
+    return df.groupby(["id", "routing", "payload_size", "bundles_per_node"]).agg(
+        sent=("bundle", "count"),
+        delivered=("delivered", "sum"),
+        delivery_ratio=("delivered", "mean"),
+        latency_mean=("latency", "mean"),
+        latency_median=("latency", "median"),
+    )
@@ -0,0 +1,78 @@
+import glob
+import json
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from .helpers import parse_parameters
+
+
+# written by ExperimentFramework/dtnd_events.py during collect_logs
+EVENTS_FILE = "dtnd_events.zip"
+
+COLUMN_TYPES = {
+    "f8": "<f8",
+    "i8": "<i8",
+    "u4": "<u4",
+}
+
+
+def load_events(instance_path):
+    """Load the dtnd events of an instance from its columnar event file.
+
+    String columns become categoricals, timestamps datetimes and missing sizes NaN.
+    """
+    columns = {}
+    with zipfile.ZipFile(os.path.join(instance_path, EVENTS_FILE)) as archive:
+        names = archive.namelist()
+        for name in names:
+            column, extension = name.rsplit(".", 1)
+            if extension not in COLUMN_TYPES:
+                continue
+
+            values = np.frombuffer(archive.read(name), dtype=COLUMN_TYPES[extension])
+            if extension == "u4":
+                categories = json.loads(archive.read(f"{column}.json"))
+                values = pd.Categorical.from_codes(values.astype(np.int64), categories=categories)
+            columns[column] = values
+
+    df = pd.DataFrame(columns)
+    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="s")
+    for column in ["size", "meta_size"]:
+        df[column] = df[column].where(df[column] >= 0)
+
+    return df
+
+
+def load_events_instance(instance_path):
+    parameters = parse_parameters(instance_path)
+
+    df = load_events(instance_path)
+    df["routing"] = parameters["routing"]
+    df["payload_size"] = parameters["payload_size"]
+    df["bundles_per_node"] = parameters["bundles_per_node"]
+    df["sim_instance_id"] = parameters["simInstanceId"]
+
+    return df
+
+
+def load_all_events(binary_files_path):
+    experiment_paths = glob.glob(os.path.join(binary_files_path, "*"))
+
+    instance_paths = []
+    for experiment_path in experiment_paths:
+        instance_paths.extend(glob.glob(os.path.join(experiment_path, "*")))
+
+    parsed_instances = [
+        load_events_instance(path)
+        for path in instance_paths
+        if os.path.exists(os.path.join(path, EVENTS_FILE))
+    ]
+    return pd.concat(parsed_instances, sort=False)
+
+
+def crashed_nodes(events):
+    """Nodes whose dtnd panicked, replaces checking every node's dtnd_run.log for "panic" """
+    return set(events.loc[events["msg"] == "panic", "node"])
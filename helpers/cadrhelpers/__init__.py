@@ -4,7 +4,16 @@ __all__ = [
     "movement_context",
     "traffic_generator",
     "node_context",
+    "node_agent",
     "movement_generator",
+    "bonnmotion",
+    "scenario_generator",
     "log_saver",
     "util",
+    "cache",
+    "ledger",
+    "store_sampler",
+    "log_filter",
+    "payload_store",
+    "placement",
 ]
@@ -0,0 +1,213 @@
+#! /usr/bin/env python3
+
+import argparse
+import gzip
+import math
+import os
+import shutil
+import tempfile
+
+from typing import Dict, Iterator, List, TextIO, Tuple
+
+
+# BonnMotion's NSFile exporter shifts all coordinates by this margin
+NS_BORDER = 10.0
+READ_CHUNK_SIZE = 1 << 16
+
+
+def read_tokens(path: str, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+    """Stream the whitespace separated tokens of a (gzipped) BonnMotion trace.
+
+    Every line break is reported as an empty token, so that callers can tell the nodes apart.
+    Only a single chunk is held in memory, regardless of how long a node's line is.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        remainder: bytes = b""
+        while True:
+            chunk: bytes = f.read(chunk_size)
+            if not chunk:
+                break
+
+            lines: List[bytes] = (remainder + chunk).split(b"\n")
+            remainder = lines.pop()
+            for line in lines:
+                yield from line.split()
+                yield b""
+
+            # keep only the unfinished token of the last line for the next chunk
+            if remainder and not remainder[-1:].isspace():
+                tokens = remainder.split()
+                yield from tokens[:-1]
+                remainder = tokens[-1]
+            else:
+                yield from remainder.split()
+                remainder = b""
+
+        if remainder:
+            yield from remainder.split()
+            yield b""
+
+
+def read_waypoints(path: str) -> Iterator[Tuple[int, float, float, float]]:
+    """Stream a 2D BonnMotion movement trace as (node_index, timestamp, x, y) tuples
+
+    BonnMotion writes one line per node containing the node's waypoints as "time x y" triples.
+    """
+    node_index: int = 0
+    waypoint: List[float] = []
+
+    for token in read_tokens(path=path):
+        if not token:
+            if waypoint:
+                raise ValueError(f"Incomplete waypoint for node {node_index} in {path}")
+            node_index += 1
+            continue
+
+        waypoint.append(float(token))
+        if len(waypoint) == 3:
+            yield node_index, waypoint[0], waypoint[1], waypoint[2]
+            waypoint = []
+
+
+def ns_node_id(node_index: int, node_count: int, first_id: int = 1) -> int:
+    """Map BonnMotion's 0-indexed nodes onto CORE's node ids
+
+    Indices below first_id are wrapped around to the end, which is what create-mobiliy.sh does with sed
+    for node 0 (CORE nodes are 1-indexed).
+    """
+    if node_index < first_id:
+        return node_index + node_count
+    return node_index
+
+
+def transform_to_ns(
+    movements_file: str,
+    output: TextIO,
+    node_count: int,
+    first_id: int = 1,
+    border: float = NS_BORDER,
+) -> int:
+    """Write the ns2 commands for a BonnMotion trace, keeping only the previous waypoint in memory.
+
+    Movements with speed 0 (pauses) are written as comments, as BonnMotion's NSFile does.
+    The nodes wrapped around to the end (see ns_node_id) are spooled to a temporary file and written after
+    all other nodes, so the output is ordered by node id like the shipped .ns_movements files.
+
+    Returns:
+        Number of converted nodes
+    """
+    nodes: int = 0
+    current_node: int = -1
+    last_time: float = 0.0
+    last_x: float = 0.0
+    last_y: float = 0.0
+    ns_id: int = 0
+    target: TextIO = output
+
+    with tempfile.TemporaryFile(mode="w+") as wrapped:
+        for node_index, timestamp, x_pos, y_pos in read_waypoints(path=movements_file):
+            # speeds are computed on the raw coordinates, so that we match BonnMotion's output exactly
+            if node_index != current_node:
+                current_node = node_index
+                nodes += 1
+                ns_id = ns_node_id(
+                    node_index=node_index, node_count=node_count, first_id=first_id
+                )
+                target = wrapped if node_index < first_id else output
+                target.write(f"$node_({ns_id}) set X_ {x_pos + border}\n")
+                target.write(f"$node_({ns_id}) set Y_ {y_pos + border}\n")
+            else:
+                duration = timestamp - last_time
+                distance = math.sqrt((x_pos - last_x) ** 2 + (y_pos - last_y) ** 2)
+                speed = distance / duration if duration > 0 else 0.0
+                comment = "# " if speed == 0.0 else ""
+                target.write(
+                    f'{comment}$ns_ at {last_time} "$node_({ns_id}) setdest {x_pos + border} {y_pos + border} {speed}"\n'
+                )
+
+            last_time, last_x, last_y = timestamp, x_pos, y_pos
+
+        wrapped.seek(0)
+        shutil.copyfileobj(wrapped, output)
+
+    return nodes
+
+
+def read_params(path: str) -> Dict[str, str]:
+    """Read a BonnMotion .params file (key=value per line)"""
+    params: Dict[str, str] = {}
+    with open(path, "r") as f:
+        for line in f:
+            if "=" in line:
+                key, value = line.strip().split("=", 1)
+                params[key] = value
+    return params
+
+
+def write_ns_params(params: Dict[str, str], output_file: str, border: float = NS_BORDER) -> None:
+    with open(output_file, "w") as f:
+        f.write(f"set val(x) {float(params['x']) + 2 * border}\n")
+        f.write(f"set val(y) {float(params['y']) + 2 * border}\n")
+        f.write(f"set val(nn) {params['nn']}\n")
+        f.write(f"set val(duration) {float(params['duration'])}\n")
+
+
+def convert(scenario: str, first_id: int = 1, border: float = NS_BORDER) -> str:
+    """Convert <scenario>.movements.gz to <scenario>.ns_movements (and .ns_params), like `bm NSFile -f <scenario>`
+
+    Returns:
+        Path to the written ns2 movement file
+    """
+    movements_file = f"{scenario}.movements.gz"
+    if not os.path.exists(movements_file):
+        movements_file = f"{scenario}.movements"
+
+    params_file = f"{scenario}.params"
+    params: Dict[str, str] = {}
+    if os.path.exists(params_file):
+        params = read_params(path=params_file)
+        write_ns_params(params=params, output_file=f"{scenario}.ns_params", border=border)
+
+    node_count: int = int(params.get("nn", 0))
+
+    ns2_path = f"{scenario}.ns_movements"
+    with open(ns2_path, "w") as f:
+        converted = transform_to_ns(
+            movements_file=movements_file,
+            output=f,
+            node_count=node_count,
+            first_id=first_id,
+            border=border,
+        )
+
+    if node_count and converted != node_count:
+        print(f"Warning: expected {node_count} nodes, but trace contains {converted}")
+
+    return ns2_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert a BonnMotion trace (<scenario>.movements.gz) into a ns2 movement file"
+    )
+    parser.add_argument(
+        "scenario", help="BonnMotion scenario name, i.e. the path without file extension"
+    )
+    parser.add_argument(
+        "--first_id",
+        type=int,
+        default=1,
+        help="Node indices below this value are moved to the end (CORE nodes are 1-indexed). "
+        "The shipped sample and randomWaypoint files use 2, manhattan 0",
+    )
+    parser.add_argument(
+        "--border",
+        type=float,
+        default=NS_BORDER,
+        help="Margin added to all coordinates, same as BonnMotion's NSFile",
+    )
+    args = parser.parse_args()
+
+    path = convert(scenario=args.scenario, first_id=args.first_id, border=args.border)
+    print(f"Wrote {path}")
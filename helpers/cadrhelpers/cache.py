@@ -0,0 +1,85 @@
+import os
+import copy
+import threading
+
+from typing import Any, Callable, Dict, Generic, Tuple, TypeVar
+
+import toml
+
+from cadrhelpers.util import Nodes, parse_scenario_xml
+
+
+T = TypeVar("T")
+
+EXPERIMENT_CONFIG = "/dtn_routing/experiment_config.toml"
+# sessions run concurrently (ExperimentFramework's campaign runner) have their own config in their session directory
+SESSION_CONFIG = "experiment_config.toml"
+
+
+class FileCache(Generic[T]):
+    """Caches the result of loading a file, keyed by its path.
+
+    An entry is invalidated as soon as the file's mtime or size change, so rewriting e.g. the experiment config
+    between two sessions is picked up without restarting the CORE daemon.
+    """
+
+    def __init__(self, loader: Callable[[str], T]):
+        self.loader: Callable[[str], T] = loader
+        self.entries: Dict[str, Tuple[Tuple[int, int], T]] = {}
+        self.lock = threading.Lock()
+
+    def get(self, path: str) -> T:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+
+            value = self.loader(path)
+            self.entries[path] = (version, value)
+            return value
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+def _read_file(path: str) -> str:
+    with open(path, "r") as f:
+        return f.read()
+
+
+_configs: FileCache[Dict[str, Any]] = FileCache(loader=toml.load)
+_scenarios: FileCache[Nodes] = FileCache(loader=parse_scenario_xml)
+_files: FileCache[str] = FileCache(loader=_read_file)
+
+
+def load_experiment_config(path: str) -> Dict[str, Any]:
+    """Parsed experiment config. Returns a copy, since the services add their own [Node] section."""
+    return copy.deepcopy(_configs.get(path))
+
+
+def experiment_config_path(node: Any, default: str = EXPERIMENT_CONFIG) -> str:
+    """Path of the experiment config for a CORE node: its session's own config if there is one, else default"""
+    path = os.path.join(node.session.session_dir, SESSION_CONFIG)
+    if os.path.isfile(path):
+        return path
+    return default
+
+
+def load_scenario(path: str) -> Nodes:
+    """Parsed scenario xml. The returned object is shared and must not be modified."""
+    return _scenarios.get(path)
+
+
+def read_file(path: str) -> str:
+    """Contents of a text file, e.g. one of the cadr routing scripts"""
+    return _files.get(path)
+
+
+def clear() -> None:
+    for cache in (_configs, _scenarios, _files):
+        cache.clear()
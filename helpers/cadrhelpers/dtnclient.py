@@ -3,7 +3,7 @@
 import sys
 import argparse
 import base64
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from dataclasses import dataclass
 
 import requests
@@ -56,7 +56,10 @@ def load_registration_data(path: str) -> Dict[str, str]:
 
 
 def register(
-    rest_url: str, endpoint_id: str, registration_data_file: str = ""
+    rest_url: str,
+    endpoint_id: str,
+    registration_data_file: str = "",
+    session: Optional[requests.Session] = None,
 ) -> Dict[str, str]:
     """Registers the client with the REST Application Agent
 
@@ -64,6 +67,7 @@ def register(
         rest_url: Address + Port+ Prefix for REST actions
         endpoint_id: BPv7 endpoint ID used for registration
         registration_data_file: If set, registration data will be written to a file
+        session: If set, the request reuses the session's persistent connection
 
     Returns:
         Dictionary with two fields:
@@ -74,7 +78,8 @@ def register(
         RESTError if anything goes wrong
     """
     id_json = json.dumps({"endpoint_id": endpoint_id})
-    response: requests.Response = requests.post(f"{rest_url}/register", data=id_json, timeout=REQUEST_TIMEOUT)
+    http = session if session is not None else requests
+    response: requests.Response = http.post(f"{rest_url}/register", data=id_json, timeout=REQUEST_TIMEOUT)
     if response.status_code != 200:
         raise RESTError(status_code=response.status_code, error=response.text)
 
@@ -92,12 +97,15 @@ def register(
     return data
 
 
-def fetch_pending(rest_url: str, uuid: str) -> List[Dict[str, Any]]:
+def fetch_pending(
+    rest_url: str, uuid: str, session: Optional[requests.Session] = None
+) -> List[Dict[str, Any]]:
     """Fetch bundles addressed to this node
 
     Args:
         rest_url: Address + Port+ Prefix for REST actions
         uuid: Authentication token received via the register-method.
+        session: If set, the request reuses the session's persistent connection
 
     Returns:
         List of all pending bundle's addressed to this node as a unmarshaled JSON object
@@ -105,7 +113,8 @@ def fetch_pending(rest_url: str, uuid: str) -> List[Dict[str, Any]]:
     Raises:
         RESTError if anything goes wrong
     """
-    response: requests.Response = requests.post(
+    http = session if session is not None else requests
+    response: requests.Response = http.post(
         f"{rest_url}/fetch", data=json.dumps({"uuid": uuid}), timeout=REQUEST_TIMEOUT
     )
     if response.status_code != 200:
@@ -120,8 +129,9 @@ def fetch_pending(rest_url: str, uuid: str) -> List[Dict[str, Any]]:
     return parsed_response["bundles"]
 
 
-def _submit_bundle(rest_url: str, data: Dict[str, Any]) -> None:
-    response: requests.Response = requests.post(
+def _submit_bundle(rest_url: str, data: Dict[str, Any], session: Optional[requests.Session] = None) -> None:
+    http = session if session is not None else requests
+    response: requests.Response = http.post(
         f"{rest_url}/build", data=json.dumps(data), timeout=REQUEST_TIMEOUT
     )
     if response.status_code != 200:
@@ -141,6 +151,7 @@ def send_bundle(
     destination: str,
     payload: str,
     lifetime: str = "24h",
+    session: Optional[requests.Session] = None,
 ) -> None:
     """Sends a bundle via the REST application agent
 
@@ -152,6 +163,7 @@ def send_bundle(
         destination: BPv7 endpoint ID which will be set as the bundle's destination
         payload: Bundle payload, should be a plaintext string or base64 encoded binary data
         lifetime: Time until the bundle expires and is deleted from node stores
+        session: If set, the request reuses the session's persistent connection
 
     Raises:
         RESTError if anything goes wrong
@@ -166,7 +178,7 @@ def send_bundle(
             "payload_block": payload,
         },
     }
-    _submit_bundle(rest_url=rest_url, data=data)
+    _submit_bundle(rest_url=rest_url, data=data, session=session)
 
 
 def send_context_bundle(
@@ -177,6 +189,7 @@ def send_context_bundle(
     payload: str,
     context: Dict[str, Any],
     lifetime: str = "24h",
+    session: Optional[requests.Session] = None,
 ) -> None:
     """Same as send_bundle, but adds an extension block for context data"""
     data = {
@@ -190,23 +203,30 @@ def send_context_bundle(
             "context_block": context,
         },
     }
-    _submit_bundle(rest_url=rest_url, data=data)
+    _submit_bundle(rest_url=rest_url, data=data, session=session)
 
 
-def send_context(rest_url: str, context_name: str, node_context: Dict[str, Any]) -> str:
+def send_context(
+    rest_url: str,
+    context_name: str,
+    node_context: Dict[str, Any],
+    session: Optional[requests.Session] = None,
+) -> str:
     """Sends node context information to the routing daemon
 
     Args:
         rest_url (str): Address + Port+ Prefix for REST actions
         context_name (str): name of the context item
         node_context (Dict[str, Any]): Actual context
+        session: If set, the request reuses the session's persistent connection
 
     Raises:
         RESTError if anything goes wrong
     """
     context_str: str = json.dumps(node_context)
     print(f"Sending context: {context_str}", flush=True)
-    response: requests.Response = requests.post(
+    http = session if session is not None else requests
+    response: requests.Response = http.post(
         f"{rest_url}/context/{context_name}", data=context_str, timeout=REQUEST_TIMEOUT
     )
     if response.status_code != 202:
@@ -231,11 +251,13 @@ def get_node_context(rest_url: str) -> Dict[str, Any]:
     return response.json()
 
 
-def get_size(rest_url: str) -> int:
+def get_size(rest_url: str, session: Optional[requests.Session] = None, timeout: float = REQUEST_TIMEOUT) -> int:
     """Get size of stored bundle buffer
 
     Args:
         rest_url: Address + Port+ Prefix for REST actions
+        session: If set, the request reuses the session's persistent connection
+        timeout: Request timeout in seconds
 
     Returns:
         Size of store
@@ -243,7 +265,8 @@ def get_size(rest_url: str) -> int:
     Raises:
         RESTError if anything goes wrong
     """
-    response: requests.Response = requests.get(f"{rest_url}/size", timeout=REQUEST_TIMEOUT)
+    http = session if session is not None else requests
+    response: requests.Response = http.get(f"{rest_url}/size", timeout=timeout)
     response_text = response.text
 
     if response.status_code != 200:
@@ -0,0 +1,131 @@
+import base64
+import binascii
+import csv
+import time
+
+from typing import Any, Dict, List, Optional, Tuple
+
+
+DELIVERY_LEDGER = "delivery_ledger.csv"
+SEND_LEDGER = "send_ledger.csv"
+
+# The header overwrites the start of the payload, so that the payload size stays the same.
+# Format: "CADR <creation time> <source endpoint> <sequence number>;"
+HEADER_PREFIX = "CADR "
+HEADER_END = ";"
+PAYLOAD_BLOCK_TYPE = 1
+
+
+def build_header(created: float, source: str, sequence: int) -> str:
+    return f"{HEADER_PREFIX}{created:.6f} {source} {sequence}{HEADER_END}"
+
+
+def stamp_payload(payload: str, created: float, source: str, sequence: int) -> str:
+    """Put the creation header in front of the payload, keeping the payload's length if possible"""
+    header = build_header(created=created, source=source, sequence=sequence)
+    return header + payload[len(header):]
+
+
+def parse_header(payload: bytes) -> Optional[Tuple[float, str, int]]:
+    """Extract (creation time, source, sequence number) from a stamped payload"""
+    if not payload.startswith(HEADER_PREFIX.encode()):
+        return None
+
+    end = payload.find(HEADER_END.encode(), len(HEADER_PREFIX), 256)
+    if end < 0:
+        return None
+
+    try:
+        created, source, sequence = payload[len(HEADER_PREFIX):end].decode().split(" ")
+        return float(created), source, int(sequence)
+    except ValueError:
+        return None
+
+
+def bundle_id(source: str, sequence: int) -> str:
+    return f"{source}-{sequence}"
+
+
+def _decode_block_data(data: Any) -> bytes:
+    if isinstance(data, str):
+        try:
+            return base64.b64decode(data, validate=True)
+        except binascii.Error:
+            return data.encode()
+    if isinstance(data, list):
+        return bytes(data)
+    return b""
+
+
+def extract_payload(bundle: Dict[str, Any]) -> bytes:
+    """Get the payload of a bundle as returned by the REST agent's /fetch endpoint"""
+    blocks: List[Dict[str, Any]] = bundle.get("canonicalBlocks", [])
+    for block in blocks:
+        if block.get("blockTypeCode") == PAYLOAD_BLOCK_TYPE:
+            return _decode_block_data(block.get("data"))
+    return b""
+
+
+class Ledger:
+    """Append-only CSV file with one row per bundle, flushed after every batch"""
+
+    def __init__(self, path: str, fields: List[str]):
+        self.file = open(path, "a", newline="")
+        self.writer = csv.writer(self.file)
+        if self.file.tell() == 0:
+            self.writer.writerow(fields)
+            self.file.flush()
+
+    def write(self, rows: List[List[Any]]) -> None:
+        if rows:
+            self.writer.writerows(rows)
+            self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class DeliveryLedger(Ledger):
+    """Receiver side: bundle, source, receive time, payload size and end-to-end latency (in seconds)"""
+
+    FIELDS = ["bundle", "source", "received", "size", "latency"]
+
+    def __init__(self, path: str = DELIVERY_LEDGER):
+        super().__init__(path=path, fields=self.FIELDS)
+
+    def record(self, bundles: List[Dict[str, Any]], received: Optional[float] = None) -> None:
+        if received is None:
+            received = time.time()
+
+        rows: List[List[Any]] = []
+        for bundle in bundles:
+            payload = extract_payload(bundle)
+            header = parse_header(payload)
+            if header is None:
+                source = bundle.get("primaryBlock", {}).get("source", "")
+                rows.append(["", source, f"{received:.6f}", len(payload), ""])
+                continue
+
+            created, source, sequence = header
+            rows.append(
+                [
+                    bundle_id(source=source, sequence=sequence),
+                    source,
+                    f"{received:.6f}",
+                    len(payload),
+                    f"{received - created:.6f}",
+                ]
+            )
+        self.write(rows)
+
+
+class SendLedger(Ledger):
+    """Sender side: bundle, destination, creation time and payload size"""
+
+    FIELDS = ["bundle", "destination", "created", "size"]
+
+    def __init__(self, path: str = SEND_LEDGER):
+        super().__init__(path=path, fields=self.FIELDS)
+
+    def record(self, source: str, sequence: int, destination: str, created: float, size: int) -> None:
+        self.write([[bundle_id(source=source, sequence=sequence), destination, f"{created:.6f}", size]])
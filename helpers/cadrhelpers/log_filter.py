@@ -0,0 +1,174 @@
+#! /usr/bin/env python3
+
+import argparse
+import os
+import re
+import select
+import sys
+import time
+
+from typing import BinaryIO, Iterable, Iterator, Optional
+
+import toml
+
+
+# messages used by the evaluation (see evaluation/paper/data_handlers) and ExperimentFramework.dtn7
+KEEP_MESSAGES = [
+    "REST client sent bundle",
+    "Sending bundle succeeded",
+    "Sending bundle to a CLA (ConvergenceSender)",
+    "Received bundle from peer",
+    "Received bundle for local delivery",
+    "Starting routing decision",
+    "Routing decision finished",
+    "Selected routing algorithm",
+    "CADR: Is context bundle",
+    "Received metadata",
+]
+# warnings, errors and crashes are always kept
+KEEP_MARKERS = [
+    '"level":"warning"',
+    '"level":"error"',
+    '"level":"fatal"',
+    '"level":"panic"',
+    "panic",
+]
+FLUSH_INTERVAL = 1.0
+READ_SIZE = 1 << 16
+
+_msg_field = re.compile(rb'"msg":"((?:[^"\\]|\\.)*)"')
+
+
+class LogFilter:
+    """Filters dtnd's JSON log lines, keeping only the configured messages.
+
+    Every line is first matched against all interesting substrings with a single precompiled regex, so the
+    bulk of the debug output is dropped without being decoded. Runs of consecutive lines with the same
+    message from the collapse list are written only once, followed by a summary line with the run's length.
+    """
+
+    def __init__(
+        self,
+        output: BinaryIO,
+        keep: Iterable[str] = KEEP_MESSAGES,
+        collapse: Iterable[str] = (),
+        flush_interval: float = FLUSH_INTERVAL,
+    ):
+        self.output: BinaryIO = output
+        self.keep = frozenset(msg.encode() for msg in keep)
+        self.collapse = frozenset(msg.encode() for msg in collapse)
+        self.markers = [marker.encode() for marker in KEEP_MARKERS]
+        self.prefilter = re.compile(
+            b"|".join(re.escape(pattern) for pattern in list(self.keep) + self.markers)
+        )
+        self.flush_interval: float = flush_interval
+        self.last_flush: float = time.time()
+        self.unflushed: bool = False
+        self.run_msg: Optional[bytes] = None
+        self.run_length: int = 0
+        # after a panic, go's stack trace follows without any of our markers
+        self.crashed: bool = False
+
+    def process(self, line: bytes) -> None:
+        if self.crashed:
+            self._write(line)
+            return
+
+        if self.prefilter.search(line) is None:
+            return
+
+        match = _msg_field.search(line)
+        msg = match.group(1) if match else None
+
+        if msg not in self.keep:
+            if any(marker in line for marker in self.markers):
+                if not line.startswith(b"{"):
+                    self.crashed = True
+                self._end_run()
+                self._write(line)
+            return
+
+        if msg in self.collapse and msg == self.run_msg:
+            self.run_length += 1
+            return
+
+        self._end_run()
+        if msg in self.collapse:
+            self.run_msg = msg
+        self._write(line)
+
+    def _end_run(self) -> None:
+        if self.run_msg is not None and self.run_length > 0:
+            self._write(
+                b'{"level":"debug","msg":"Collapsed repeated messages","repeated":"'
+                + self.run_msg
+                + b'","count":'
+                + str(self.run_length).encode()
+                + b"}\n"
+            )
+        self.run_msg = None
+        self.run_length = 0
+
+    def _write(self, line: bytes) -> None:
+        self.output.write(line)
+        self.unflushed = True
+        if time.time() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.unflushed:
+            self.output.flush()
+            self.unflushed = False
+        self.last_flush = time.time()
+
+    def run(self, lines: Iterable[bytes]) -> None:
+        for line in lines:
+            self.process(line)
+        self.close()
+
+    def follow(self, stream: BinaryIO) -> None:
+        """Like run, but kept lines are also flushed when the input has been idle for flush_interval,
+        so readers of the output (log follower, termination controller) see them while dtnd is quiet"""
+        self.run(self._read_lines(stream.fileno()))
+
+    def _read_lines(self, fd: int) -> Iterator[bytes]:
+        remainder: bytes = b""
+        while True:
+            ready, _, _ = select.select([fd], [], [], self.flush_interval)
+            if not ready:
+                self.flush()
+                continue
+
+            chunk = os.read(fd, READ_SIZE)
+            if not chunk:
+                break
+            lines = (remainder + chunk).split(b"\n")
+            remainder = lines.pop()
+            for line in lines:
+                yield line + b"\n"
+
+        if remainder:
+            yield remainder
+
+    def close(self) -> None:
+        self._end_run()
+        self.flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Filter dtnd's log (read from stdin) down to the messages needed for the evaluation"
+    )
+    parser.add_argument("path", nargs="?", help="Path to the config file")
+    args = parser.parse_args()
+
+    config = toml.load(args.path) if args.path else {}
+    log_filter = LogFilter(
+        output=sys.stdout.buffer,
+        keep=config.get("keep", KEEP_MESSAGES),
+        collapse=config.get("collapse", []),
+    )
+    try:
+        log_filter.follow(sys.stdin.buffer)
+    except KeyboardInterrupt:
+        log_filter.close()
@@ -2,24 +2,87 @@
 
 import os
 import shutil
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Tuple
 
 DATA_DIRECTORY = "/research_data/data"
+LOG_SUFFIXES = (".log", ".csv")
+COPY_BUFFER_SIZE = 1 << 20
 
 
-def save_instance_logs(save_path: str, core_directory: str) -> None:
-    print(f"Copying data in directory: {core_directory}")
-    print(f"Copying to directory: {save_path}")
-    for _, node_directories, _ in os.walk(core_directory):
+def copy_file(src: str, dst: str) -> int:
+    """Copy src to dst inside the kernel (copy_file_range, falling back to a userspace copy) and keep its mtime
+
+    Returns:
+        Number of copied bytes
+    """
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        stat = os.fstat(fsrc.fileno())
+        remaining = stat.st_size
+        try:
+            while remaining > 0:
+                copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+        except (AttributeError, OSError):
+            shutil.copyfileobj(fsrc, fdst, COPY_BUFFER_SIZE)
+
+    # the destination gets the source's timestamps, so that the next run can tell that it is up to date
+    os.utime(dst, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    return stat.st_size
+
+
+def _is_up_to_date(src: os.DirEntry, dst: str) -> bool:
+    try:
+        dst_stat = os.stat(dst)
+    except FileNotFoundError:
+        return False
+
+    src_stat = src.stat()
+    return src_stat.st_size == dst_stat.st_size and src_stat.st_mtime_ns == dst_stat.st_mtime_ns
+
+
+def find_instance_logs(save_path: str, core_directory: str) -> Iterator[Tuple[os.DirEntry, str]]:
+    """Yields (source, destination) of all node logs which are missing or outdated in save_path"""
+    with os.scandir(core_directory) as node_directories:
         for node_directory in node_directories:
-            node_name = node_directory.split(".")[0]
-            for _, _, files in os.walk(os.path.join(core_directory, node_directory)):
+            if not node_directory.is_dir():
+                continue
+
+            node_name = node_directory.name.split(".")[0]
+            with os.scandir(node_directory.path) as files:
                 for file in files:
-                    if ".log" in file or ".csv" in file:
-                        filename = f"{node_name}_{file}"
-                        file_src = os.path.join(core_directory, node_directory, file)
-                        file_dst = os.path.join(save_path, filename)
-                        print(f"Copy {file_src} to {file_dst}")
-                        shutil.copyfile(src=file_src, dst=file_dst)
+                    if not file.name.endswith(LOG_SUFFIXES) or not file.is_file():
+                        continue
+
+                    file_dst = os.path.join(save_path, f"{node_name}_{file.name}")
+                    if _is_up_to_date(src=file, dst=file_dst):
+                        continue
+
+                    yield file, file_dst
+
+
+def save_instance_logs(save_path: str, core_directory: str, workers: int = 0) -> Tuple[int, int]:
+    """Copy all new or changed node logs of a CORE session directory
+
+    Returns:
+        Number of copied files and bytes
+    """
+    print(f"Copying data in directory: {core_directory}")
+    print(f"Copying to directory: {save_path}")
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        copies: List = []
+        for file, file_dst in find_instance_logs(save_path=save_path, core_directory=core_directory):
+            print(f"Copy {file.path} to {file_dst}")
+            copies.append(pool.submit(copy_file, file.path, file_dst))
+
+        copied_bytes = sum(copy.result() for copy in copies)
+
+    return len(copies), copied_bytes
 
 
 if __name__ == "__main__":
@@ -32,11 +95,20 @@ if __name__ == "__main__":
 
     copy_path = os.path.join(DATA_DIRECTORY, routing)
     print(f"Copying data to {copy_path}")
-    os.mkdir(copy_path)
-
-    for root, subdirs, _ in os.walk("/tmp"):
-        for directory in subdirs:
-            if "pycore" in directory:
-                save_instance_logs(
-                    save_path=copy_path, core_directory=os.path.join(root, directory)
-                )
+    os.makedirs(copy_path, exist_ok=True)
+
+    start = time.time()
+    total_files = 0
+    total_bytes = 0
+    with os.scandir("/tmp") as entries:
+        for entry in entries:
+            if "pycore" in entry.name and entry.is_dir():
+                files, copied = save_instance_logs(save_path=copy_path, core_directory=entry.path)
+                total_files += files
+                total_bytes += copied
+
+    duration = time.time() - start
+    throughput = total_bytes / duration / 1024 / 1024 if duration > 0 else 0.0
+    print(
+        f"Copied {total_files} files ({total_bytes / 1024 / 1024:.2f} MiB) in {duration:.2f}s ({throughput:.2f} MiB/s)"
+    )
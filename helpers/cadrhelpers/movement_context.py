@@ -4,12 +4,13 @@ import argparse
 import time
 import math
 import toml
-import sys
 
-from typing import List, Tuple, Dict
+from typing import Any, List, Optional, Tuple, Dict
+
+import requests
 
 from cadrhelpers.dtnclient import send_context, build_url
-from cadrhelpers.util import parse_scenario_xml, Nodes
+from cadrhelpers.util import parse_scenario_xml, Node, Nodes
 
 
 class NS2Movement:
@@ -41,6 +42,7 @@ class NS2Movements:
         x_pos: float,
         y_pos: float,
         movements: List[NS2Movement],
+        session: Optional[requests.Session] = None,
     ):
         print("Initialising MovementContext", flush=True)
         self.node_name: str = node_name
@@ -49,6 +51,7 @@ class NS2Movements:
         self.y_pos: float = y_pos
         self.movements: List[NS2Movement] = movements
         self.step: int = 0
+        self.session = session
 
     def run(self) -> None:
         print("Starting movement context updater.", flush=True)
@@ -94,7 +97,7 @@ class NS2Movements:
         context: Dict[str, float] = {"x": vector[0], "y": vector[1]}
         print(f"Sending movement vector to dtnd: {context}", flush=True)
         send_context(
-            rest_url=self.rest_url, context_name="movement", node_context=context
+            rest_url=self.rest_url, context_name="movement", node_context=context, session=self.session
         )
 
     def compute_vector(self) -> Tuple[float, float]:
@@ -129,7 +132,9 @@ def filter_ns2(path: str, node_name: str) -> List[str]:
     return commands
 
 
-def parse_movement(rest_url: str, path: str, node_name: str) -> NS2Movements:
+def parse_movement(
+    rest_url: str, path: str, node_name: str, session: Optional[requests.Session] = None
+) -> NS2Movements:
     """Turns the ns2 text file into a NS2Movement object"""
     commands = filter_ns2(path=path, node_name=node_name)
     start_x: float = 0.0
@@ -159,30 +164,20 @@ def parse_movement(rest_url: str, path: str, node_name: str) -> NS2Movements:
         x_pos=start_x,
         y_pos=start_y,
         movements=movements,
+        session=session,
     )
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(
-        description="Generates context data of node movement."
-    )
-    parser.add_argument("path", help="Path to the config file")
-    args = parser.parse_args()
-
-    node_config = toml.load(args.path)
-    print(f"Using config: {node_config}", flush=True)
-
-    nodes: Nodes = parse_scenario_xml(path=node_config["Scenario"]["xml"])
-    this_node = nodes.get_node_for_name(node_name=node_config["Node"]["name"])
-    print(f"This node's type: {this_node.type}", flush=True)
-
+def run_from_config(
+    node_config: Dict[str, Any], nodes: Nodes, this_node: Node, session: Optional[requests.Session] = None
+) -> None:
     if this_node.type != "visitor":
         print("This node type does not move", flush=True)
-        sys.exit(0)
+        return
 
     if node_config["Experiment"]["routing"] != "context_complex":
         print("Experiment does not require context information", flush=True)
-        sys.exit(0)
+        return
 
     routing_url = build_url(
         address=node_config["REST"]["address"], port=node_config["REST"]["routing_port"]
@@ -191,7 +186,25 @@ if __name__ == "__main__":
     movement_context = parse_movement(
         rest_url=routing_url,
         path=node_config["Scenario"]["movements"],
-        node_name=node_config["Node"]["name"],
+        node_name=this_node.name,
+        session=session,
     )
 
     movement_context.run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generates context data of node movement."
+    )
+    parser.add_argument("path", help="Path to the config file")
+    args = parser.parse_args()
+
+    node_config = toml.load(args.path)
+    print(f"Using config: {node_config}", flush=True)
+
+    nodes: Nodes = parse_scenario_xml(path=node_config["Scenario"]["xml"])
+    this_node = nodes.get_node_for_name(node_name=node_config["Node"]["name"])
+    print(f"This node's type: {this_node.type}", flush=True)
+
+    run_from_config(node_config=node_config, nodes=nodes, this_node=this_node)
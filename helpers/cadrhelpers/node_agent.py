@@ -0,0 +1,122 @@
+#! /usr/bin/env python3
+
+import argparse
+import sys
+import threading
+import time
+
+from typing import Any, Callable, Dict, List, Optional, TextIO
+
+import requests
+import toml
+
+from requests.adapters import HTTPAdapter
+
+from cadrhelpers import movement_context, node_context, node_helper, traffic_generator
+from cadrhelpers.store_sampler import flush_on_termination
+from cadrhelpers.util import Node, Nodes, parse_scenario_xml
+
+
+Role = Callable[[Dict[str, Any], Nodes, Node, Optional[requests.Session]], None]
+
+# every role decides by itself (node type, routing) whether it has anything to do on this node
+ROLES: Dict[str, Role] = {
+    "node_helper": node_helper.run_from_config,
+    "traffic_generator": traffic_generator.run_from_config,
+    "node_context": node_context.run_from_config,
+    "movement_context": movement_context.run_from_config,
+}
+LOG_SUFFIX = "_run.log"
+
+
+class RoleOutput:
+    """Sends the output of every role's thread to its own <role>_run.log, like the separate helpers had"""
+
+    def __init__(self, default: TextIO):
+        self.default: TextIO = default
+        self.files: Dict[str, TextIO] = {}
+
+    def open(self, role: str) -> None:
+        self.files[role] = open(f"{role}{LOG_SUFFIX}", "a", buffering=1)
+
+    def _target(self) -> TextIO:
+        return self.files.get(threading.current_thread().name, self.default)
+
+    def write(self, text: str) -> int:
+        return self._target().write(text)
+
+    def flush(self) -> None:
+        self._target().flush()
+
+    def close(self) -> None:
+        for f in self.files.values():
+            f.close()
+
+
+class NodeAgent:
+    """Runs the helper roles of a node in a single process, each on its own thread.
+
+    The experiment config and the scenario are parsed once, and all roles share one HTTP session to the node's dtnd.
+    """
+
+    def __init__(self, config: Dict[str, Any], roles: Optional[List[str]] = None, separate_logs: bool = True):
+        self.config: Dict[str, Any] = config
+        self.roles: List[str] = roles if roles is not None else config.get("Agent", {}).get("roles", list(ROLES))
+        unknown = [role for role in self.roles if role not in ROLES]
+        if unknown:
+            raise ValueError(f"Unknown roles: {unknown}")
+
+        self.nodes: Nodes = parse_scenario_xml(path=config["Scenario"]["xml"])
+        self.node: Node = self.nodes.get_node_for_name(node_name=config["Node"]["name"])
+        self.session = requests.Session()
+        # one connection per role and the store sampler
+        adapter = HTTPAdapter(pool_maxsize=len(self.roles) + 1)
+        self.session.mount("http://", adapter)
+
+        self.output: Optional[RoleOutput] = RoleOutput(default=sys.stdout) if separate_logs else None
+        self.errors: Dict[str, BaseException] = {}
+
+    def _run_role(self, role: str) -> None:
+        start = time.time()
+        try:
+            ROLES[role](self.config, self.nodes, self.node, self.session)
+        except Exception as err:
+            self.errors[role] = err
+            print(f"{time.time()}: {role} failed: {err!r}", flush=True)
+        finally:
+            print(f"{time.time()}: {role} finished after {time.time() - start:.1f}s", flush=True)
+
+    def run(self) -> None:
+        print(f"{time.time()}: Node {self.node.name} ({self.node.type}), roles: {self.roles}", flush=True)
+        if self.output is not None:
+            for role in self.roles:
+                self.output.open(role)
+            sys.stdout = self.output
+
+        threads = [threading.Thread(target=self._run_role, args=(role,), name=role) for role in self.roles]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            if self.output is not None:
+                sys.stdout = self.output.default
+                self.output.close()
+            self.session.close()
+
+        print(f"{time.time()}: Terminated, failed roles: {sorted(self.errors)}", flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs all helpers of a node in one process")
+    parser.add_argument("path", help="Path to the config file")
+    parser.add_argument("--roles", nargs="+", choices=sorted(ROLES), help="Only run these roles")
+    args = parser.parse_args()
+
+    config_data = toml.load(args.path)
+    print(f"{time.time()}: Using config: {config_data}", flush=True)
+
+    agent = NodeAgent(config=config_data, roles=args.roles)
+    flush_on_termination()
+    agent.run()
@@ -1,18 +1,25 @@
 #! /usr/bin/env python3
 
-import sys
 import argparse
 import toml
 
+from typing import Any, Dict, Optional
+
+import requests
+
 from cadrhelpers.dtnclient import send_context, build_url
-from cadrhelpers.util import compute_euclidean_distance, parse_scenario_xml, Nodes
+from cadrhelpers.util import parse_scenario_xml, Node, Nodes
+
+
+STATIC_NODE_TYPES = ("sensor", "backbone")
 
 
 class GenericContext:
-    def __init__(self, rest_url: str, node_type: str):
+    def __init__(self, rest_url: str, node_type: str, session: Optional[requests.Session] = None):
         print("Initialising GenericContext", flush=True)
         self.rest_url = rest_url
         self.node_type = node_type
+        self.session = session
 
     def run(self):
         print("Sending node context.", flush=True)
@@ -20,16 +27,25 @@ class GenericContext:
             rest_url=self.rest_url,
             context_name="role",
             node_context={"node_type": self.node_type},
+            session=self.session,
         )
 
 
 class SensorContext:
-    def __init__(self, rest_url: str, node_name: str, wifi_range: float, nodes: Nodes):
+    def __init__(
+        self,
+        rest_url: str,
+        node_name: str,
+        wifi_range: float,
+        nodes: Nodes,
+        session: Optional[requests.Session] = None,
+    ):
         print("Initialising SensorContext", flush=True)
         self.rest_url: str = rest_url
         self.node_name: str = node_name
         self.wifi_range: float = wifi_range
         self.nodes: Nodes = nodes
+        self.session = session
 
     def run(self):
         connectedness = self.compute_connectedness()
@@ -37,49 +53,35 @@ class SensorContext:
             rest_url=self.rest_url,
             context_name="connectedness",
             node_context={"value": connectedness},
+            session=self.session,
         )
 
     def compute_connectedness(self) -> int:
-        """Finds (static) nodes within wifi range"""
+        """Finds (static) nodes within wifi range, including this node itself"""
         print("Computing connectedness", flush=True)
-        connectedness: int = 0
-
         ourself = self.nodes.get_node_for_name(node_name=self.node_name)
-
-        static_nodes = self.nodes.sensors + self.nodes.backbone
-
-        for node in static_nodes:
-            distance = compute_euclidean_distance(node_a=ourself, node_b=node)
-            if distance <= self.wifi_range:
-                connectedness += 1
+        connectedness: int = sum(
+            1
+            for node in self.nodes.nodes_within(x_pos=ourself.x_pos, y_pos=ourself.y_pos, radius=self.wifi_range)
+            if node.type in STATIC_NODE_TYPES
+        )
 
         print(f"Connectedness: {connectedness}", flush=True)
         return connectedness
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(
-        description="Update the node's context information"
-    )
-    parser.add_argument("path", help="Path to the config file")
-    args = parser.parse_args()
-
-    node_config = toml.load(args.path)
-    print(f"Using config: {node_config}", flush=True)
-
+def run_from_config(
+    node_config: Dict[str, Any], nodes: Nodes, this_node: Node, session: Optional[requests.Session] = None
+) -> None:
     if node_config["Experiment"]["routing"] != "cadr_sensors" and node_config["Experiment"]["routing"] != "cadr_responders":
         print("Experiment does not require context information", flush=True)
-        sys.exit(0)
-
-    nodes: Nodes = parse_scenario_xml(path=node_config["Scenario"]["xml"])
-    this_node = nodes.get_node_for_name(node_name=node_config["Node"]["name"])
-    print(f"This node's type: {this_node.type}", flush=True)
+        return
 
     routing_url = build_url(
         address=node_config["REST"]["address"], port=node_config["REST"]["routing_port"]
     )
 
-    generic_context = GenericContext(rest_url=routing_url, node_type=this_node.type)
+    generic_context = GenericContext(rest_url=routing_url, node_type=this_node.type, session=session)
     generic_context.run()
 
     if this_node.type == "sensor":
@@ -88,5 +90,23 @@ if __name__ == "__main__":
             node_name=this_node.name,
             wifi_range=node_config["Scenario"]["wifi_range"],
             nodes=nodes,
+            session=session,
         )
         sensor_context.run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Update the node's context information"
+    )
+    parser.add_argument("path", help="Path to the config file")
+    args = parser.parse_args()
+
+    node_config = toml.load(args.path)
+    print(f"Using config: {node_config}", flush=True)
+
+    nodes: Nodes = parse_scenario_xml(path=node_config["Scenario"]["xml"])
+    this_node = nodes.get_node_for_name(node_name=node_config["Node"]["name"])
+    print(f"This node's type: {this_node.type}", flush=True)
+
+    run_from_config(node_config=node_config, nodes=nodes, this_node=this_node)
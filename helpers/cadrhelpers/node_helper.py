@@ -5,16 +5,35 @@ import argparse
 import os
 import time
 
+from typing import Any, Dict, Optional
+
+import requests
+
 from cadrhelpers.dtnclient import (
     build_url,
     register,
     RESTError,
     fetch_pending,
 )
-from cadrhelpers.util import Nodes, parse_scenario_xml
+from cadrhelpers.ledger import DeliveryLedger
+from cadrhelpers.store_sampler import flush_on_termination, sampler_from_config
+from cadrhelpers.util import Node, Nodes, parse_scenario_xml
+
 
+FETCH_INTERVAL = 60
 
-def run(rest_url: str, node_type: str) -> None:
+
+def run(
+    rest_url: str,
+    node_type: str,
+    node_name: str,
+    fetch_interval: float = FETCH_INTERVAL,
+    session: Optional[requests.Session] = None,
+) -> None:
+    """Fetch delivered bundles periodically and write them to the delivery ledger.
+
+    The receive time in the ledger is the time of the fetch, so fetch_interval bounds the latency error.
+    """
     print("Starting store size logging", flush=True)
 
     if node_type == "coordinator":
@@ -22,22 +41,47 @@ def run(rest_url: str, node_type: str) -> None:
     elif node_type == "civilian":
         eid = "dtn://civilians/announcements"
     else:
-        eid = f"dtn://{this_node.name}/"
+        eid = f"dtn://{node_name}/"
 
     try:
         print(f"Registering with eid: {eid}")
-        registration_data = register(rest_url=rest_url, endpoint_id=eid)
+        registration_data = register(rest_url=rest_url, endpoint_id=eid, session=session)
+        ledger = DeliveryLedger()
 
         while True:
-            time.sleep(60)
+            time.sleep(fetch_interval)
             # empty store of pending bundles
-            new = fetch_pending(rest_url=rest_url, uuid=registration_data["uuid"])
+            new = fetch_pending(rest_url=rest_url, uuid=registration_data["uuid"], session=session)
+            ledger.record(bundles=new)
             print(f"Fetched {len(new)} new bundles.", flush=True)
 
     except RESTError as err:
         print(err, flush=True)
 
 
+def run_from_config(
+    config_data: Dict[str, Any], nodes: Nodes, this_node: Node, session: Optional[requests.Session] = None
+) -> None:
+    agent_url = build_url(
+        address=config_data["REST"]["address"], port=config_data["REST"]["agent_port"]
+    )
+
+    # dtnd only serves its store size on the routing port, which only cadr routing opens
+    if "cadr" in config_data["Experiment"]["routing"]:
+        store_sampler = sampler_from_config(
+            config_data=config_data, node_name=this_node.name, session=session
+        )
+        store_sampler.start()
+
+    run(
+        rest_url=agent_url,
+        node_type=this_node.type,
+        node_name=this_node.name,
+        fetch_interval=config_data.get("Experiment", {}).get("fetch_interval", FETCH_INTERVAL),
+        session=session,
+    )
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Will generate metadata and/or traffic depending on node type"
@@ -48,15 +92,9 @@ if __name__ == "__main__":
     config_data = toml.load(args.path)
     print(f"Using config: {config_data}", flush=True)
 
-    agent_url = build_url(
-        address=config_data["REST"]["address"], port=config_data["REST"]["agent_port"]
-    )
-
     nodes: Nodes = parse_scenario_xml(path=config_data["Scenario"]["xml"])
     this_node = nodes.get_node_for_name(node_name=config_data["Node"]["name"])
     print(f"This node's type: {this_node.type}", flush=True)
 
-    run(
-        rest_url=agent_url,
-        node_type=this_node.type,
-    )
+    flush_on_termination()
+    run_from_config(config_data=config_data, nodes=nodes, this_node=this_node)
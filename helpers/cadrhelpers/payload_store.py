@@ -0,0 +1,166 @@
+#! /usr/bin/env python3
+
+import argparse
+import contextlib
+import fcntl
+import hashlib
+import os
+import shutil
+import tempfile
+
+from typing import BinaryIO, Iterator, Optional, Union
+
+
+STORE_DIRECTORY = "/tmp/payloads"
+ALPHANUMERIC = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+BLOCK_SIZE = 1 << 20
+PAYLOAD_SUFFIX = ".payload"
+LOCK_FILE = ".lock"
+
+Seed = Union[int, str, bytes]
+
+
+def _key(size: int, seed: Seed, alphabet: Optional[str]) -> bytes:
+    if isinstance(seed, bytes):
+        seed = seed.hex()
+    return f"{size}:{seed}:{alphabet if alphabet is not None else ''}".encode()
+
+
+def _translation(alphabet: str) -> bytes:
+    """Maps every byte value to a character of the alphabet (almost uniformly for alphabets much shorter than 256)"""
+    characters = alphabet.encode("ascii")
+    return bytes(characters[value % len(characters)] for value in range(256))
+
+
+def generate_blocks(size: int, seed: Seed, alphabet: Optional[str] = ALPHANUMERIC) -> Iterator[bytes]:
+    """Deterministic pseudo-random payload of size bytes, in blocks of at most BLOCK_SIZE
+
+    The bytes are SHAKE-256 output in counter mode, keyed by (size, seed, alphabet), so the same arguments always
+    give the same payload. If alphabet is None, the raw bytes are returned, otherwise they are mapped onto it.
+    """
+    key = _key(size=size, seed=seed, alphabet=alphabet)
+    table = _translation(alphabet) if alphabet is not None else None
+
+    counter = 0
+    remaining = size
+    while remaining > 0:
+        length = min(remaining, BLOCK_SIZE)
+        block = hashlib.shake_256(key + counter.to_bytes(8, "big")).digest(length)
+        if table is not None:
+            block = block.translate(table)
+        yield block
+        counter += 1
+        remaining -= length
+
+
+def generate_payload(size: int, seed: Seed, alphabet: Optional[str] = ALPHANUMERIC) -> bytes:
+    return b"".join(generate_blocks(size=size, seed=seed, alphabet=alphabet))
+
+
+def write_payload(f: BinaryIO, size: int, seed: Seed, alphabet: Optional[str] = ALPHANUMERIC) -> None:
+    for block in generate_blocks(size=size, seed=seed, alphabet=alphabet):
+        f.write(block)
+
+
+class PayloadStore:
+    """Payload files addressed by (size, seed, alphabet).
+
+    Every payload is generated only once. Users get hard links to the stored file, so its link count is the
+    number of its users plus one, and collect() removes the payloads which are not linked anywhere anymore.
+    link() and collect() hold an exclusive lock on the store (also across processes), so that a payload can not
+    be collected between its generation and the link to its new user.
+    """
+
+    def __init__(self, directory: str = STORE_DIRECTORY):
+        self.directory: str = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        with open(os.path.join(self.directory, LOCK_FILE), "a") as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def path(self, size: int, seed: Seed, alphabet: Optional[str] = ALPHANUMERIC) -> str:
+        """Path of the stored payload, which is generated if it does not exist yet"""
+        digest = hashlib.blake2b(_key(size=size, seed=seed, alphabet=alphabet), digest_size=16).hexdigest()
+        path = os.path.join(self.directory, f"{size}_{digest}{PAYLOAD_SUFFIX}")
+        if os.path.isfile(path):
+            return path
+
+        # generate under a temporary name, so that concurrent users never see a partial payload
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write_payload(f, size=size, seed=seed, alphabet=alphabet)
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(tmp_path)
+        return path
+
+    def link(self, target: str, size: int, seed: Seed, alphabet: Optional[str] = ALPHANUMERIC) -> str:
+        """Make the payload available at target, as a hard link if possible and as a copy otherwise
+
+        Returns:
+            target
+        """
+        if os.path.lexists(target):
+            os.unlink(target)
+        with self._locked():
+            path = self.path(size=size, seed=seed, alphabet=alphabet)
+            try:
+                os.link(path, target)
+            except OSError:
+                # e.g. target is on another file system; the copy does not count as a reference
+                shutil.copyfile(path, target)
+        return target
+
+    def release(self, target: str) -> None:
+        """Remove a payload link made by link() and collect the payload if it was its last user"""
+        try:
+            os.unlink(target)
+        except FileNotFoundError:
+            pass
+        self.collect()
+
+    def collect(self) -> int:
+        """Remove all payloads without users
+
+        Returns:
+            Number of removed payloads
+        """
+        removed = 0
+        with self._locked(), os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith(PAYLOAD_SUFFIX):
+                    continue
+                try:
+                    if entry.stat().st_nlink <= 1:
+                        os.unlink(entry.path)
+                        removed += 1
+                except FileNotFoundError:
+                    continue
+        return removed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create reproducible payload files")
+    parser.add_argument("target", help="Where the payload should be linked to")
+    parser.add_argument("-s", "--size", type=int, required=True, help="Payload size in bytes")
+    parser.add_argument("--seed", default="0", help="Seed of the payload")
+    parser.add_argument("-b", "--binary", action="store_true", help="Random bytes instead of alphanumeric text")
+    parser.add_argument("-d", "--directory", default=STORE_DIRECTORY, help="Directory of the payload store")
+    args = parser.parse_args()
+
+    store = PayloadStore(directory=args.directory)
+    store.link(
+        target=args.target,
+        size=args.size,
+        seed=args.seed,
+        alphabet=None if args.binary else ALPHANUMERIC,
+    )
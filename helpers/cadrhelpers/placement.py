@@ -0,0 +1,392 @@
+#! /usr/bin/env python3
+
+import argparse
+import glob
+import json
+import os
+
+from typing import Any, Dict, Iterable, List, Optional
+
+from cadrhelpers.util import parse_scenario_xml
+
+
+SYSFS_ROOT = "/sys/devices/system"
+MOUNTS = "/proc/self/mounts"
+# all node cgroups of a session live in <cgroup2 mount>/<CGROUP_ROOT>/<session id>/<node name>
+CGROUP_ROOT = "core"
+CGROUP_CONTROLLERS = ("cpuset", "cpu", "memory")
+CPU_PERIOD = 100000
+# physical cores left to the host, the CORE daemon and the experiment script
+RESERVED_CORES = 1
+
+
+def parse_cpu_list(cpu_list: str) -> List[int]:
+    """CPU ids of a kernel cpu list, e.g. "0-3,8" """
+    cpus: List[int] = []
+    for part in cpu_list.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-")
+            cpus.extend(range(int(first), int(last) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def format_cpu_list(cpus: Iterable[int]) -> str:
+    """Kernel cpu list of CPU ids, consecutive ids are merged into ranges"""
+    ranges: List[str] = []
+    cpus = sorted(set(cpus))
+    start = 0
+    while start < len(cpus):
+        end = start
+        while end + 1 < len(cpus) and cpus[end + 1] == cpus[end] + 1:
+            end += 1
+        ranges.append(f"{cpus[start]}-{cpus[end]}" if end > start else f"{cpus[start]}")
+        start = end + 1
+    return ",".join(ranges)
+
+
+class Cpu:
+    def __init__(self, id: int, core: int, package: int, numa_node: int):
+        self.id: int = id
+        self.core: int = core
+        self.package: int = package
+        self.numa_node: int = numa_node
+
+    def __repr__(self) -> str:
+        return f"Cpu({self.id}, core={self.core}, package={self.package}, numa_node={self.numa_node})"
+
+
+class Topology:
+    """The host's online CPUs with their physical core, package and NUMA node"""
+
+    def __init__(self, cpus: List[Cpu]):
+        self.cpus: List[Cpu] = sorted(cpus, key=lambda cpu: cpu.id)
+
+    def cores(self) -> List[List[Cpu]]:
+        """Physical cores (lists of their hardware threads), ordered by NUMA node, package and core id"""
+        cores: Dict[tuple, List[Cpu]] = {}
+        for cpu in self.cpus:
+            cores.setdefault((cpu.numa_node, cpu.package, cpu.core), []).append(cpu)
+        return [cores[key] for key in sorted(cores)]
+
+    @classmethod
+    def from_sysfs(cls, root: str = SYSFS_ROOT) -> "Topology":
+        def read(path: str, default: str = "0") -> str:
+            try:
+                with open(path, "r") as f:
+                    return f.read().strip()
+            except IOError:
+                return default
+
+        numa_nodes: Dict[int, int] = {}
+        for node_path in glob.glob(os.path.join(root, "node", "node[0-9]*")):
+            node_id = int(os.path.basename(node_path)[len("node"):])
+            for cpu_id in parse_cpu_list(read(os.path.join(node_path, "cpulist"), "")):
+                numa_nodes[cpu_id] = node_id
+
+        cpus: List[Cpu] = []
+        for cpu_id in parse_cpu_list(read(os.path.join(root, "cpu", "online"))):
+            topology = os.path.join(root, "cpu", f"cpu{cpu_id}", "topology")
+            cpus.append(
+                Cpu(
+                    id=cpu_id,
+                    core=int(read(os.path.join(topology, "core_id"), str(cpu_id))),
+                    package=int(read(os.path.join(topology, "physical_package_id"))),
+                    numa_node=numa_nodes.get(cpu_id, 0),
+                )
+            )
+        return cls(cpus)
+
+    @classmethod
+    def synthetic(
+        cls, sockets: int = 1, cores_per_socket: int = 4, threads_per_core: int = 1, numa_nodes_per_socket: int = 1
+    ) -> "Topology":
+        """A host with Linux' usual numbering: the first hardware threads of all cores first, then their siblings"""
+        cores_per_numa_node = max(1, cores_per_socket // numa_nodes_per_socket)
+        cpus: List[Cpu] = []
+        for thread in range(threads_per_core):
+            for socket in range(sockets):
+                for core in range(cores_per_socket):
+                    numa_node = socket * numa_nodes_per_socket + min(
+                        core // cores_per_numa_node, numa_nodes_per_socket - 1
+                    )
+                    cpus.append(
+                        Cpu(
+                            id=(thread * sockets + socket) * cores_per_socket + core,
+                            core=core,
+                            package=socket,
+                            numa_node=numa_node,
+                        )
+                    )
+        return cls(cpus)
+
+
+class Placement:
+    """CPUs and memory nodes of an emulated node, and its optional CPU (in CPUs) and memory (in bytes) limits"""
+
+    def __init__(
+        self,
+        node: str,
+        cpus: List[int],
+        mems: List[int],
+        cpu_quota: Optional[float] = None,
+        memory_max: Optional[int] = None,
+    ):
+        self.node: str = node
+        self.cpus: List[int] = cpus
+        self.mems: List[int] = mems
+        self.cpu_quota: Optional[float] = cpu_quota
+        self.memory_max: Optional[int] = memory_max
+        # number of nodes placed on the same CPUs, including this one
+        self.shared: int = 1
+
+    def cpu_max(self) -> str:
+        """Value for cgroup v2's cpu.max"""
+        if not self.cpu_quota:
+            return f"max {CPU_PERIOD}"
+        return f"{int(self.cpu_quota * CPU_PERIOD)} {CPU_PERIOD}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "node": self.node,
+            "cpus": format_cpu_list(self.cpus),
+            "mems": format_cpu_list(self.mems),
+            "shared": self.shared,
+            "cpu_quota": self.cpu_quota,
+            "memory_max": self.memory_max,
+        }
+
+
+def plan(
+    node_names: Iterable[str],
+    topology: Topology,
+    reserved_cores: int = RESERVED_CORES,
+    cpu_quota: Optional[float] = None,
+    memory_max: Optional[int] = None,
+    partition: int = 0,
+    partitions: int = 1,
+) -> Dict[str, Placement]:
+    """Assign every node a contiguous block of whole physical cores within one NUMA node.
+
+    The nodes are distributed over the NUMA nodes in proportion to their number of cores. Within a NUMA node,
+    every node gets an equal share of the cores if there are at least as many cores as nodes, otherwise
+    neighbouring nodes share a core. The first reserved_cores cores are not used (but at least one core is).
+    With several sessions on the host, the remaining cores are split into partitions contiguous slices and
+    only slice number partition is used, so that the sessions do not compete for the same cores.
+    """
+    names = list(node_names)
+    cores = topology.cores()
+    available = cores[min(max(reserved_cores, 0), len(cores) - 1):]
+    if partitions > 1:
+        partition %= partitions
+        start = partition * len(available) // partitions
+        end = max(start + 1, (partition + 1) * len(available) // partitions)
+        available = available[start:end]
+    placements: Dict[str, Placement] = {}
+    if not names or not available:
+        return placements
+
+    groups: Dict[int, List[List[Cpu]]] = {}
+    for core in available:
+        groups.setdefault(core[0].numa_node, []).append(core)
+
+    assigned = 0
+    cores_before = 0
+    for numa_node in sorted(groups):
+        group = groups[numa_node]
+        cores_before += len(group)
+        until = round(cores_before * len(names) / len(available))
+        group_names = names[assigned:until]
+        assigned = until
+
+        for index, name in enumerate(group_names):
+            start = index * len(group) // len(group_names)
+            end = max(start + 1, (index + 1) * len(group) // len(group_names))
+            cpus = sorted(cpu.id for core in group[start:end] for cpu in core)
+            placements[name] = Placement(
+                node=name,
+                cpus=cpus,
+                mems=[numa_node],
+                cpu_quota=cpu_quota,
+                memory_max=memory_max,
+            )
+
+    for placement in placements.values():
+        placement.shared = sum(
+            1 for other in placements.values() if set(other.cpus) & set(placement.cpus)
+        )
+    return placements
+
+
+def cgroup2_mount(mounts: str = MOUNTS) -> Optional[str]:
+    """Mount point of the cgroup v2 hierarchy, if the host has one with the cpuset controller
+
+    (On hosts in hybrid mode, the controllers are bound to the v1 hierarchies and the v2 one is of no use.)
+    """
+    try:
+        with open(mounts, "r") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) > 2 and fields[2] == "cgroup2":
+                    with open(os.path.join(fields[1], "cgroup.controllers"), "r") as controllers:
+                        if "cpuset" in controllers.read().split():
+                            return fields[1]
+    except IOError:
+        pass
+    return None
+
+
+def _write(path: str, value: str) -> None:
+    with open(path, "w") as f:
+        f.write(value)
+
+
+def _enable_controllers(cgroup: str) -> List[str]:
+    """Enable the controllers we need (as far as available) for the children of cgroup"""
+    with open(os.path.join(cgroup, "cgroup.controllers"), "r") as f:
+        available = f.read().split()
+    controllers = [controller for controller in CGROUP_CONTROLLERS if controller in available]
+    if controllers:
+        _write(os.path.join(cgroup, "cgroup.subtree_control"), " ".join(f"+{c}" for c in controllers))
+    return controllers
+
+
+def session_cgroup(mount: str, session_id: int) -> str:
+    return os.path.join(mount, CGROUP_ROOT, str(session_id))
+
+
+def apply_placement(placement: Placement, pid: int, session_id: int, use_cgroup: bool = True) -> Dict[str, Any]:
+    """Confine the process pid (a node's vnoded, whose children inherit the placement) to its placement.
+
+    With cgroup v2, the process is moved into its own cgroup with cpuset, cpu.max and memory.max. Otherwise
+    (or if that fails), only its CPU affinity is set and the quotas are not enforced.
+
+    Returns:
+        The placement and how it was applied
+    """
+    record = placement.to_dict()
+    record["pid"] = pid
+    record["method"] = "none"
+
+    mount = cgroup2_mount() if use_cgroup else None
+    if mount is not None:
+        try:
+            parent = os.path.join(mount, CGROUP_ROOT)
+            session = session_cgroup(mount, session_id)
+            cgroup = os.path.join(session, placement.node)
+            os.makedirs(cgroup, exist_ok=True)
+            for directory in (mount, parent, session):
+                controllers = _enable_controllers(directory)
+
+            if "cpuset" in controllers:
+                _write(os.path.join(cgroup, "cpuset.cpus"), format_cpu_list(placement.cpus))
+                _write(os.path.join(cgroup, "cpuset.mems"), format_cpu_list(placement.mems))
+            if "cpu" in controllers:
+                _write(os.path.join(cgroup, "cpu.max"), placement.cpu_max())
+            if "memory" in controllers and placement.memory_max:
+                _write(os.path.join(cgroup, "memory.max"), str(placement.memory_max))
+            _write(os.path.join(cgroup, "cgroup.procs"), str(pid))
+
+            record["method"] = "cgroup"
+            record["cgroup"] = cgroup
+            record["controllers"] = controllers
+            if "cpuset" in controllers:
+                return record
+        except (IOError, OSError) as err:
+            record["error"] = str(err)
+
+    try:
+        os.sched_setaffinity(pid, placement.cpus)
+        record["method"] = "affinity" if record["method"] == "none" else f"{record['method']}+affinity"
+    except (OSError, AttributeError) as err:
+        record["error"] = str(err)
+    return record
+
+
+def remove_session_cgroups(session_id: int) -> None:
+    """Remove the (empty) node cgroups of a session once it was shut down"""
+    mount = cgroup2_mount()
+    if mount is None:
+        return
+    session = session_cgroup(mount, session_id)
+    for cgroup in glob.glob(os.path.join(session, "*", "")):
+        try:
+            os.rmdir(cgroup)
+        except OSError:
+            pass
+    try:
+        os.rmdir(session)
+    except OSError:
+        pass
+
+
+def place_node(
+    node_name: str, pid: int, session_id: int, node_names: Iterable[str], config: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """Plan the placement of all nodes according to the [Placement] section of the experiment config
+    and apply this node's placement
+
+    If the config expects several concurrent sessions on this host (sessions), the session gets the partition slot
+    of the host's cores. The slots are assigned by the admission of the concurrent sessions, so that no two of them
+    share one, whatever their session ids.
+
+    Returns:
+        The applied placement, or None if placement is disabled or the node is not part of the plan
+    """
+    if not config.get("enabled", False):
+        return None
+
+    placements = plan(
+        node_names=node_names,
+        topology=Topology.from_sysfs(),
+        reserved_cores=config.get("reserved_cores", RESERVED_CORES),
+        cpu_quota=config.get("cpu_quota") or None,
+        memory_max=config.get("memory_max") or None,
+        partition=config.get("slot", 0),
+        partitions=config.get("sessions", 1),
+    )
+    placement = placements.get(node_name)
+    if placement is None:
+        return None
+    return apply_placement(
+        placement=placement, pid=pid, session_id=session_id, use_cgroup=config.get("cgroup", True)
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plan the CPU placement of a scenario's nodes")
+    parser.add_argument("scenario", help="Path to the scenario xml")
+    parser.add_argument("--sockets", type=int, help="Plan for a synthetic host instead of this one")
+    parser.add_argument("--cores", type=int, default=4, help="Cores per socket of the synthetic host")
+    parser.add_argument("--threads", type=int, default=1, help="Hardware threads per core of the synthetic host")
+    parser.add_argument("--numa-nodes", type=int, default=1, help="NUMA nodes per socket of the synthetic host")
+    parser.add_argument("--reserved-cores", type=int, default=RESERVED_CORES, help="Cores left to the host")
+    parser.add_argument("--cpu-quota", type=float, help="CPU limit of every node, in CPUs")
+    parser.add_argument("--memory-max", type=int, help="Memory limit of every node, in bytes")
+    parser.add_argument("--sessions", type=int, default=1, help="Number of concurrent sessions on the host")
+    parser.add_argument("--slot", type=int, default=0, help="Slot of the session to plan for, with --sessions")
+    args = parser.parse_args()
+
+    if args.sockets:
+        topology = Topology.synthetic(
+            sockets=args.sockets,
+            cores_per_socket=args.cores,
+            threads_per_core=args.threads,
+            numa_nodes_per_socket=args.numa_nodes,
+        )
+    else:
+        topology = Topology.from_sysfs()
+
+    placements = plan(
+        node_names=[node.name for node in parse_scenario_xml(args.scenario)],
+        topology=topology,
+        reserved_cores=args.reserved_cores,
+        cpu_quota=args.cpu_quota,
+        memory_max=args.memory_max,
+        partition=args.slot,
+        partitions=args.sessions,
+    )
+    print(json.dumps([placement.to_dict() for placement in placements.values()], indent=1))
@@ -0,0 +1,289 @@
+#! /usr/bin/env python3
+
+import argparse
+import math
+import random
+
+from typing import Callable, Dict, List, TextIO, Tuple
+
+from cadrhelpers.movement_generator import compute_distance, compute_travel_time, node_speed
+
+
+# CPU, memory and network usage are sampled host-wide (ExperimentFramework/resource_sampler.py)
+SERVICES: List[str] = [
+    "dtn7",
+    # runs NodeHelper, TrafficGenerator, NodeContext and MovementContext in one process
+    "NodeAgent",
+]
+# NodeAgent roles of every device, the services the generated nodes used to run
+ROLES: List[str] = ["node_helper", "traffic_generator", "node_context"]
+NODE_TYPES: List[str] = ["coordinator", "responder", "civilian"]
+
+# values of the hand-made scenarios (responders.xml)
+WIFI_RANGE = 275
+BANDWIDTH = 54000000
+DELAY = 20000
+
+
+def uniform_layout(count: int, width: float, height: float) -> List[Tuple[float, float]]:
+    return [(random.uniform(0, width), random.uniform(0, height)) for _ in range(count)]
+
+
+def clustered_layout(
+    count: int, width: float, height: float, clusters: int = 0, spread: float = WIFI_RANGE
+) -> List[Tuple[float, float]]:
+    """Nodes are grouped around random cluster centres with a gaussian spread, e.g. teams of responders"""
+    if clusters <= 0:
+        clusters = max(1, int(math.sqrt(count)))
+    centres = uniform_layout(count=clusters, width=width, height=height)
+
+    positions: List[Tuple[float, float]] = []
+    for _ in range(count):
+        centre_x, centre_y = random.choice(centres)
+        x_pos = min(max(random.gauss(centre_x, spread), 0), width)
+        y_pos = min(max(random.gauss(centre_y, spread), 0), height)
+        positions.append((x_pos, y_pos))
+    return positions
+
+
+def grid_layout(count: int, width: float, height: float) -> List[Tuple[float, float]]:
+    columns = max(1, int(math.ceil(math.sqrt(count * width / height))))
+    rows = max(1, int(math.ceil(count / columns)))
+    x_step = width / columns
+    y_step = height / rows
+    return [
+        ((index % columns + 0.5) * x_step, (index // columns + 0.5) * y_step)
+        for index in range(count)
+    ]
+
+
+LAYOUTS: Dict[str, Callable[[int, float, float], List[Tuple[float, float]]]] = {
+    "uniform": uniform_layout,
+    "clustered": clustered_layout,
+    "grid": grid_layout,
+}
+
+
+def assign_types(count: int, coordinators: int, responder_ratio: float) -> List[str]:
+    """Coordinators come first (so that the first coordinator is n2, like in the hand-made scenarios),
+    the rest is split between responders and civilians."""
+    coordinators = min(coordinators, count)
+    responders = int(round((count - coordinators) * responder_ratio))
+    civilians = count - coordinators - responders
+    return ["coordinator"] * coordinators + ["responder"] * responders + ["civilian"] * civilians
+
+
+def write_device(f: TextIO, node_id: int, node_type: str, x_pos: int, y_pos: int) -> None:
+    roles = ",".join(ROLES)
+    f.write(f'    <device id="{node_id}" name="n{node_id}" type="{node_type}" roles="{roles}" class="" image="">\n')
+    f.write(f'      <position x="{x_pos}" y="{y_pos}" alt="2.0"/>\n')
+    f.write("      <services>\n")
+    for service in SERVICES:
+        f.write(f'        <service name="{service}"/>\n')
+    f.write("      </services>\n")
+    f.write("    </device>\n")
+
+
+def write_link(f: TextIO, index: int, node_id: int) -> None:
+    mac = f"00:00:00:aa:{(index >> 8) & 0xFF:02x}:{index & 0xFF:02x}"
+    ip4 = f"10.0.{(index + 1) >> 8}.{(index + 1) & 0xFF}"
+    f.write(f'    <link node_one="1" node_two="{node_id}">\n')
+    f.write(
+        f'      <interface_two id="0" name="eth0" mac="{mac}" ip4="{ip4}" ip4_mask="16" '
+        f'ip6="2001::{index + 1:x}" ip6_mask="64"/>\n'
+    )
+    f.write("    </link>\n")
+
+
+def write_scenario(
+    f: TextIO,
+    name: str,
+    types: List[str],
+    positions: List[Tuple[float, float]],
+    width: float,
+    height: float,
+    wifi_range: int = WIFI_RANGE,
+    ns2_path: str = "",
+) -> None:
+    """Write a CORE scenario xml directly to the file, without building an element tree"""
+    f.write("<?xml version='1.0' encoding='UTF-8'?>\n")
+    f.write(f'<scenario name="{name}">\n')
+    f.write("  <networks>\n")
+    f.write('    <network id="1" name="wlan1" type="WIRELESS_LAN">\n')
+    f.write(f'      <position x="{int(width / 2)}" y="{int(height / 2)}" alt="2.0"/>\n')
+    f.write("    </network>\n")
+    f.write("  </networks>\n")
+
+    # CORE ignores positions with a zero coordinate, so keep everything at least 1 unit away from the border
+    f.write("  <devices>\n")
+    for index, (node_type, (x_pos, y_pos)) in enumerate(zip(types, positions)):
+        write_device(
+            f, node_id=index + 2, node_type=node_type, x_pos=max(1, int(x_pos)), y_pos=max(1, int(y_pos))
+        )
+    f.write("  </devices>\n")
+
+    f.write("  <links>\n")
+    for index in range(len(types)):
+        write_link(f, index=index, node_id=index + 2)
+    f.write("  </links>\n")
+
+    f.write("  <mobility_configurations>\n")
+    f.write('    <mobility_configuration node="1" model="basic_range">\n')
+    f.write(f'      <configuration name="range" value="{wifi_range}"/>\n')
+    f.write(f'      <configuration name="bandwidth" value="{BANDWIDTH}"/>\n')
+    f.write('      <configuration name="jitter" value="0"/>\n')
+    f.write(f'      <configuration name="delay" value="{DELAY}"/>\n')
+    f.write('      <configuration name="error" value="0"/>\n')
+    f.write("    </mobility_configuration>\n")
+    if ns2_path:
+        f.write('    <mobility_configuration node="1" model="ns2script">\n')
+        f.write(f'      <configuration name="file" value="{ns2_path}"/>\n')
+        f.write('      <configuration name="refresh_ms" value="50"/>\n')
+        f.write('      <configuration name="loop" value="1"/>\n')
+        f.write('      <configuration name="autostart" value="1"/>\n')
+        f.write('      <configuration name="map" value=""/>\n')
+        f.write('      <configuration name="script_start" value=""/>\n')
+        f.write('      <configuration name="script_pause" value=""/>\n')
+        f.write('      <configuration name="script_stop" value=""/>\n')
+        f.write("    </mobility_configuration>\n")
+    f.write("  </mobility_configurations>\n")
+
+    f.write("  <default_services>\n")
+    for node_type in NODE_TYPES:
+        f.write(f'    <node type="{node_type}">\n')
+        for service in SERVICES:
+            f.write(f'      <service name="{service}"/>\n')
+        f.write("    </node>\n")
+    f.write("  </default_services>\n")
+    f.write("</scenario>\n")
+
+
+def write_movements(
+    f: TextIO,
+    types: List[str],
+    positions: List[Tuple[float, float]],
+    width: float,
+    height: float,
+    duration: float,
+    mobile_types: List[str],
+    wait_time: float = 2.0,
+) -> None:
+    """Random waypoint movements for all nodes of the mobile types, in the same format as movement_generator"""
+    mobile = [index for index, node_type in enumerate(types) if node_type in mobile_types]
+    f.write(f"# nodes: {len(mobile)}\n")
+
+    for index in mobile:
+        node_id = index + 2
+        x_pos, y_pos = max(1, int(positions[index][0])), max(1, int(positions[index][1]))
+        f.write("\n")
+        f.write(f"$node_({node_id}) set X_ {float(x_pos)}\n")
+        f.write(f"$node_({node_id}) set Y_ {float(y_pos)}\n")
+
+        locomotion: str = random.choice(["walk", "powerwalk", "jog"])
+        current_time: float = 1.0
+        while current_time < duration:
+            next_x = round(random.uniform(1, width), 2)
+            next_y = round(random.uniform(1, height), 2)
+            speed = node_speed(locomotion=locomotion)
+            f.write(
+                f'$ns_ at {current_time} "$node_({node_id}) setdest {next_x} {next_y} {speed}"\n'
+            )
+            distance = compute_distance(start_x=x_pos, start_y=y_pos, end_x=next_x, end_y=next_y)
+            current_time = round(
+                current_time + compute_travel_time(distance=distance, speed=speed, wait_time=wait_time),
+                0,
+            )
+            x_pos, y_pos = next_x, next_y
+
+
+def generate_scenario(
+    xml_path: str,
+    count: int,
+    width: float = 3000.0,
+    height: float = 3000.0,
+    layout: str = "uniform",
+    coordinators: int = 1,
+    responder_ratio: float = 0.5,
+    seed: int = 0,
+    ns2_path: str = "",
+    duration: float = 3600.0,
+    mobile_types: Tuple[str, ...] = ("responder", "civilian"),
+    wifi_range: int = WIFI_RANGE,
+) -> None:
+    """Generate a synthetic CORE scenario with count devices (and optionally their ns2 movements)
+
+    Args:
+        xml_path: Output path of the scenario
+        count: Number of devices
+        width: Width of the simulated area
+        height: Height of the simulated area
+        layout: One of LAYOUTS, determines the initial node positions
+        coordinators: Number of coordinator nodes
+        responder_ratio: Share of responders among the non-coordinator nodes
+        seed: Seed for Python's PRNG so you can get reproducible scenarios
+        ns2_path: If set, random waypoint movements are written there and referenced by the scenario
+        duration: Length of the generated movements in seconds
+        mobile_types: Node types which move
+        wifi_range: Range of the basic_range wifi model
+    """
+    random.seed(seed)
+    types = assign_types(count=count, coordinators=coordinators, responder_ratio=responder_ratio)
+    positions = LAYOUTS[layout](count, width, height)
+
+    with open(xml_path, "w") as f:
+        write_scenario(
+            f,
+            name=xml_path,
+            types=types,
+            positions=positions,
+            width=width,
+            height=height,
+            wifi_range=wifi_range,
+            ns2_path=ns2_path,
+        )
+
+    if ns2_path:
+        with open(ns2_path, "w") as f:
+            write_movements(
+                f,
+                types=types,
+                positions=positions,
+                width=width,
+                height=height,
+                duration=duration,
+                mobile_types=list(mobile_types),
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic CORE scenario with many responder/civilian/coordinator devices"
+    )
+    parser.add_argument("output", help="path for the resulting scenario xml")
+    parser.add_argument("-n", "--nodes", type=int, default=500, help="number of devices")
+    parser.add_argument("--width", type=float, default=3000.0, help="width of the area")
+    parser.add_argument("--height", type=float, default=3000.0, help="height of the area")
+    parser.add_argument(
+        "-l", "--layout", choices=list(LAYOUTS), default="uniform", help="layout model for the node positions"
+    )
+    parser.add_argument("-c", "--coordinators", type=int, default=1, help="number of coordinators")
+    parser.add_argument(
+        "-r", "--responder_ratio", type=float, default=0.5, help="share of responders among the other nodes"
+    )
+    parser.add_argument("--movements", default="", help="path for a matching ns2 movement file")
+    parser.add_argument("-d", "--duration", type=float, default=3600.0, help="length of the movements in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the software RNG")
+    args = parser.parse_args()
+
+    generate_scenario(
+        xml_path=args.output,
+        count=args.nodes,
+        width=args.width,
+        height=args.height,
+        layout=args.layout,
+        coordinators=args.coordinators,
+        responder_ratio=args.responder_ratio,
+        seed=args.seed,
+        ns2_path=args.movements,
+        duration=args.duration,
+    )
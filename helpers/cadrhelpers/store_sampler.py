@@ -0,0 +1,169 @@
+#! /usr/bin/env python3
+
+import argparse
+import atexit
+import csv
+import os
+import signal
+import threading
+import time
+
+from typing import List, Optional, Tuple
+
+import requests
+import toml
+
+from cadrhelpers.dtnclient import RESTError, build_url, get_size
+
+
+STORE_LOG = "store_log.csv"
+SAMPLE_INTERVAL = 10.0
+MAX_INTERVAL = 120.0
+BATCH_SIZE = 6
+
+
+class StoreSampler:
+    """Periodically polls dtnd's store size and writes it to store_log.csv (timestamp, node, size)
+
+    All requests go over one persistent HTTP session. Samples are buffered and written in batches, and the rest
+    when the sampler is stopped or the process exits or is terminated (see flush_on_termination).
+    If dtnd answers slowly (more than half the current interval) or not at all, the interval is doubled
+    up to max_interval, and it is halved again back to the base interval once dtnd responds quickly.
+    """
+
+    def __init__(
+        self,
+        rest_url: str,
+        node_name: str,
+        interval: float = SAMPLE_INTERVAL,
+        max_interval: float = MAX_INTERVAL,
+        batch_size: int = BATCH_SIZE,
+        path: str = STORE_LOG,
+        session: Optional[requests.Session] = None,
+    ):
+        self.rest_url: str = rest_url
+        self.node_name: str = node_name
+        self.base_interval: float = interval
+        self.interval: float = interval
+        self.max_interval: float = max_interval
+        self.batch_size: int = batch_size
+        self.path: str = path
+        self.samples: List[Tuple[float, int]] = []
+        self.lock = threading.Lock()
+        # a session shared with others (e.g. by the node agent) stays open
+        self.own_session: bool = session is None
+        self.session = session if session is not None else requests.Session()
+        self.stopped = threading.Event()
+
+    def sample(self) -> Optional[int]:
+        """Take a single sample and adapt the sampling interval to dtnd's response time"""
+        start = time.time()
+        try:
+            size: Optional[int] = get_size(
+                rest_url=self.rest_url, session=self.session, timeout=self.max_interval
+            )
+        except (RESTError, requests.RequestException, ValueError) as err:
+            print(f"Store size sampling failed: {err}", flush=True)
+            size = None
+        elapsed = time.time() - start
+
+        if size is None or elapsed > self.interval / 2:
+            self.interval = min(self.interval * 2, self.max_interval)
+        elif self.interval > self.base_interval:
+            self.interval = max(self.interval / 2, self.base_interval)
+
+        if size is not None:
+            with self.lock:
+                self.samples.append((start, size))
+                full = len(self.samples) >= self.batch_size
+            if full:
+                self.flush()
+
+        return size
+
+    def flush(self) -> None:
+        with self.lock:
+            if not self.samples:
+                return
+
+            with open(self.path, "a", newline="") as f:
+                writer = csv.writer(f)
+                if f.tell() == 0:
+                    writer.writerow(["timestamp", "node", "size"])
+                writer.writerows(
+                    (f"{timestamp:.3f}", self.node_name, size) for timestamp, size in self.samples
+                )
+            self.samples = []
+
+    def run(self) -> None:
+        print(f"Sampling store size every {self.interval} seconds", flush=True)
+        try:
+            while not self.stopped.wait(self.interval):
+                self.sample()
+        finally:
+            self.flush()
+            if self.own_session:
+                self.session.close()
+
+    def start(self) -> threading.Thread:
+        """Run the sampler in a background thread"""
+        _samplers.append(self)
+        thread = threading.Thread(target=self.run, name="store-sampler", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+
+# samplers running in background threads, flushed by flush_all
+_samplers: List[StoreSampler] = []
+
+
+def flush_all() -> None:
+    """Stop all background samplers and write their buffered samples"""
+    for sampler in list(_samplers):
+        sampler.stop()
+        sampler.flush()
+
+
+def _terminate(signum, frame) -> None:
+    flush_all()
+    signal.signal(signum, signal.SIG_DFL)
+    os.kill(os.getpid(), signum)
+
+
+def flush_on_termination() -> None:
+    """Write the buffered samples when the process exits or receives SIGTERM (must be called from the main thread)"""
+    atexit.register(flush_all)
+    signal.signal(signal.SIGTERM, _terminate)
+
+
+def sampler_from_config(
+    config_data, node_name: str, session: Optional[requests.Session] = None
+) -> StoreSampler:
+    rest_url = build_url(
+        address=config_data["REST"]["address"], port=config_data["REST"]["routing_port"]
+    )
+    experiment = config_data.get("Experiment", {})
+    return StoreSampler(
+        rest_url=rest_url,
+        node_name=node_name,
+        interval=experiment.get("store_sample_interval", SAMPLE_INTERVAL),
+        session=session,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Log the size of dtnd's bundle store")
+    parser.add_argument("path", help="Path to the config file")
+    args = parser.parse_args()
+
+    config_data = toml.load(args.path)
+    sampler = sampler_from_config(config_data=config_data, node_name=config_data["Node"]["name"])
+    _samplers.append(sampler)
+    flush_on_termination()
+    try:
+        sampler.run()
+    except KeyboardInterrupt:
+        pass
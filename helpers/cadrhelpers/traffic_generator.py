@@ -2,18 +2,20 @@
 
 import random
 import time
-import string
 import argparse
-import sys
 import toml
 
 from dataclasses import dataclass
 from hashlib import sha1
-from typing import Tuple, List
+from typing import Any, Dict, Tuple, List, Optional
+
+import requests
 from requests.exceptions import Timeout
 
 import cadrhelpers.dtnclient as dtnclient
 from cadrhelpers.dtnclient import send_context, build_url
+from cadrhelpers.ledger import SEND_LEDGER, SendLedger, stamp_payload
+from cadrhelpers.payload_store import ALPHANUMERIC, generate_payload
 from cadrhelpers.util import (
     is_context,
     compute_euclidean_distance,
@@ -24,6 +26,9 @@ from cadrhelpers.util import (
 
 T_START = 30
 T_STOP = 3600
+# how long to wait for the experiment's readiness barrier before starting anyway
+START_TIMEOUT = 600
+START_POLL_INTERVAL = 0.5
 
 
 def compute_wait_times(t_start: int, t_stop: int, count: int) -> List[int]:
@@ -52,6 +57,20 @@ def compute_wait_times(t_start: int, t_stop: int, count: int) -> List[int]:
     return wait_times
 
 
+def wait_for_start(start_file: str, timeout: float = START_TIMEOUT) -> float:
+    """Wait until the experiment wrote the traffic start time (once all dtnds are ready) and return it"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with open(start_file, "r") as f:
+                return float(f.read())
+        except (FileNotFoundError, ValueError):
+            time.sleep(START_POLL_INTERVAL)
+
+    print(f"{time.time()}: No traffic start after {timeout} seconds, starting now", flush=True)
+    return time.time()
+
+
 @dataclass()
 class TrafficGenerator:
     agent_url: str
@@ -69,6 +88,10 @@ class TrafficGenerator:
     payload: str = ""
     payload_path: str = ""
     uuid: str = ""
+    send_ledger_path: str = SEND_LEDGER
+    start_file: str = ""
+    # if set, all requests reuse this session's persistent connections
+    session: Optional[requests.Session] = None
 
     def run(self) -> None:
         print(f"{time.time()}: Using context {self.context}", flush=True)
@@ -77,16 +100,24 @@ class TrafficGenerator:
 
         self.initialise_rng(seed=self.seed, node_name=self.node_name)
 
-        wait_times = compute_wait_times(T_START, T_STOP, self.number_of_bundles)
+        if self.start_file:
+            # the readiness barrier replaces the fixed T_START, the traffic period keeps its length
+            wait_times = compute_wait_times(0, T_STOP - T_START, self.number_of_bundles)
+            start = wait_for_start(start_file=self.start_file)
+            wait_times[0] = max(wait_times[0] - (time.time() - start), 0)
+        else:
+            wait_times = compute_wait_times(T_START, T_STOP, self.number_of_bundles)
 
         self.uuid = dtnclient.register(
-            rest_url=self.agent_url, endpoint_id=self.endpoint_id
+            rest_url=self.agent_url, endpoint_id=self.endpoint_id, session=self.session
         )["uuid"]
 
         if not self.generate_payload:
             self._load_payload()
 
-        for sleep_time in wait_times:
+        send_ledger = SendLedger(path=self.send_ledger_path)
+
+        for sequence, sleep_time in enumerate(wait_times):
             try:
                 print(f"{time.time()}: Waiting for {sleep_time} seconds", flush=True)
                 time.sleep(sleep_time)
@@ -94,20 +125,39 @@ class TrafficGenerator:
                 if self.generate_payload:
                     self.payload = self._generate_payload()
 
+                # the receiver's node helper computes the end-to-end latency from this header
+                created = time.time()
+                payload = stamp_payload(
+                    payload=self.payload,
+                    created=created,
+                    source=self.endpoint_id,
+                    sequence=sequence,
+                )
+
                 if self.context:
                     if self.context_algorithm == "spray":
-                        self.send_context_spray(payload=self.payload)
+                        self.send_context_spray(payload=payload)
                     elif self.context_algorithm == "responders":
                         self.send_context_bundle(
-                            payload=self.payload,
+                            payload=payload,
                         )
                     else:
-                        self.send_with_empty_context(payload=self.payload)
+                        self.send_with_empty_context(payload=payload)
                 else:
-                    self.send_bundle(payload=self.payload)
+                    self.send_bundle(payload=payload)
+
+                send_ledger.record(
+                    source=self.endpoint_id,
+                    sequence=sequence,
+                    destination=self.destination,
+                    created=created,
+                    size=len(payload),
+                )
             except Timeout:
                 print(f"{time.time()}: Sending caused timeout", flush=True)
 
+        send_ledger.close()
+
         print(f"{time.time()}: Done sending", flush=True)
 
     def send_bundle(self, payload: str):
@@ -118,6 +168,7 @@ class TrafficGenerator:
             destination=self.destination,
             source=self.endpoint_id,
             payload=payload,
+            session=self.session,
         )
         print(f"{time.time()}: Bundle sent", flush=True)
 
@@ -139,6 +190,7 @@ class TrafficGenerator:
             source=self.endpoint_id,
             payload=payload,
             context=context,
+            session=self.session,
         )
         print(f"{time.time()}: Bundle sent", flush=True)
 
@@ -152,6 +204,7 @@ class TrafficGenerator:
             source=self.endpoint_id,
             payload=payload,
             context=context,
+            session=self.session,
         )
 
     def send_with_empty_context(self, payload: str) -> None:
@@ -164,6 +217,7 @@ class TrafficGenerator:
             source=self.endpoint_id,
             payload=payload,
             context=context,
+            session=self.session,
         )
         print(f"{time.time()}: Bundle sent", flush=True)
 
@@ -186,24 +240,16 @@ class TrafficGenerator:
 
     def _generate_payload(self) -> str:
         print(f'{time.time()}: Generating payload')
-        payload: str = "".join(
-            random.choices(string.ascii_letters + string.digits, k=self.payload_size)
-        )
+        # the payload's seed comes from the node's RNG, so it is reproducible as well
+        payload: str = generate_payload(
+            size=self.payload_size, seed=random.getrandbits(64), alphabet=ALPHANUMERIC
+        ).decode("ascii")
         return payload
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Generates simulation traffic.")
-    parser.add_argument("path", help="Path to the config file")
-    args = parser.parse_args()
-
-    node_config = toml.load(args.path)
-    print(f"{time.time()}: Using config: {node_config}", flush=True)
-
-    nodes: Nodes = parse_scenario_xml(path=node_config["Scenario"]["xml"])
-    this_node = nodes.get_node_for_name(node_name=node_config["Node"]["name"])
-    print(f"{time.time()}: This node's type: {this_node.type}", flush=True)
-
+def run_from_config(
+    node_config: Dict[str, Any], nodes: Nodes, this_node: Node, session: Optional[requests.Session] = None
+) -> None:
     destination = ""
     if this_node.type == "civilian":
         destination = "dtn://coordinator/"
@@ -211,7 +257,7 @@ if __name__ == "__main__":
         destination = "dtn://civilians/announcements"
     else:
         print(f"{time.time()}: Node type does not produce bundles.", flush=True)
-        sys.exit(0)
+        return
 
     routing_url = build_url(
         address=node_config["REST"]["address"], port=node_config["REST"]["routing_port"]
@@ -237,6 +283,23 @@ if __name__ == "__main__":
         generate_payload=node_config["Experiment"]["generate_payload"],
         payload_path=node_config["Experiment"]["payload_path"],
         number_of_bundles=node_config["Experiment"]["bundles_per_node"],
+        start_file=node_config["Experiment"].get("start_file", ""),
+        session=session,
     )
     traffig_generator.run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates simulation traffic.")
+    parser.add_argument("path", help="Path to the config file")
+    args = parser.parse_args()
+
+    node_config = toml.load(args.path)
+    print(f"{time.time()}: Using config: {node_config}", flush=True)
+
+    nodes: Nodes = parse_scenario_xml(path=node_config["Scenario"]["xml"])
+    this_node = nodes.get_node_for_name(node_name=node_config["Node"]["name"])
+    print(f"{time.time()}: This node's type: {this_node.type}", flush=True)
+
+    run_from_config(node_config=node_config, nodes=nodes, this_node=this_node)
     print(f"{time.time()}: Terminated", flush=True)
@@ -1,5 +1,7 @@
 import math
-from typing import Tuple, List, Union
+import itertools
+
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from xml.etree import ElementTree as ElementTree
 
 
@@ -16,72 +18,265 @@ def is_context(name: str) -> Tuple[bool, str]:
 class Node:
     """Simulation node"""
 
-    def __init__(self, id: int, name: str, type: str, x_pos: float, y_pos: float):
+    __slots__ = ("id", "name", "type", "x_pos", "y_pos", "roles")
+
+    def __init__(
+        self, id: int, name: str, type: str, x_pos: float, y_pos: float, roles: Optional[List[str]] = None
+    ):
         self.id: int = id
         self.name: str = name
         self.type: str = type
         self.x_pos: float = x_pos
         self.y_pos: float = y_pos
+        # node_agent roles of this node, None if the scenario does not list them
+        self.roles: Optional[List[str]] = roles
 
     def __repr__(self) -> str:
         return f"Node(id={self.id}, name='{self.name}', type='{self.type}', x_pos={self.x_pos}, y_pos={self.y_pos})"
 
 
 def compute_euclidean_distance(node_a: Node, node_b: Node) -> float:
-    x_diff = math.pow(node_a.x_pos - node_b.x_pos, 2)
-    y_diff = math.pow(node_a.y_pos - node_b.y_pos, 2)
-    return math.sqrt(x_diff + y_diff)
+    return math.hypot(node_a.x_pos - node_b.x_pos, node_a.y_pos - node_b.y_pos)
+
+
+class SpatialGrid:
+    """Uniform grid over node positions for range queries
+
+    Nodes are bucketed into square cells of side cell_size, so a query for radius r only has to look at the
+    cells overlapping the query circle's bounding box instead of at every node.
+    """
+
+    __slots__ = ("cell_size", "cells")
+
+    def __init__(self, nodes: Iterable[Node], cell_size: float):
+        assert cell_size > 0, "Grid cells need a positive size"
+        self.cell_size: float = cell_size
+        self.cells: Dict[Tuple[int, int], List[Node]] = {}
+        for node in nodes:
+            self.cells.setdefault(self._cell(node.x_pos, node.y_pos), []).append(node)
+
+    def _cell(self, x_pos: float, y_pos: float) -> Tuple[int, int]:
+        return int(math.floor(x_pos / self.cell_size)), int(math.floor(y_pos / self.cell_size))
+
+    def within(self, x_pos: float, y_pos: float, radius: float) -> List[Node]:
+        """All nodes whose distance to (x_pos, y_pos) is at most radius"""
+        min_x, min_y = self._cell(x_pos - radius, y_pos - radius)
+        max_x, max_y = self._cell(x_pos + radius, y_pos + radius)
+        radius_squared = radius * radius
+
+        found: List[Node] = []
+        for cell_x in range(min_x, max_x + 1):
+            for cell_y in range(min_y, max_y + 1):
+                for node in self.cells.get((cell_x, cell_y), ()):
+                    x_diff = node.x_pos - x_pos
+                    y_diff = node.y_pos - y_pos
+                    if x_diff * x_diff + y_diff * y_diff <= radius_squared:
+                        found.append(node)
+        return found
 
 
 class Nodes:
-    """All the nodes in the simulation"""
+    """All the nodes in the simulation
 
-    def __init__(self, responders: List[Node], civilians: List[Node], coordinators: List[Node]):
+    Lookups by name, id and type are served from dictionaries built on construction,
+    range queries from a SpatialGrid which is built lazily (once per cell size).
+    """
+
+    def __init__(
+        self,
+        responders: List[Node],
+        civilians: List[Node],
+        coordinators: List[Node],
+        sensors: Optional[List[Node]] = None,
+        backbone: Optional[List[Node]] = None,
+        visitors: Optional[List[Node]] = None,
+    ):
         self.responders: List[Node] = responders
         self.civilians: List[Node] = civilians
         self.coordinators: List[Node] = coordinators
+        # static nodes of the sensor scenarios
+        self.sensors: List[Node] = sensors if sensors is not None else []
+        self.backbone: List[Node] = backbone if backbone is not None else []
+        # mobile nodes of the sensor scenarios
+        self.visitors: List[Node] = visitors if visitors is not None else []
+
+        self.by_name: Dict[str, Node] = {}
+        self.by_id: Dict[int, Node] = {}
+        self.by_type: Dict[str, List[Node]] = {
+            "responder": responders,
+            "civilian": civilians,
+            "coordinator": coordinators,
+            "sensor": self.sensors,
+            "backbone": self.backbone,
+            "visitor": self.visitors,
+        }
+        for node in self:
+            self.by_name[node.name] = node
+            self.by_id[node.id] = node
+
+        self._grids: Dict[float, SpatialGrid] = {}
+
+    def __iter__(self) -> Iterator[Node]:
+        return itertools.chain(
+            self.responders, self.civilians, self.coordinators, self.sensors, self.backbone, self.visitors
+        )
+
+    def __len__(self) -> int:
+        return sum(len(nodes) for nodes in self.by_type.values())
+
+    def __contains__(self, node_name: str) -> bool:
+        return node_name in self.by_name
 
     def get_node_for_name(self, node_name: str) -> Node:
-        ourself: Union[Node, None] = None
-
-        for node in self.responders + self.civilians + self.coordinators:
-            if node.name == node_name:
-                ourself = node
+        ourself: Optional[Node] = self.by_name.get(node_name)
 
         assert (
             ourself is not None
         ), "This node should really show up in the list of nodes"
         return ourself
 
+    def get_node_for_id(self, node_id: int) -> Node:
+        node: Optional[Node] = self.by_id.get(node_id)
+        assert node is not None, f"No node with id {node_id}"
+        return node
+
+    def get_nodes_for_type(self, node_type: str) -> List[Node]:
+        return self.by_type.get(node_type, [])
+
+    def grid(self, cell_size: float) -> SpatialGrid:
+        """Spatial index with the given cell size, cached since positions are static"""
+        grid = self._grids.get(cell_size)
+        if grid is None:
+            grid = SpatialGrid(nodes=self, cell_size=cell_size)
+            self._grids[cell_size] = grid
+        return grid
+
+    def nodes_within(self, x_pos: float, y_pos: float, radius: float) -> List[Node]:
+        """All nodes within radius of the position (x_pos, y_pos)"""
+        return self.grid(cell_size=radius).within(x_pos=x_pos, y_pos=y_pos, radius=radius)
+
+    def neighbours(self, node_name: str, radius: float) -> List[Node]:
+        """All other nodes within radius of the named node"""
+        ourself = self.get_node_for_name(node_name=node_name)
+        return [
+            node
+            for node in self.nodes_within(x_pos=ourself.x_pos, y_pos=ourself.y_pos, radius=radius)
+            if node is not ourself
+        ]
+
+    def degrees(self, radius: float) -> Dict[str, int]:
+        """Number of other nodes within radius, for every node
+
+        With the cell size equal to the radius, only the 3x3 block of cells around each cell has to be checked.
+        """
+        grid = self.grid(cell_size=radius)
+        radius_squared = radius * radius
+        degrees: Dict[str, int] = {node.name: 0 for node in self}
+
+        for (cell_x, cell_y), cell_nodes in grid.cells.items():
+            candidates: List[Node] = []
+            for x_offset in (-1, 0, 1):
+                for y_offset in (-1, 0, 1):
+                    candidates.extend(grid.cells.get((cell_x + x_offset, cell_y + y_offset), ()))
+
+            for node in cell_nodes:
+                count = -1  # the node itself is among the candidates
+                for other in candidates:
+                    x_diff = node.x_pos - other.x_pos
+                    y_diff = node.y_pos - other.y_pos
+                    if x_diff * x_diff + y_diff * y_diff <= radius_squared:
+                        count += 1
+                degrees[node.name] = count
+
+        return degrees
+
     def __str__(self) -> str:
         return f"Responders: {self.responders}\nCivilians: {self.civilians}\nCoordinators: {self.coordinators}"
 
 
-def parse_scenario_xml(path: str) -> Nodes:
+def parse_scenario_xml(path: str, streaming: bool = False) -> Nodes:
     """Parse the scenario's xml definition and separate the different types of nodes
 
+    Args:
+        path: Path to the CORE scenario xml
+        streaming: Use iterparse and discard every element once it has been processed,
+                   so that huge scenarios never have their whole element tree in memory
+
     Returns:
-        Three lists (visitors, sensors, backbone)
+        Nodes object with lists of the responders, civilians, coordinators, sensors, backbone nodes and visitors
     """
+    if streaming:
+        return _sort_nodes(_iter_devices(path))
+
     tree = ElementTree.parse(path)
     root = tree.getroot()
 
-    responders: List[Node] = []
-    civilians: List[Node] = []
-    coordinators: List[Node] = []
-
+    devices: List[Node] = []
     for child in root:
         if child.tag == "devices":
             for node_data in child:
-                node = get_node_info(node_data)
-                if node.type == "responder":
-                    responders.append(node)
-                elif node.type == "civilian":
-                    civilians.append(node)
-                elif node.type == "coordinator":
-                    coordinators.append(node)
+                devices.append(get_node_info(node_data))
+
+    return _sort_nodes(devices)
+
+
+def _iter_devices(path: str) -> Iterator[Node]:
+    """Stream the devices of a scenario xml
+
+    Each top-level section (devices, links, ...) is cleared as soon as one of its children has been completely
+    read, so at most a single child element is kept in memory at any time.
+    """
+    depth: int = 0
+    section: Optional[ElementTree.Element] = None
+
+    for event, element in ElementTree.iterparse(path, events=("start", "end")):
+        if event == "start":
+            depth += 1
+            if depth == 2:
+                section = element
+            continue
 
-    return Nodes(responders=responders, civilians=civilians, coordinators=coordinators)
+        if depth == 3 and section is not None:
+            if section.tag == "devices":
+                yield get_node_info(element)
+            section.clear()
+        elif depth == 2:
+            element.clear()
+            section = None
+
+        depth -= 1
+
+
+def _sort_nodes(devices: Iterable[Node]) -> Nodes:
+    responders: List[Node] = []
+    civilians: List[Node] = []
+    coordinators: List[Node] = []
+    sensors: List[Node] = []
+    backbone: List[Node] = []
+    visitors: List[Node] = []
+
+    for node in devices:
+        if node.type == "responder":
+            responders.append(node)
+        elif node.type == "civilian":
+            civilians.append(node)
+        elif node.type == "coordinator":
+            coordinators.append(node)
+        elif node.type == "sensor":
+            sensors.append(node)
+        elif node.type == "backbone":
+            backbone.append(node)
+        elif node.type == "visitor":
+            visitors.append(node)
+
+    return Nodes(
+        responders=responders,
+        civilians=civilians,
+        coordinators=coordinators,
+        sensors=sensors,
+        backbone=backbone,
+        visitors=visitors,
+    )
 
 
 def get_node_info(element: ElementTree.Element) -> Node:
@@ -89,6 +284,10 @@ def get_node_info(element: ElementTree.Element) -> Node:
     node_id: int = int(element.attrib["id"])
     node_name: str = element.attrib["name"]
     node_type: str = element.attrib["type"]
+    roles_attribute: Optional[str] = element.attrib.get("roles")
+    roles: Optional[List[str]] = None
+    if roles_attribute is not None:
+        roles = [role for role in roles_attribute.split(",") if role]
     x_pos: float = 0.0
     y_pos: float = 0.0
 
@@ -97,20 +296,12 @@ def get_node_info(element: ElementTree.Element) -> Node:
             x_pos = float(sub_element.attrib["x"])
             y_pos = float(sub_element.attrib["y"])
 
-    return Node(id=node_id, name=node_name, type=node_type, x_pos=x_pos, y_pos=y_pos)
+    return Node(id=node_id, name=node_name, type=node_type, x_pos=x_pos, y_pos=y_pos, roles=roles)
 
 
 def get_node_type(nodes: Nodes, name: str) -> str:
-    for node in nodes.civilians:
-        if node.name == name:
-            return "civilian"
-
-    for node in nodes.coordinators:
-        if node.name == name:
-            return "coordinator"
-
-    for node in nodes.responders:
-        if node.name == name:
-            return "responder"
+    node: Optional[Node] = nodes.by_name.get(name)
+    if node is None:
+        return ""
 
-    return ""
+    return node.type
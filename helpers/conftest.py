@@ -0,0 +1 @@
+# pytest puts the directory of this conftest on sys.path, so that tests/ imports cadrhelpers from this checkout
@@ -0,0 +1,91 @@
+from cadrhelpers import placement as placement_module
+from cadrhelpers.placement import Topology, format_cpu_list, parse_cpu_list, place_node, plan
+
+
+def node_names(count):
+    return [f"n{index}" for index in range(1, count + 1)]
+
+
+def test_cpu_list_round_trip():
+    assert parse_cpu_list("0-3,8,10-11\n") == [0, 1, 2, 3, 8, 10, 11]
+    assert format_cpu_list([11, 0, 2, 1, 3, 8, 10]) == "0-3,8,10-11"
+
+
+def test_smt_siblings_stay_together():
+    # 8 cores with 2 threads each: cpu n and n + 8 are siblings
+    topology = Topology.synthetic(cores_per_socket=8, threads_per_core=2)
+    placements = plan(node_names(4), topology, reserved_cores=0)
+
+    assert [placements[name].cpus for name in node_names(4)] == [
+        [0, 1, 8, 9],
+        [2, 3, 10, 11],
+        [4, 5, 12, 13],
+        [6, 7, 14, 15],
+    ]
+    assert all(placement.shared == 1 for placement in placements.values())
+
+
+def test_nodes_stay_within_one_numa_node():
+    # 2 sockets with 2 NUMA nodes of 3 cores each
+    topology = Topology.synthetic(sockets=2, cores_per_socket=6, numa_nodes_per_socket=2)
+    numa_nodes = {cpu.id: cpu.numa_node for cpu in topology.cpus}
+    placements = plan(node_names(8), topology, reserved_cores=0)
+
+    assert len(placements) == 8
+    for placement in placements.values():
+        assert len(placement.mems) == 1
+        assert {numa_nodes[cpu] for cpu in placement.cpus} == set(placement.mems)
+    # the nodes are spread over all NUMA nodes in proportion to their cores
+    assert sorted(placement.mems[0] for placement in placements.values()) == [0, 0, 1, 1, 2, 2, 3, 3]
+
+
+def test_more_nodes_than_cores():
+    topology = Topology.synthetic(cores_per_socket=4)
+    placements = plan(node_names(10), topology, reserved_cores=1)
+
+    assert len(placements) == 10
+    used = set()
+    for placement in placements.values():
+        assert len(placement.cpus) == 1
+        assert placement.cpus[0] != 0, "the reserved core must not be used"
+        assert placement.shared >= 3
+        used.update(placement.cpus)
+    assert used == {1, 2, 3}
+
+
+def test_reserved_cores_leave_at_least_one_core():
+    placements = plan(node_names(2), Topology.synthetic(cores_per_socket=2), reserved_cores=5)
+    assert all(placement.cpus == [1] for placement in placements.values())
+
+
+def test_sessions_get_disjoint_cores():
+    topology = Topology.synthetic(cores_per_socket=9)
+    sessions = [
+        plan(node_names(4), topology, reserved_cores=1, partition=slot, partitions=2)
+        for slot in (0, 1)
+    ]
+
+    cpus = [{cpu for placement in placements.values() for cpu in placement.cpus} for placements in sessions]
+    assert cpus[0] and cpus[1]
+    assert not cpus[0] & cpus[1]
+    assert 0 not in cpus[0] | cpus[1]
+
+
+def test_sessions_are_placed_by_slot_not_session_id(monkeypatch):
+    # session ids 1 and 3 are both odd, only their slots tell them apart
+    monkeypatch.setattr(Topology, "from_sysfs", classmethod(lambda cls: Topology.synthetic(cores_per_socket=9)))
+    monkeypatch.setattr(
+        placement_module, "apply_placement", lambda placement, pid, session_id, use_cgroup: placement.to_dict()
+    )
+
+    cpus = []
+    for slot, session_id in enumerate((1, 3)):
+        config = {"enabled": True, "reserved_cores": 1, "sessions": 2, "slot": slot}
+        placed = [
+            place_node(node_name=name, pid=0, session_id=session_id, node_names=node_names(4), config=config)
+            for name in node_names(4)
+        ]
+        cpus.append({cpu for placement in placed for cpu in parse_cpu_list(placement["cpus"])})
+
+    assert cpus[0] and cpus[1]
+    assert not cpus[0] & cpus[1]